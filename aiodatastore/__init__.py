@@ -1,43 +1,145 @@
-from aiodatastore.client import Datastore  # noqa
-from aiodatastore.commit import CommitResult, MutationResult  # noqa
-from aiodatastore.constants import (  # noqa
-    CompositeFilterOperator,
-    PropertyFilterOperator,
-    Direction,
-    Mode,
-    ReadConsistency,
-    Operation,
-    ResultType,
-    MoreResultsType,
-)
-from aiodatastore.entity import Entity, EntityResult  # noqa
-from aiodatastore.filters import CompositeFilter, PropertyFilter  # noqa
-from aiodatastore.key import PartitionId, PathElement, Key  # noqa
-from aiodatastore.lookup import LookupResult  # noqa
-from aiodatastore.mutation import (  # noqa
-    InsertMutation,
-    UpdateMutation,
-    UpsertMutation,
-    DeleteMutation,
-)
-from aiodatastore.property import PropertyOrder, PropertyReference  # noqa
-from aiodatastore.query import (  # noqa
-    Projection,
-    KindExpression,
-    Query,
-    QueryResultBatch,
-)
-from aiodatastore.transaction import ReadOnlyOptions, ReadWriteOptions  # noqa
-from aiodatastore.values import (  # noqa
-    NullValue,
-    BooleanValue,
-    StringValue,
-    IntegerValue,
-    DoubleValue,
-    TimestampValue,
-    ArrayValue,
-    GeoPointValue,
-    LatLng,
-    BlobValue,
-    KeyValue,
-)
+"""Public API, submodules are imported lazily on first attribute access."""
+
+import importlib
+from typing import TYPE_CHECKING, Any, Dict, List
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aiodatastore.aggregation import (  # noqa
+        Count,
+        Sum,
+        Avg,
+        AggregationQuery,
+        AggregationResult,
+        AggregationResultBatch,
+    )
+    from aiodatastore.client import Datastore  # noqa
+    from aiodatastore.commit import CommitResult, MutationResult  # noqa
+    from aiodatastore.constants import (  # noqa
+        CompositeFilterOperator,
+        PropertyFilterOperator,
+        Direction,
+        Mode,
+        ReadConsistency,
+        Operation,
+        ResultType,
+        MoreResultsType,
+    )
+    from aiodatastore.deadline import Deadline  # noqa
+    from aiodatastore.entity import Entity, EntityResult  # noqa
+    from aiodatastore.filters import CompositeFilter, PropertyFilter  # noqa
+    from aiodatastore.key import PartitionId, PathElement, Key  # noqa
+    from aiodatastore.lookup import LookupResult  # noqa
+    from aiodatastore.metrics import Histogram, MetricsCollector, RPCCall  # noqa
+    from aiodatastore.mutation import (  # noqa
+        InsertMutation,
+        UpdateMutation,
+        UpsertMutation,
+        DeleteMutation,
+    )
+    from aiodatastore.profiling import Profiler  # noqa
+    from aiodatastore.property import PropertyOrder, PropertyReference  # noqa
+    from aiodatastore.query import (  # noqa
+        Projection,
+        KindExpression,
+        Query,
+        ResultBatch,
+        QueryResultBatch,
+        KeyQueryResultBatch,
+        ProjectionQueryResultBatch,
+    )
+    from aiodatastore.slowlog import SlowQueryLog, query_fingerprint  # noqa
+    from aiodatastore.transaction import ReadOnlyOptions, ReadWriteOptions  # noqa
+    from aiodatastore.values import (  # noqa
+        NullValue,
+        BooleanValue,
+        StringValue,
+        IntegerValue,
+        DoubleValue,
+        TimestampValue,
+        ArrayValue,
+        GeoPointValue,
+        LatLng,
+        BlobValue,
+        KeyValue,
+    )
+
+_EXPORTS = {
+    "aiodatastore.aggregation": (
+        "Count",
+        "Sum",
+        "Avg",
+        "AggregationQuery",
+        "AggregationResult",
+        "AggregationResultBatch",
+    ),
+    "aiodatastore.client": ("Datastore",),
+    "aiodatastore.commit": ("CommitResult", "MutationResult"),
+    "aiodatastore.constants": (
+        "CompositeFilterOperator",
+        "PropertyFilterOperator",
+        "Direction",
+        "Mode",
+        "ReadConsistency",
+        "Operation",
+        "ResultType",
+        "MoreResultsType",
+    ),
+    "aiodatastore.deadline": ("Deadline",),
+    "aiodatastore.entity": ("Entity", "EntityResult"),
+    "aiodatastore.filters": ("CompositeFilter", "PropertyFilter"),
+    "aiodatastore.key": ("PartitionId", "PathElement", "Key"),
+    "aiodatastore.lookup": ("LookupResult",),
+    "aiodatastore.metrics": ("Histogram", "MetricsCollector", "RPCCall"),
+    "aiodatastore.mutation": (
+        "InsertMutation",
+        "UpdateMutation",
+        "UpsertMutation",
+        "DeleteMutation",
+    ),
+    "aiodatastore.profiling": ("Profiler",),
+    "aiodatastore.property": ("PropertyOrder", "PropertyReference"),
+    "aiodatastore.query": (
+        "Projection",
+        "KindExpression",
+        "Query",
+        "ResultBatch",
+        "QueryResultBatch",
+        "KeyQueryResultBatch",
+        "ProjectionQueryResultBatch",
+    ),
+    "aiodatastore.slowlog": ("SlowQueryLog", "query_fingerprint"),
+    "aiodatastore.transaction": ("ReadOnlyOptions", "ReadWriteOptions"),
+    "aiodatastore.values": (
+        "NullValue",
+        "BooleanValue",
+        "StringValue",
+        "IntegerValue",
+        "DoubleValue",
+        "TimestampValue",
+        "ArrayValue",
+        "GeoPointValue",
+        "LatLng",
+        "BlobValue",
+        "KeyValue",
+    ),
+}
+
+_MODULES: Dict[str, str] = {
+    name: module for module, names in _EXPORTS.items() for name in names
+}
+
+__all__ = tuple(_MODULES)
+
+
+def __getattr__(name: str) -> Any:
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value  # next lookups don't call __getattr__
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_MODULES))
@@ -0,0 +1,140 @@
+from typing import Any, Dict, List, Optional
+
+from aiodatastore.constants import MoreResultsType
+from aiodatastore.entity import Entity
+from aiodatastore.property import PropertyReference
+from aiodatastore.query import Query
+from aiodatastore.values import Value
+
+__all__ = (
+    "Aggregation",
+    "Count",
+    "Sum",
+    "Avg",
+    "AggregationQuery",
+    "AggregationResult",
+    "AggregationResultBatch",
+)
+
+
+# https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runAggregationQuery#Aggregation
+class Aggregation:
+    __slots__ = ("alias",)
+
+    operator: str
+
+    def __init__(self, alias: str = "") -> None:
+        self.alias = alias
+
+    def _operator_ds(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def to_ds(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {self.operator: self._operator_ds()}
+        if self.alias:
+            data["alias"] = self.alias
+
+        return data
+
+
+# https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runAggregationQuery#Count
+class Count(Aggregation):
+    __slots__ = ("up_to",)
+
+    operator = "count"
+
+    def __init__(self, alias: str = "", up_to: Optional[int] = None) -> None:
+        super().__init__(alias)
+        self.up_to = up_to
+
+    def _operator_ds(self) -> Dict[str, Any]:
+        if self.up_to is None:
+            return {}
+
+        return {"upTo": str(self.up_to)}
+
+
+# https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runAggregationQuery#Sum
+class Sum(Aggregation):
+    __slots__ = ("property",)
+
+    operator = "sum"
+
+    def __init__(self, property: PropertyReference, alias: str = "") -> None:
+        super().__init__(alias)
+        self.property = property
+
+    def _operator_ds(self) -> Dict[str, Any]:
+        return {"property": self.property.to_ds()}
+
+
+# https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runAggregationQuery#Avg
+class Avg(Sum):
+    __slots__ = ()
+
+    operator = "avg"
+
+
+# https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runAggregationQuery#AggregationQuery
+class AggregationQuery:
+    __slots__ = ("nested_query", "aggregations")
+
+    def __init__(self, nested_query: Query, aggregations: List[Aggregation]) -> None:
+        self.nested_query = nested_query
+        self.aggregations = aggregations
+
+    def to_ds(self) -> Dict[str, Any]:
+        return {
+            "nestedQuery": self.nested_query.to_ds(),
+            "aggregations": [a.to_ds() for a in self.aggregations],
+        }
+
+
+# https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runAggregationQuery#AggregationResult
+class AggregationResult:
+    __slots__ = ("aggregate_properties",)
+
+    def __init__(self, aggregate_properties: Dict[str, Value]) -> None:
+        self.aggregate_properties = aggregate_properties
+
+    def __getitem__(self, alias: str) -> Any:
+        # python value: int for COUNT, int or float for SUM, float or None for AVG
+        return self.aggregate_properties[alias].value
+
+    def __contains__(self, alias: str) -> bool:
+        return alias in self.aggregate_properties
+
+    @classmethod
+    def from_ds(cls, data: Dict[str, Any]) -> "AggregationResult":
+        # aggregate properties are parsed like entity properties
+        properties = data.get("aggregateProperties", {})
+        return cls(Entity.from_ds({"properties": properties}).properties)
+
+
+# https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runAggregationQuery#AggregationResultBatch
+class AggregationResultBatch:
+    __slots__ = ("aggregation_results", "more_results", "read_time")
+
+    def __init__(
+        self,
+        aggregation_results: Optional[List[AggregationResult]] = None,
+        more_results: MoreResultsType = MoreResultsType.UNSPECIFIED,
+        read_time: str = "",
+    ) -> None:
+        self.aggregation_results = aggregation_results or []
+        self.more_results = more_results
+        self.read_time = read_time
+
+    def __getitem__(self, alias: str) -> Any:
+        # shortcut for the single result of aggregation query
+        return self.aggregation_results[0][alias]
+
+    @classmethod
+    def from_ds(cls, data: Dict[str, Any]) -> "AggregationResultBatch":
+        return cls(
+            aggregation_results=[
+                AggregationResult.from_ds(r) for r in data.get("aggregationResults", [])
+            ],
+            more_results=MoreResultsType(data["moreResults"]),
+            read_time=data.get("readTime", ""),
+        )
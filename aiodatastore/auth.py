@@ -0,0 +1,95 @@
+import asyncio
+import datetime
+import logging
+import time
+from typing import Any, Dict, Optional
+
+__all__ = ("AuthHeaders",)
+
+logger = logging.getLogger("aiodatastore.auth")
+
+# used when token doesn't report its lifetime
+DEFAULT_TOKEN_TTL = 3600.0
+# cached token isn't used when it expires sooner than this
+EXPIRY_MARGIN = 10.0
+# delay between background refresh attempts after an error
+RETRY_INTERVAL = 5.0
+# minimum delay between background refreshes
+MIN_REFRESH_INTERVAL = 1.0
+
+
+class AuthHeaders:
+    """Caches Authorization header and refreshes token in background.
+
+    `token` is gcloud-aio Token or any object with async `get()` method.
+    Token is refreshed by a background task at half of its lifetime (when
+    gcloud-aio Token considers it stale), so requests don't wait for it.
+    Concurrent callers share a single in-flight refresh.
+    """
+
+    def __init__(self, token: Any) -> None:
+        self.token = token
+        self.refreshes = 0
+        self._header = ""
+        self._refresh_at = 0.0
+        self._expires_at = 0.0
+        self._refreshing: Optional["asyncio.Future[None]"] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def _lifetime(self) -> float:
+        # remaining lifetime of the current token, in seconds
+        duration = getattr(self.token, "access_token_duration", 0) or DEFAULT_TOKEN_TTL
+        acquired_at = getattr(self.token, "access_token_acquired_at", None)
+        if not isinstance(acquired_at, datetime.datetime):
+            return float(duration)
+
+        age = (datetime.datetime.utcnow() - acquired_at).total_seconds()
+        return duration - age
+
+    async def _fetch(self) -> None:
+        token = await self.token.get()
+        duration = getattr(self.token, "access_token_duration", 0) or DEFAULT_TOKEN_TTL
+        lifetime = self._lifetime()
+        now = time.monotonic()
+        self._header = f"Bearer {token}"
+        self._expires_at = now + lifetime
+        self._refresh_at = now + max(lifetime - duration / 2, MIN_REFRESH_INTERVAL)
+        self.refreshes += 1
+
+    async def refresh(self) -> None:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._fetch())
+
+        # shielded, so cancelled caller doesn't cancel refresh of others
+        await asyncio.shield(self._refreshing)
+
+    async def _run(self) -> None:
+        while True:
+            delay = self._refresh_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("token refresh failed")
+                await asyncio.sleep(RETRY_INTERVAL)
+
+    def _start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def get(self) -> Dict[str, str]:
+        if not self._header or time.monotonic() >= self._expires_at - EXPIRY_MARGIN:
+            await self.refresh()
+        self._start()
+
+        return {"Authorization": self._header}
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
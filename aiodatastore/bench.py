@@ -0,0 +1,374 @@
+"""Load generator for Datastore client.
+
+python -m aiodatastore.bench --fake --workload mixed --concurrency 50
+DATASTORE_EMULATOR_HOST=127.0.0.1:8081 python -m aiodatastore.bench
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from aiodatastore.client import Datastore
+from aiodatastore.constants import Mode
+from aiodatastore.entity import Entity
+from aiodatastore.key import Key, PartitionId, PathElement
+from aiodatastore.mutation import (
+    DeleteMutation,
+    Mutation,
+    UpdateMutation,
+    UpsertMutation,
+)
+from aiodatastore.profiling import Profiler
+from aiodatastore.query import KindExpression, Query
+from aiodatastore.transport import (
+    AiohttpTransport,
+    Http2Transport,
+    HttpxTransport,
+    SessionTransport,
+    Transport,
+)
+from aiodatastore.values import IntegerValue, StringValue, TimestampValue
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
+
+__all__ = (
+    "TRANSPORTS",
+    "WORKLOADS",
+    "Workload",
+    "LoadResult",
+    "percentile",
+    "run",
+)
+
+SEED_BATCH_SIZE = 500
+
+
+class Workload:
+    def __init__(
+        self,
+        project_id: str,
+        kind: str,
+        entities: int,
+        batch_size: int,
+    ) -> None:
+        self.project_id = project_id
+        self.kind = kind
+        self.entities = entities
+        self.batch_size = batch_size
+
+    def key(self, i: int) -> Key:
+        return Key(
+            PartitionId(self.project_id), [PathElement(self.kind, id=str(i + 1))]
+        )
+
+    def random_key(self) -> Key:
+        return self.key(random.randrange(self.entities))
+
+    def entity(self, i: int) -> Entity:
+        return Entity(
+            self.key(i),
+            {
+                "name": StringValue(f"entity-{i}"),
+                "counter": IntegerValue(i),
+                "payload": StringValue("x" * 256, indexed=False),
+                "updated": TimestampValue(datetime.datetime.utcnow()),
+            },
+        )
+
+    async def seed(self, ds: Datastore) -> None:
+        for start in range(0, self.entities, SEED_BATCH_SIZE):
+            stop = min(start + SEED_BATCH_SIZE, self.entities)
+            mutations: List[Union[Mutation, DeleteMutation]] = [
+                UpsertMutation(self.entity(i)) for i in range(start, stop)
+            ]
+            await ds.commit(mutations, mode=Mode.NON_TRANSACTIONAL)
+
+    async def lookup(self, ds: Datastore) -> None:
+        await ds.lookup([self.random_key() for _ in range(self.batch_size)])
+
+    async def query(self, ds: Datastore) -> None:
+        query = Query(kind=KindExpression(self.kind), limit=self.batch_size)
+        async for _ in ds.iter_query(query):
+            pass
+
+    async def write(self, ds: Datastore) -> None:
+        mutations: List[Union[Mutation, DeleteMutation]] = [
+            UpsertMutation(self.entity(random.randrange(self.entities)))
+            for _ in range(self.batch_size)
+        ]
+        await ds.commit(mutations, mode=Mode.NON_TRANSACTIONAL)
+
+    async def mixed(self, ds: Datastore) -> None:
+        # read-modify-write in a transaction
+        transaction = await ds.begin_transaction()
+        result = await ds.lookup([self.random_key()], transaction_id=transaction)
+        if not result.found:
+            await ds.rollback(transaction)
+            return
+
+        entity = result.found[0].entity
+        entity["counter"] = IntegerValue(entity["counter"].value + 1)
+        await ds.commit([UpdateMutation(entity)], transaction_id=transaction)
+
+
+WORKLOADS = ("lookup", "query", "write", "mixed")
+TRANSPORTS = ("aiohttp", "httpx", "http2", "session", "memory")
+
+
+def percentile(values: List[float], q: float) -> float:
+    # nearest-rank percentile of sorted values
+    if not values:
+        return 0.0
+
+    rank = math.ceil(q / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        if resource is None:
+            return 0.0
+        # peak RSS, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LoadResult:
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.elapsed = 0.0
+        self.cpu_time = 0.0
+        self.rss_mb = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        requests = len(latencies) + sum(self.errors.values())
+        return {
+            "requests": requests,
+            "errors": dict(self.errors),
+            "elapsed": self.elapsed,
+            "throughput": requests / self.elapsed if self.elapsed else 0.0,
+            "latency_ms": {
+                name: percentile(latencies, q) * 1000
+                for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+            },
+            "cpu_per_request_ms": self.cpu_time / requests * 1000 if requests else 0.0,
+            "rss_mb": self.rss_mb,
+        }
+
+
+async def run(
+    operation: Callable[[], Awaitable[None]],
+    concurrency: int,
+    duration: Optional[float] = None,
+    requests: Optional[int] = None,
+) -> LoadResult:
+    result = LoadResult()
+    remaining = requests
+    stop_at = time.monotonic() + duration if duration else None
+
+    async def worker() -> None:
+        nonlocal remaining
+        while True:
+            if stop_at is not None and time.monotonic() >= stop_at:
+                return
+            if remaining is not None:
+                if remaining <= 0:
+                    return
+                remaining -= 1
+
+            start = time.perf_counter()
+            try:
+                await operation()
+            except Exception as e:  # pylint: disable=broad-except
+                name = type(e).__name__
+                result.errors[name] = result.errors.get(name, 0) + 1
+            else:
+                result.latencies.append(time.perf_counter() - start)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - start
+    result.cpu_time = time.process_time() - cpu_start
+    result.rss_mb = _rss_mb()
+    return result
+
+
+def _format(
+    workload: str,
+    transport: str,
+    concurrency: int,
+    stats: Dict[str, Any],
+) -> str:
+    latency = stats["latency_ms"]
+    lines = [
+        f"workload:    {workload} (concurrency {concurrency})",
+        f"transport:   {transport}",
+        f"requests:    {stats['requests']} in {stats['elapsed']:.2f}s",
+        f"throughput:  {stats['throughput']:.1f} req/s",
+        "latency:     p50 {p50:.2f}ms  p95 {p95:.2f}ms  p99 {p99:.2f}ms  "
+        "max {max:.2f}ms".format(**latency),
+        f"cpu:         {stats['cpu_per_request_ms']:.3f}ms per request",
+        f"rss:         {stats['rss_mb']:.1f}MB",
+    ]
+    if "streams" in stats:
+        streams = stats["streams"]
+        lines.append(
+            f"streams:     peak {streams['peak']}  queued {streams['queued']}  "
+            f"versions {streams['versions']}"
+        )
+    if stats["errors"]:
+        errors = ", ".join(f"{k}={v}" for k, v in sorted(stats["errors"].items()))
+        lines.append(f"errors:      {errors}")
+
+    return "\n".join(lines)
+
+
+def make_transport(name: str) -> Transport:
+    if name == "httpx":
+        return HttpxTransport()
+    if name == "http2":
+        return Http2Transport()
+    if name == "session":
+        return SessionTransport()
+    if name == "memory":
+        # in-process fake without HTTP, measures client overhead only
+        from aiodatastore.fake import MemoryTransport
+
+        return MemoryTransport()
+
+    return AiohttpTransport()
+
+
+def _serve_fake(conn: Any, latency: float) -> None:
+    # runs in child process until terminated, sends server URL to parent
+    from aiodatastore.fake import FakeDatastoreServer, lognormal_latency
+
+    async def serve() -> None:
+        server = FakeDatastoreServer(
+            latency=lognormal_latency(latency) if latency else None
+        )
+        async with server:
+            conn.send(server.url)
+            await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def start_fake(latency: float) -> Tuple[multiprocessing.Process, str]:
+    """Starts fake server in a child process, returns process and API URL.
+
+    Fake runs in its own process, so its CPU time isn't counted as client
+    CPU time per request.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_serve_fake, args=(sender, latency), daemon=True
+    )
+    process.start()
+    # receiver gets EOFError if child process fails before sending URL
+    sender.close()
+    try:
+        url = await asyncio.get_running_loop().run_in_executor(None, receiver.recv)
+    except EOFError:
+        process.join()
+        raise RuntimeError(f"fake server failed with exit code {process.exitcode}")
+    finally:
+        receiver.close()
+
+    return process, url
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    server = None
+    api_url = None
+    if args.fake and args.transport != "memory":
+        server, api_url = await start_fake(args.fake_latency)
+
+    profiler = Profiler()
+    transport = make_transport(args.transport)
+    try:
+        async with Datastore(
+            args.project,
+            middlewares=[profiler] if args.profile else None,
+            transport=transport,
+            compression_threshold=args.compression_threshold,
+            api_url=api_url,
+        ) as ds:
+            if args.warmup:
+                await ds.warmup(connections=args.warmup)
+            workload = Workload(args.project, args.kind, args.entities, args.batch_size)
+            if not args.no_seed:
+                await workload.seed(ds)
+
+            operation = getattr(workload, args.workload)
+            result = await run(
+                lambda: operation(ds),
+                concurrency=args.concurrency,
+                duration=None if args.requests else args.duration,
+                requests=args.requests,
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    stats = result.to_dict()
+    if isinstance(transport, Http2Transport):
+        stats["streams"] = transport.stats.to_dict()
+    if args.json:
+        report = {"workload": args.workload, "transport": args.transport, **stats}
+        print(json.dumps(report, indent=2))
+    else:
+        print(_format(args.workload, args.transport, args.concurrency, stats))
+    if args.profile:
+        profiler.dump(sys.stdout)
+
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Datastore client load generator")
+    parser.add_argument("--workload", choices=WORKLOADS, default="lookup")
+    parser.add_argument("--project", default="test")
+    parser.add_argument("--kind", default="BenchEntity")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--requests", type=int, help="stop after N requests")
+    parser.add_argument("--entities", type=int, default=1000, help="dataset size")
+    parser.add_argument("--batch-size", type=int, default=10, help="keys per request")
+    parser.add_argument("--no-seed", action="store_true", help="skip dataset seeding")
+    parser.add_argument("--warmup", type=int, default=0, help="open N connections")
+    parser.add_argument(
+        "--fake", action="store_true", help="use fake server in a child process"
+    )
+    parser.add_argument("--transport", choices=TRANSPORTS, default="aiohttp")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="seconds")
+    parser.add_argument(
+        "--compression-threshold", type=int, help="gzip requests of at least N bytes"
+    )
+    parser.add_argument("--profile", action="store_true", help="print time split")
+    parser.add_argument("--json", action="store_true", help="print JSON report")
+    args = parser.parse_args()
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,32 @@
+import asyncio
+import copy
+import gzip
+import json
 import os
-from typing import Any, Dict, List, IO, Optional, Union
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    IO,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
 
-from gcloud.aio.auth import AioSession, Token
+from aiodatastore.aggregation import AggregationQuery, AggregationResultBatch
+from aiodatastore.auth import AuthHeaders
 from aiodatastore.commit import CommitResult
-from aiodatastore.constants import Mode, ReadConsistency
-from aiodatastore.entity import Entity
-from aiodatastore.key import Key
+from aiodatastore.constants import Mode, MoreResultsType, ReadConsistency
+from aiodatastore.deadline import Deadline, Timeout
+from aiodatastore.entity import Entity, EntityResult
+from aiodatastore.key import Key, KeyTuple
 from aiodatastore.lookup import LookupResult
+from aiodatastore.metrics import CallNext, Middleware, RPCCall
 from aiodatastore.mutation import (
     Mutation,
     InsertMutation,
@@ -14,17 +34,36 @@ from aiodatastore.mutation import (
     UpdateMutation,
     DeleteMutation,
 )
-from aiodatastore.query import GQLQuery, Query, QueryResultBatch
+from aiodatastore.property import PropertyReference
+from aiodatastore.query import (
+    GQLQuery,
+    KeyQueryResultBatch,
+    Projection,
+    ProjectionQueryResultBatch,
+    Query,
+    QueryResultBatch,
+)
 from aiodatastore.transaction import ReadOnlyOptions, ReadWriteOptions
+from aiodatastore.transport import (
+    AiohttpTransport,
+    Response,
+    Transport,
+    decompress,
+    raise_for_status,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pyarrow as pa
+
+    from aiodatastore.columnar import ColumnBatch
+    from aiodatastore.export import ArrowResultBatch
 
 __all__ = ("Datastore",)
 
-try:
-    API_URL = f'http://{os.environ["DATASTORE_EMULATOR_HOST"]}/v1'
-    EMULATOR_MODE = True
-except KeyError:
-    API_URL = "https://datastore.googleapis.com/v1"
-    EMULATOR_MODE = False
+API_URL = "https://datastore.googleapis.com/v1"
+
+# gzip level of request bodies, higher levels cost much more CPU
+COMPRESSION_LEVEL = 6
 
 SCOPES = (
     "https://www.googleapis.com/auth/cloud-platform",
@@ -32,23 +71,69 @@ SCOPES = (
 )
 
 
+def _wrap_middleware(middleware: Middleware, call_next: CallNext) -> CallNext:
+    async def handler(call: RPCCall) -> Any:
+        return await middleware(call, call_next)
+
+    return handler
+
+
+def _next_page(
+    query: Query,
+    batch: Any,
+    results: int,
+) -> bool:
+    # moves query to the next page of batch (any of query result batches),
+    # returns False when there is none
+    if batch.more_results != MoreResultsType.NOT_FINISHED:
+        return False
+
+    query.start_cursor = batch.end_cursor
+    if query.offset is not None:
+        query.offset = max(query.offset - batch.skipped_results, 0)
+    if query.limit is not None:
+        query.limit -= results
+        if query.limit <= 0:
+            return False
+
+    return True
+
+
 class Datastore:
     def __init__(
         self,
         project_id: str,
         service_file: Union[str, IO, None] = None,
         namespace: str = "",
+        middlewares: Optional[List[Middleware]] = None,
+        transport: Optional[Transport] = None,
+        compression_threshold: Optional[int] = None,
+        api_url: Optional[str] = None,
     ):
         self._project_id = project_id
+        # views share transport and token of the client which owns them
+        self._owner = True
+        # gzip request bodies of at least this size, None disables compression
+        self._compression_threshold = compression_threshold
         self._namespace = namespace
-        self._session = AioSession(None)
-        self._token = None
-        if not EMULATOR_MODE and service_file:
-            self._token = Token(
-                service_file=service_file,
-                session=self._session.session,
-                scopes=list(SCOPES),
-            )
+        self._middlewares = list(middlewares or [])
+        self._transport = transport or AiohttpTransport()
+        # endpoint is resolved per instance, emulator doesn't need auth
+        emulator_host = os.environ.get("DATASTORE_EMULATOR_HOST")
+        self._emulator_mode = emulator_host is not None
+        if api_url is None:
+            api_url = f"http://{emulator_host}/v1" if emulator_host else API_URL
+        self._api_url = api_url
+
+        # token uses its own session, so requests don't depend on transport
+        self._token: Any = None
+        self._auth: Optional[AuthHeaders] = None
+        if not self._emulator_mode and service_file:
+            # auth stack is slow to import, it's loaded only when used
+            from gcloud.aio.auth import Token
+
+            self._token = Token(service_file=service_file, scopes=list(SCOPES))
+            self._auth = AuthHeaders(self._token)
 
     def _get_read_options(
         self,
@@ -67,39 +152,201 @@ class Datastore:
         }
 
     async def _get_headers(self):
-        if self._token is None:
+        if self._auth is None:
             return {}
 
-        token = await self._token.get()
-        return {"Authorization": f"Bearer {token}"}
+        return await self._auth.get()
 
-    # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/allocateIds
-    async def allocate_ids(self, keys: List[Key]) -> List[Key]:
+    def _new_call(
+        self,
+        rpc: str,
+        keys: Optional[List[Key]] = None,
+        kind: Optional[str] = None,
+        entity_count: int = 0,
+    ) -> RPCCall:
+        if kind is None and keys:
+            kinds = {key.path[-1].kind for key in keys}
+            if len(kinds) == 1:
+                kind = kinds.pop()
+
+        return RPCCall(
+            rpc,
+            self._project_id,
+            namespace=self._namespace,
+            kind=kind,
+            key_count=len(keys) if keys else 0,
+            entity_count=entity_count,
+        )
+
+    def view(
+        self,
+        namespace: Optional[str] = None,
+        project_id: Optional[str] = None,
+    ) -> "Datastore":
+        """Returns client for another namespace and/or project.
+
+        View shares transport, auth token and middlewares (and so metrics)
+        with this client and is cheap to create. Closing a view is a no-op,
+        shared resources are closed with this client.
+        """
+        view = copy.copy(self)
+        view._owner = False
+        if namespace is not None:
+            view._namespace = namespace
+        if project_id is not None:
+            view._project_id = project_id
+
+        return view
+
+    def add_middleware(self, middleware: Middleware) -> None:
+        self._middlewares.append(middleware)
+
+    async def _request(
+        self,
+        call: RPCCall,
+        build: Callable[[], Dict[str, Any]],
+        decode: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        deadline: Optional[Deadline] = None,
+        decode_message: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        async def send(call: RPCCall) -> Any:
+            return await self._send(call, build, decode, decode_message)
+
+        handler: CallNext = send
+        for middleware in reversed(self._middlewares):
+            handler = _wrap_middleware(middleware, handler)
+
+        if deadline is None:
+            return await handler(call)
+
+        return await deadline.wait_for(handler(call))
+
+    async def _send(
+        self,
+        call: RPCCall,
+        build: Callable[[], Dict[str, Any]],
+        decode: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        decode_message: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        serialize_start = time.perf_counter()
+        req_data = build()
+        encode_start = time.perf_counter()
+        call.serialize_time = encode_start - serialize_start
+        if self._transport.encodes_payload:
+            return await self._send_data(call, req_data, decode, decode_message)
+
+        body = json.dumps(req_data).encode()
+        call.encode_time = time.perf_counter() - encode_start
+        call.request_size = len(body)
+
+        threshold = self._compression_threshold
+        compressed = threshold is not None and len(body) >= threshold
+        if compressed:
+            compress_start = time.perf_counter()
+            # fixed mtime keeps compressed bodies reproducible
+            body = gzip.compress(body, compresslevel=COMPRESSION_LEVEL, mtime=0)
+            call.compress_time = time.perf_counter() - compress_start
+        call.request_wire_size = len(body)
+
+        start = time.perf_counter()
         headers = await self._get_headers()
-        req_data = {"keys": [key.to_ds() for key in keys]}
+        headers["Content-Type"] = "application/json"
+        if threshold is not None:
+            headers["Accept-Encoding"] = "gzip"
+        if compressed:
+            headers["Content-Encoding"] = "gzip"
+
+        network_start = time.perf_counter()
+        call.auth_time = network_start - start
+        url = f"{self._api_url}/projects/{self._project_id}:{call.rpc}"
+        try:
+            resp = await self._transport.request(url, body, headers)
+        finally:
+            call.network_time = time.perf_counter() - network_start
+
+        call.status = resp.status
+        call.response_wire_size = (
+            len(resp.body) if resp.wire_size is None else resp.wire_size
+        )
+        if resp.encoding is not None:
+            decompress_start = time.perf_counter()
+            resp = Response(resp.status, decompress(resp.body, resp.encoding))
+            call.compress_time += time.perf_counter() - decompress_start
+        call.response_size = len(resp.body)
+        raise_for_status(url, headers, resp)
+
+        parse_start = time.perf_counter()
+        resp_data = json.loads(resp.body) if resp.body else {}
+        decode_start = time.perf_counter()
+        call.parse_time = decode_start - parse_start
+        call.result = decode(resp_data) if decode is not None else resp_data
+        call.decode_time = time.perf_counter() - decode_start
+        return call.result
+
+    async def _send_data(
+        self,
+        call: RPCCall,
+        req_data: Dict[str, Any],
+        decode: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        decode_message: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        # transport encodes payload in its wire format, its time is network time;
+        # response message is decoded by decode_message, if transport returns it
+        start = time.perf_counter()
+        headers = await self._get_headers()
+        network_start = time.perf_counter()
+        call.auth_time = network_start - start
+        url = f"{self._api_url}/projects/{self._project_id}:{call.rpc}"
+        try:
+            resp = await self._transport.request_data(
+                url, req_data, headers, message=decode_message is not None
+            )
+        finally:
+            call.network_time = time.perf_counter() - network_start
+
+        call.status = resp.status
+        call.request_size = call.request_wire_size = resp.request_size
+        call.response_size = call.response_wire_size = resp.response_size
+        if resp.status >= 400:
+            body = json.dumps(resp.data).encode()
+            raise_for_status(url, headers, Response(resp.status, body))
+
+        decode_start = time.perf_counter()
+        if decode_message is not None and resp.message is not None:
+            call.result = decode_message(resp.message)
+        else:
+            call.result = decode(resp.data) if decode is not None else resp.data
+        call.decode_time = time.perf_counter() - decode_start
+        return call.result
 
-        resp = await self._session.request(
-            "POST",
-            f"{API_URL}/projects/{self._project_id}:allocateIds",
-            headers=headers,
-            json=req_data,
+    # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/allocateIds
+    async def allocate_ids(
+        self,
+        keys: List[Key],
+        timeout: Timeout = None,
+    ) -> List[Key]:
+        return await self._request(
+            self._new_call("allocateIds", keys=keys),
+            lambda: {"keys": [key.to_ds() for key in keys]},
+            decode=lambda data: [Key.from_ds(key) for key in data["keys"]],
+            deadline=Deadline.from_timeout(timeout),
+            decode_message=lambda pb: [Key.from_pb(key) for key in pb.keys],
         )
-        resp_data = await resp.json()
-        return [Key.from_ds(key) for key in resp_data["keys"]]
 
     # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/reserveIds
-    async def reserve_ids(self, keys: List[Key], database_id: str = ""):
-        headers = await self._get_headers()
-        req_data = {
-            "databaseId": database_id,
-            "keys": [key.to_ds() for key in keys],
-        }
-
-        await self._session.request(
-            "POST",
-            f"{API_URL}/projects/{self._project_id}:reserveIds",
-            headers=headers,
-            json=req_data,
+    async def reserve_ids(
+        self,
+        keys: List[Key],
+        database_id: str = "",
+        timeout: Timeout = None,
+    ):
+        await self._request(
+            self._new_call("reserveIds", keys=keys),
+            lambda: {
+                "databaseId": database_id,
+                "keys": [key.to_ds() for key in keys],
+            },
+            deadline=Deadline.from_timeout(timeout),
         )
 
     # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/lookup
@@ -108,52 +355,38 @@ class Datastore:
         keys: List[Key],
         consistency: ReadConsistency = ReadConsistency.EVENTUAL,
         transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
     ) -> LookupResult:
-        headers = await self._get_headers()
-        req_data = {
-            "keys": [key.to_ds() for key in keys],
-            "readOptions": self._get_read_options(consistency, transaction_id),
-        }
-
-        resp = await self._session.request(
-            "POST",
-            f"{API_URL}/projects/{self._project_id}:lookup",
-            headers=headers,
-            json=req_data,
+        return await self._request(
+            self._new_call("lookup", keys=keys),
+            lambda: {
+                "keys": [key.to_ds() for key in keys],
+                "readOptions": self._get_read_options(consistency, transaction_id),
+            },
+            decode=LookupResult.from_ds,
+            deadline=Deadline.from_timeout(timeout),
+            decode_message=LookupResult.from_pb,
         )
-        resp_data = await resp.json()
-        return LookupResult.from_ds(resp_data)
 
     # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/beginTransaction
     async def begin_transaction(
         self,
         opts: Optional[Union[ReadOnlyOptions, ReadWriteOptions]] = None,
+        timeout: Timeout = None,
     ) -> str:
-        headers = await self._get_headers()
-
-        req_data: Dict[str, Any] = {}
-        if opts is not None:
-            req_data = opts.to_ds()
-
-        resp = await self._session.request(
-            "POST",
-            f"{API_URL}/projects/{self._project_id}:beginTransaction",
-            headers=headers,
-            json=req_data,
+        return await self._request(
+            self._new_call("beginTransaction"),
+            lambda: opts.to_ds() if opts is not None else {},
+            decode=lambda data: data["transaction"],
+            deadline=Deadline.from_timeout(timeout),
         )
-        resp_data = await resp.json()
-        return resp_data["transaction"]
 
     # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/rollback
-    async def rollback(self, transaction_id: str) -> None:
-        headers = await self._get_headers()
-        req_data = {"transaction": transaction_id}
-
-        await self._session.request(
-            "POST",
-            f"{API_URL}/projects/{self._project_id}:rollback",
-            headers=headers,
-            json=req_data,
+    async def rollback(self, transaction_id: str, timeout: Timeout = None) -> None:
+        await self._request(
+            self._new_call("rollback"),
+            lambda: {"transaction": transaction_id},
+            deadline=Deadline.from_timeout(timeout),
         )
 
     # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/commit
@@ -162,45 +395,64 @@ class Datastore:
         mutations: List[Union[Mutation, DeleteMutation]],
         transaction_id: Optional[str] = None,
         mode: Optional[Mode] = None,
+        timeout: Timeout = None,
     ) -> CommitResult:
-        headers = await self._get_headers()
+        deadline = Deadline.from_timeout(timeout)
         mode = mode or Mode.TRANSACTIONAL
+        mode_value = mode.value
 
-        req_data = {
-            "mode": mode.value,
-            "mutations": [mut.to_ds() for mut in mutations],
-        }
         if mode == Mode.TRANSACTIONAL and transaction_id is None:
-            transaction_id = await self.begin_transaction()
-            req_data["transaction"] = transaction_id
-
-        resp = await self._session.request(
-            "POST",
-            f"{API_URL}/projects/{self._project_id}:commit",
-            headers=headers,
-            json=req_data,
+            # implicit transaction shares the time budget with the commit
+            transaction_id = await self.begin_transaction(timeout=deadline)
+
+        def build() -> Dict[str, Any]:
+            req_data = {
+                "mode": mode_value,
+                "mutations": [mut.to_ds() for mut in mutations],
+            }
+            if transaction_id is not None:
+                req_data["transaction"] = transaction_id
+
+            return req_data
+
+        keys = [
+            mut.key if isinstance(mut, DeleteMutation) else mut.entity.key
+            for mut in mutations
+        ]
+        call = self._new_call(
+            "commit",
+            keys=[key for key in keys if key is not None],
+            entity_count=sum(not isinstance(m, DeleteMutation) for m in mutations),
+        )
+        return await self._request(
+            call,
+            build,
+            decode=CommitResult.from_ds,
+            deadline=deadline,
         )
-        resp_data = await resp.json()
-        return CommitResult.from_ds(resp_data)
 
-    async def insert(self, entity: Entity) -> CommitResult:
+    async def insert(self, entity: Entity, timeout: Timeout = None) -> CommitResult:
         mutation = InsertMutation(entity)
-        return await self.commit([mutation])
+        return await self.commit([mutation], timeout=timeout)
 
-    async def upsert(self, entity: Entity) -> CommitResult:
+    async def upsert(self, entity: Entity, timeout: Timeout = None) -> CommitResult:
         mutation = UpsertMutation(entity)
-        return await self.commit([mutation])
+        return await self.commit([mutation], timeout=timeout)
 
     # TODO: handle entity not found
-    async def update(self, entity: Entity) -> CommitResult:
+    async def update(self, entity: Entity, timeout: Timeout = None) -> CommitResult:
         mutation = UpdateMutation(entity)
-        return await self.commit([mutation])
+        return await self.commit([mutation], timeout=timeout)
 
     # TODO: handle entity not found
-    async def delete(self, obj: Union[Entity, Key]) -> CommitResult:
+    async def delete(
+        self,
+        obj: Union[Entity, Key],
+        timeout: Timeout = None,
+    ) -> CommitResult:
         key = obj.key if isinstance(obj, Entity) else obj
         mutation = DeleteMutation(key)  # type: ignore
-        return await self.commit([mutation])
+        return await self.commit([mutation], timeout=timeout)
 
     # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runQuery
     async def run_query(
@@ -208,31 +460,420 @@ class Datastore:
         query: Union[Query, GQLQuery],
         consistency: ReadConsistency = ReadConsistency.EVENTUAL,
         transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
     ) -> QueryResultBatch:
-        headers = await self._get_headers()
-
-        req_data = {
-            "partitionId": self._get_partition_id(),
-            "readOptions": self._get_read_options(consistency, transaction_id),
-        }
         if isinstance(query, Query):
-            req_data["query"] = query.to_ds()
+            query_field = "query"
+            kind = query.kind.name if query.kind else None
+        elif isinstance(query, GQLQuery):
+            query_field = "gqlQuery"
+            kind = None
+        else:
+            raise RuntimeError(f"unsupported query type: {query}")
+
+        call = self._new_call("runQuery", kind=kind)
+        call.query = query
+        return await self._request(
+            call,
+            lambda: {
+                "partitionId": self._get_partition_id(),
+                "readOptions": self._get_read_options(consistency, transaction_id),
+                query_field: query.to_ds(),
+            },
+            decode=lambda data: QueryResultBatch.from_ds(data["batch"]),
+            deadline=Deadline.from_timeout(timeout),
+            decode_message=lambda pb: QueryResultBatch.from_pb(pb.batch),
+        )
+
+    async def run_aggregation_query(
+        self,
+        query: Union[AggregationQuery, GQLQuery],
+        consistency: ReadConsistency = ReadConsistency.EVENTUAL,
+        transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
+    ) -> AggregationResultBatch:
+        if isinstance(query, AggregationQuery):
+            query_field = "aggregationQuery"
+            nested = query.nested_query
+            kind = nested.kind.name if nested.kind else None
         elif isinstance(query, GQLQuery):
-            req_data["gqlQuery"] = query.to_ds()
+            query_field = "gqlQuery"
+            kind = None
         else:
             raise RuntimeError(f"unsupported query type: {query}")
 
-        resp = await self._session.request(
-            "POST",
-            f"{API_URL}/projects/{self._project_id}:runQuery",
-            headers,
-            json=req_data,
+        call = self._new_call("runAggregationQuery", kind=kind)
+        call.query = query
+        return await self._request(
+            call,
+            lambda: {
+                "partitionId": self._get_partition_id(),
+                "readOptions": self._get_read_options(consistency, transaction_id),
+                query_field: query.to_ds(),
+            },
+            decode=lambda data: AggregationResultBatch.from_ds(data["batch"]),
+            deadline=Deadline.from_timeout(timeout),
         )
-        resp_data = await resp.json()
-        return QueryResultBatch.from_ds(resp_data["batch"])
+
+    async def iter_query(
+        self,
+        query: Query,
+        consistency: ReadConsistency = ReadConsistency.EVENTUAL,
+        transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
+    ) -> AsyncIterator[EntityResult]:
+        # one time budget for all pages, not per page
+        deadline = Deadline.from_timeout(timeout)
+        query = copy.copy(query)
+
+        while True:
+            batch = await self.run_query(
+                query,
+                consistency=consistency,
+                transaction_id=transaction_id,
+                timeout=deadline,
+            )
+            for entity_result in batch.entity_results:
+                yield entity_result
+
+            if not _next_page(query, batch, len(batch.entity_results)):
+                break
+
+    async def _run_query(
+        self,
+        query: Query,
+        decode: Callable[[Dict[str, Any]], Any],
+        consistency: ReadConsistency,
+        transaction_id: Optional[str],
+        timeout: Timeout,
+    ) -> Any:
+        # runQuery with custom decoding of response batch
+        call = self._new_call("runQuery", kind=query.kind.name if query.kind else None)
+        call.query = query
+        return await self._request(
+            call,
+            lambda: {
+                "partitionId": self._get_partition_id(),
+                "readOptions": self._get_read_options(consistency, transaction_id),
+                "query": query.to_ds(),
+            },
+            decode=lambda data: decode(data["batch"]),
+            deadline=Deadline.from_timeout(timeout),
+        )
+
+    async def run_keys_query(
+        self,
+        query: Query,
+        consistency: ReadConsistency = ReadConsistency.EVENTUAL,
+        transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
+        tuples: bool = False,
+    ) -> KeyQueryResultBatch:
+        """Runs query as keys-only one and decodes results straight to keys.
+
+        With `tuples=True` keys are returned as compact `KeyTuple`s.
+        """
+        if not query.projection:
+            query = copy.copy(query)
+            query.projection = [Projection(PropertyReference("__key__"))]
+
+        return await self._run_query(
+            query,
+            lambda batch: KeyQueryResultBatch.from_ds(batch, tuples=tuples),
+            consistency,
+            transaction_id,
+            timeout,
+        )
+
+    async def iter_keys(
+        self,
+        query: Query,
+        consistency: ReadConsistency = ReadConsistency.EVENTUAL,
+        transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
+        tuples: bool = False,
+    ) -> AsyncIterator[Union[Key, KeyTuple]]:
+        deadline = Deadline.from_timeout(timeout)
+        query = copy.copy(query)
+
+        while True:
+            batch = await self.run_keys_query(
+                query,
+                consistency=consistency,
+                transaction_id=transaction_id,
+                timeout=deadline,
+                tuples=tuples,
+            )
+            for key in batch.keys:
+                yield key
+
+            if not _next_page(query, batch, len(batch.keys)):
+                break
+
+    async def run_projection_query(
+        self,
+        query: Query,
+        consistency: ReadConsistency = ReadConsistency.EVENTUAL,
+        transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
+        columns: bool = False,
+    ) -> ProjectionQueryResultBatch:
+        """Runs projection query and decodes results to Python values.
+
+        Results are named tuples of projected properties, or lists of values
+        per property with `columns=True`.
+        """
+        if not query.projection:
+            raise ValueError("query without projection")
+
+        properties = [p.property.name for p in query.projection]
+        return await self._run_query(
+            query,
+            lambda batch: ProjectionQueryResultBatch.from_ds(
+                batch, properties, columns=columns
+            ),
+            consistency,
+            transaction_id,
+            timeout,
+        )
+
+    async def iter_projection(
+        self,
+        query: Query,
+        consistency: ReadConsistency = ReadConsistency.EVENTUAL,
+        transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
+        columns: bool = False,
+    ) -> AsyncIterator[Any]:
+        # yields rows, or columns of every page with columns=True
+        deadline = Deadline.from_timeout(timeout)
+        query = copy.copy(query)
+
+        while True:
+            batch = await self.run_projection_query(
+                query,
+                consistency=consistency,
+                transaction_id=transaction_id,
+                timeout=deadline,
+                columns=columns,
+            )
+            if columns:
+                yield batch.columns
+            else:
+                for row in batch.rows:
+                    yield row
+
+            if not _next_page(query, batch, len(batch)):
+                break
+
+    async def run_columnar_query(
+        self,
+        query: Query,
+        properties: Optional[Sequence[str]] = None,
+        dtypes: Optional[Mapping[str, str]] = None,
+        consistency: ReadConsistency = ReadConsistency.EVENTUAL,
+        transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
+    ) -> "ColumnBatch":
+        """Runs query and decodes results to NumPy arrays, requires numpy.
+
+        See `ColumnBatch.from_ds` for `properties` and `dtypes`, projected
+        properties are used by default for projection queries.
+        """
+        # numpy is imported only when used, it's slow to import
+        from aiodatastore.columnar import ColumnBatch
+
+        if properties is None and query.projection:
+            properties = [p.property.name for p in query.projection]
+
+        return await self._run_query(
+            query,
+            lambda batch: ColumnBatch.from_ds(
+                batch, properties=properties, dtypes=dtypes
+            ),
+            consistency,
+            transaction_id,
+            timeout,
+        )
+
+    async def iter_columns(
+        self,
+        query: Query,
+        properties: Optional[Sequence[str]] = None,
+        dtypes: Optional[Mapping[str, str]] = None,
+        consistency: ReadConsistency = ReadConsistency.EVENTUAL,
+        transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
+    ) -> AsyncIterator["ColumnBatch"]:
+        """Yields a ColumnBatch per page of query results, requires numpy.
+
+        Columns and dtypes of previous pages are kept, properties first seen
+        on a page are added as its `new_columns`, int64 columns are widened
+        to float64 from the page with doubles (see `ColumnBatch.from_ds`).
+        """
+        from aiodatastore.columnar import ColumnBatch
+
+        deadline = Deadline.from_timeout(timeout)
+        query = copy.copy(query)
+        if properties is None and query.projection:
+            properties = [p.property.name for p in query.projection]
+
+        # dtypes of previous pages, None until property has values
+        inferred: Dict[str, Optional[str]] = {}
+        while True:
+            batch = await self._run_query(
+                query,
+                lambda data: ColumnBatch.from_ds(
+                    data, properties=properties, dtypes=dtypes, inferred=inferred
+                ),
+                consistency,
+                transaction_id,
+                deadline,
+            )
+            if len(batch):
+                yield batch
+                inferred = {
+                    name: dtype if batch[name].valid.any() else inferred.get(name)
+                    for name, dtype in batch.dtypes.items()
+                }
+
+            if not _next_page(query, batch, len(batch)):
+                break
+
+    async def run_arrow_query(
+        self,
+        query: Query,
+        schema: Optional["pa.Schema"] = None,
+        consistency: ReadConsistency = ReadConsistency.EVENTUAL,
+        transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
+        strict: bool = True,
+    ) -> "ArrowResultBatch":
+        """Runs query and converts results to Arrow record batch.
+
+        Requires pyarrow, schema is inferred from results when not given
+        (see `aiodatastore.export.infer_schema`). Results which don't match
+        `schema` raise ValueError, unless `strict` is False (see
+        `ArrowResultBatch.from_ds`).
+        """
+        # pyarrow is imported only when used, it's slow to import
+        from aiodatastore.export import ArrowResultBatch
+
+        return await self._run_query(
+            query,
+            lambda batch: ArrowResultBatch.from_ds(batch, schema=schema, strict=strict),
+            consistency,
+            transaction_id,
+            timeout,
+        )
+
+    async def iter_record_batches(
+        self,
+        query: Query,
+        schema: Optional["pa.Schema"] = None,
+        consistency: ReadConsistency = ReadConsistency.EVENTUAL,
+        transaction_id: Optional[str] = None,
+        timeout: Timeout = None,
+        strict: bool = True,
+        sample_size: Optional[int] = None,
+    ) -> AsyncIterator["pa.RecordBatch"]:
+        """Yields a record batch per page of query results, requires pyarrow.
+
+        Schema is inferred from the first `sample_size` results (default is
+        `aiodatastore.export.SAMPLE_SIZE`) when not given, their pages are
+        kept until then. Later pages must match it (see
+        `ArrowResultBatch.from_ds`).
+        """
+        from aiodatastore.export import (
+            SAMPLE_SIZE,
+            ArrowResultBatch,
+            RawResultBatch,
+            infer_schema,
+        )
+
+        deadline = Deadline.from_timeout(timeout)
+        query = copy.copy(query)
+
+        if schema is None:
+            if sample_size is None:
+                sample_size = SAMPLE_SIZE
+            pages: List[RawResultBatch] = []
+            sampled = 0
+            more = True
+            while more and sampled < sample_size:
+                page = await self._run_query(
+                    query, RawResultBatch.from_ds, consistency, transaction_id, deadline
+                )
+                pages.append(page)
+                sampled += len(page)
+                more = _next_page(query, page, len(page))
+
+            schema = infer_schema([e for page in pages for e in page.entities])
+            while pages:
+                page = pages.pop(0)
+                if len(page):
+                    batch = ArrowResultBatch.from_raw(
+                        page, schema=schema, strict=strict
+                    )
+                    yield batch.record_batch
+            if not more:
+                return
+
+        while True:
+            batch = await self.run_arrow_query(
+                query,
+                schema=schema,
+                consistency=consistency,
+                transaction_id=transaction_id,
+                timeout=deadline,
+                strict=strict,
+            )
+            if len(batch):
+                yield batch.record_batch
+
+            if not _next_page(query, batch, len(batch)):
+                break
+
+    async def warmup(
+        self,
+        connections: int = 1,
+        rpc: bool = False,
+        timeout: Timeout = None,
+    ) -> None:
+        """Opens keep-alive connections and fetches auth token.
+
+        With `rpc=True` also sends a cheap request (allocateIds without keys)
+        through the whole request path.
+        """
+        deadline = Deadline.from_timeout(timeout)
+
+        async def warmup() -> None:
+            await asyncio.gather(
+                self._get_headers(),
+                self._transport.warmup(self._api_url, connections),
+            )
+
+        if deadline is None:
+            await warmup()
+        else:
+            await deadline.wait_for(warmup())
+
+        if rpc:
+            await self._request(
+                self._new_call("allocateIds"),
+                lambda: {"keys": []},
+                deadline=deadline,
+            )
 
     async def close(self):
-        await self._session.close()
+        if not self._owner:
+            return
+
+        await self._transport.close()
+        if self._auth is not None:
+            await self._auth.close()
+        if self._token is not None:
+            await self._token.close()
 
     async def __aenter__(self):
         return self
@@ -0,0 +1,243 @@
+"""Columnar decoding of query results, requires numpy package.
+
+Integer, double, boolean and timestamp properties are decoded straight from
+response JSON to NumPy arrays with validity masks, other values and keys to
+object arrays, without Entity and Value objects.
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from aiodatastore.constants import MoreResultsType
+from aiodatastore.key import Key
+from aiodatastore.query import ResultBatch
+from aiodatastore.values import py_value
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+__all__ = (
+    "DTYPES",
+    "Column",
+    "ColumnBatch",
+    "concat",
+)
+
+# value type to array dtype, other values are decoded to object arrays
+DTYPES = {
+    "integerValue": "int64",
+    "doubleValue": "float64",
+    "booleanValue": "bool",
+    "timestampValue": "datetime64[us]",
+}
+VALUE_TYPES = {dtype: type_name for type_name, dtype in DTYPES.items()}
+# other value types accepted by typed arrays, integers are widened to doubles
+WIDENED_TYPES = {"float64": "integerValue"}
+# placeholders of invalid values in typed arrays
+FILL_VALUES: Dict[str, Any] = {
+    "int64": 0,
+    "float64": 0.0,
+    "bool": False,
+    "datetime64[us]": "1970-01-01T00:00:00",
+}
+
+
+def _check_deps() -> None:
+    if np is None:
+        raise RuntimeError("numpy package is required for columnar decoding")
+
+
+class Column:
+    __slots__ = ("values", "valid")
+
+    def __init__(self, values: "np.ndarray", valid: "np.ndarray") -> None:
+        self.values = values
+        self.valid = valid  # False for missing, null and other type values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def masked(self) -> "np.ma.MaskedArray":
+        return np.ma.MaskedArray(self.values, mask=~self.valid)
+
+
+def _infer_dtype(
+    entities: List[Dict[str, Any]],
+    name: str,
+    dtype: Optional[str] = None,
+) -> str:
+    # dtype of the first non-null value or `dtype` of previous pages,
+    # int64 is widened to float64 when there are doubles
+    for entity in entities:
+        value = entity.get("properties", {}).get(name)
+        if value is None or "nullValue" in value:
+            continue
+        for type_name in value:
+            if type_name.endswith("Value"):
+                value_dtype = DTYPES.get(type_name, "object")
+                if dtype is None:
+                    dtype = value_dtype
+                elif dtype == "int64" and value_dtype == "float64":
+                    dtype = value_dtype
+                break
+
+        # only int64 can be widened
+        if dtype is not None and dtype != "int64":
+            return dtype
+
+    return dtype or "object"
+
+
+def _typed_column(entities: List[Dict[str, Any]], name: str, dtype: str) -> Column:
+    type_name = VALUE_TYPES[dtype]
+    other_type_name = WIDENED_TYPES.get(dtype)
+    fill = FILL_VALUES[dtype]
+    raws: List[Any] = []
+    valid: List[bool] = []
+    for entity in entities:
+        value = entity.get("properties", {}).get(name)
+        raw = None if value is None else value.get(type_name)
+        if raw is None and value is not None and other_type_name is not None:
+            raw = value.get(other_type_name)
+        if raw is None:
+            raws.append(fill)
+            valid.append(False)
+        else:
+            raws.append(raw)
+            valid.append(True)
+
+    if dtype == "datetime64[us]":
+        # RFC3339 "Zulu" timestamps, numpy doesn't accept timezones
+        raws = [raw[:26].replace("Z", "") for raw in raws]
+
+    # numpy parses int64 strings and timestamps in bulk
+    return Column(np.array(raws, dtype=dtype), np.array(valid, dtype=bool))
+
+
+def _object_column(entities: List[Dict[str, Any]], name: str) -> Column:
+    values: List[Any] = []
+    for entity in entities:
+        value = entity.get("properties", {}).get(name)
+        values.append(None if value is None else py_value(value))
+
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return Column(column, np.array([v is not None for v in values], dtype=bool))
+
+
+def _fill_column(length: int, dtype: str) -> Column:
+    # column of invalid values, for properties missing from a batch
+    values = np.full(length, FILL_VALUES.get(dtype), dtype=dtype)
+    return Column(values, np.zeros(length, dtype=bool))
+
+
+def _key_column(entities: List[Dict[str, Any]]) -> Column:
+    column = np.empty(len(entities), dtype=object)
+    column[:] = [Key.from_ds(entity["key"]) for entity in entities]
+    return Column(column, np.ones(len(entities), dtype=bool))
+
+
+# QueryResultBatch of query decoded to a column per property
+class ColumnBatch(ResultBatch):
+    __slots__ = ("columns", "new_columns")
+
+    def __init__(
+        self,
+        columns: Optional[Dict[str, Column]] = None,
+        skipped_results: int = 0,
+        skipped_cursor: Optional[str] = None,
+        end_cursor: str = "",
+        more_results: MoreResultsType = MoreResultsType.UNSPECIFIED,
+        snapshot_version: str = "",
+        new_columns: Optional[List[str]] = None,
+    ) -> None:
+        super().__init__(
+            skipped_results, skipped_cursor, end_cursor, more_results, snapshot_version
+        )
+        self.columns = columns or {}
+        # columns which weren't in previous batches (see `from_ds`)
+        self.new_columns = new_columns or []
+
+    def __getitem__(self, name: str) -> Column:
+        return self.columns[name]
+
+    def __len__(self) -> int:
+        if not self.columns:
+            return 0
+
+        return len(next(iter(self.columns.values())))
+
+    @property
+    def dtypes(self) -> Dict[str, str]:
+        return {name: str(c.values.dtype) for name, c in self.columns.items()}
+
+    @classmethod
+    def from_ds(
+        cls,
+        data: Dict[str, Any],
+        properties: Optional[Sequence[str]] = None,
+        dtypes: Optional[Mapping[str, str]] = None,
+        inferred: Optional[Mapping[str, Optional[str]]] = None,
+    ) -> "ColumnBatch":
+        """Decodes raw QueryResultBatch to columns of `properties`.
+
+        Properties of results are used when `properties` isn't given,
+        `__key__` is a column of keys. Column dtype is one of DTYPES values
+        or "object", it's inferred from values when not set in `dtypes`.
+
+        `inferred` are dtypes of previous batches (None for properties
+        without values yet): their properties are kept as columns, their
+        dtypes are kept unless int64 is widened to float64 by doubles.
+        `new_columns` are columns which aren't in `inferred`.
+        """
+        _check_deps()
+        entities = [er["entity"] for er in data.get("entityResults", [])]
+        inferred = inferred or {}
+        if properties is None:
+            names: Dict[str, None] = dict.fromkeys(inferred)
+            for entity in entities:
+                names.update(dict.fromkeys(entity.get("properties", {})))
+            properties = list(names)
+
+        dtypes = dtypes or {}
+        columns = {}
+        for name in properties:
+            if name == "__key__":
+                columns[name] = _key_column(entities)
+                continue
+
+            dtype = dtypes.get(name) or _infer_dtype(entities, name, inferred.get(name))
+            if dtype in VALUE_TYPES:
+                columns[name] = _typed_column(entities, name, dtype)
+            else:
+                columns[name] = _object_column(entities, name)
+
+        return cls(
+            columns,
+            **cls._fields_from_ds(data),
+            new_columns=[name for name in columns if name not in inferred],
+        )
+
+
+def concat(batches: Sequence[ColumnBatch]) -> Dict[str, Column]:
+    # columns of all batches, columns missing from a batch are invalid,
+    # int64 and float64 columns are concatenated to float64
+    _check_deps()
+    dtypes: Dict[str, str] = {}
+    for batch in batches:
+        for name, dtype in batch.dtypes.items():
+            dtypes.setdefault(name, dtype)
+
+    columns = {}
+    for name, dtype in dtypes.items():
+        parts = [
+            b.columns[name] if name in b.columns else _fill_column(len(b), dtype)
+            for b in batches
+        ]
+        columns[name] = Column(
+            np.concatenate([c.values for c in parts]),
+            np.concatenate([c.valid for c in parts]),
+        )
+
+    return columns
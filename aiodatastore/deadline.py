@@ -0,0 +1,45 @@
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar, Union
+
+__all__ = (
+    "Deadline",
+    "Timeout",
+)
+
+T = TypeVar("T")
+
+
+class Deadline:
+    __slots__ = ("expires_at",)
+
+    def __init__(self, timeout: float) -> None:
+        self.expires_at = time.monotonic() + timeout
+
+    @classmethod
+    def from_timeout(cls, timeout: "Timeout") -> Optional["Deadline"]:
+        if timeout is None or isinstance(timeout, Deadline):
+            return timeout
+
+        return cls(timeout)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    async def wait_for(self, aw: Awaitable[T]) -> T:
+        # the awaitable is cancelled on expiration, so an in-flight request
+        # releases its connection instead of holding it until completion
+        remaining = self.remaining()
+        if remaining <= 0:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            raise asyncio.TimeoutError("deadline exceeded")
+
+        return await asyncio.wait_for(aw, remaining)
+
+
+Timeout = Union[float, Deadline, None]
@@ -1,7 +1,8 @@
+from base64 import b64encode
 from typing import Any, Dict, Optional
 
 from aiodatastore.key import Key
-from aiodatastore.values import VALUE_TYPES, NullValue
+from aiodatastore.values import VALUE_TYPES, NullValue, value_from_pb
 
 __all__ = (
     "Entity",
@@ -62,6 +63,13 @@ class Entity:
 
         return cls(key, properties=properties)
 
+    @classmethod
+    def from_pb(cls, pb: Any) -> "Entity":
+        # google.datastore.v1.Entity message
+        properties = {name: value_from_pb(v) for name, v in pb.properties.items()}
+        key = Key.from_pb(pb.key) if pb.HasField("key") else None
+        return cls(key, properties=properties)
+
     def to_ds(self) -> Dict[str, Any]:
         return {
             "key": self.key.to_ds() if self.key else None,
@@ -95,6 +103,15 @@ class EntityResult:
             cursor=data.get("cursor", ""),
         )
 
+    @classmethod
+    def from_pb(cls, pb: Any) -> "EntityResult":
+        # google.datastore.v1.EntityResult message, cursor is base64 as in REST
+        return cls(
+            Entity.from_pb(pb.entity),
+            version=str(pb.version) if pb.version else "",
+            cursor=b64encode(pb.cursor).decode() if pb.cursor else "",
+        )
+
     def to_ds(self) -> Dict[str, Any]:
         return {
             "entity": self.entity.to_ds(),
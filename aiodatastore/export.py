@@ -0,0 +1,401 @@
+"""Streaming export of query results to Arrow and Parquet, requires pyarrow.
+
+Results are converted page by page from response JSON to Arrow record
+batches, without Entity and Value objects, so memory use is bounded by
+page and row group size, not by query result size.
+"""
+
+import base64
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+from aiodatastore.constants import MoreResultsType
+from aiodatastore.query import Query, ResultBatch
+from aiodatastore.values import decode_timestamp
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aiodatastore.client import Datastore
+
+__all__ = (
+    "ROW_GROUP_SIZE",
+    "SAMPLE_SIZE",
+    "key_type",
+    "arrow_type",
+    "merge_types",
+    "infer_schema",
+    "RawResultBatch",
+    "ArrowResultBatch",
+    "export_parquet",
+)
+
+# rows buffered before a Parquet row group is written
+ROW_GROUP_SIZE = 10000
+# results buffered to infer schema of paged results
+SAMPLE_SIZE = 10000
+
+Converter = Callable[[Dict[str, Any]], Any]
+
+
+def _check_deps() -> None:
+    if pa is None:
+        raise RuntimeError("pyarrow package is required for Arrow export")
+
+
+def key_type() -> "pa.DataType":
+    # ids are int64, so ids and names of path elements are separate fields
+    element = pa.struct(
+        [("kind", pa.string()), ("id", pa.int64()), ("name", pa.string())]
+    )
+    return pa.struct(
+        [
+            ("project_id", pa.string()),
+            ("namespace_id", pa.string()),
+            ("path", pa.list_(element)),
+        ]
+    )
+
+
+def _geo_point_type() -> "pa.DataType":
+    return pa.struct([("latitude", pa.float64()), ("longitude", pa.float64())])
+
+
+# Datastore value type to Arrow type, arrays are lists of element type
+ARROW_TYPES: Dict[str, Callable[[], "pa.DataType"]] = {
+    "booleanValue": lambda: pa.bool_(),
+    "stringValue": lambda: pa.string(),
+    "integerValue": lambda: pa.int64(),
+    "doubleValue": lambda: pa.float64(),
+    "timestampValue": lambda: pa.timestamp("us"),
+    "blobValue": lambda: pa.binary(),
+    "keyValue": key_type,
+    "geoPointValue": _geo_point_type,
+}
+
+
+def _value_type(value: Dict[str, Any]) -> Optional[str]:
+    for name in value:
+        if name.endswith("Value"):
+            return name
+
+    return None
+
+
+def arrow_type(value: Dict[str, Any]) -> Optional["pa.DataType"]:
+    """Returns Arrow type of Datastore value, None for nulls.
+
+    Array type is a list of its element type (see `merge_types`), list of
+    nulls for empty arrays. Values without Arrow type (e.g. nested entities)
+    are None too, they're exported as nulls to fields of any type.
+    """
+    type_name = _value_type(value)
+    if type_name == "arrayValue":
+        element = pa.null()
+        for v in value["arrayValue"].get("values", []):
+            type_ = arrow_type(v)
+            if type_ is not None:
+                element = merge_types(element, type_)
+        return pa.list_(element)
+
+    factory = ARROW_TYPES.get(type_name or "")
+    return factory() if factory is not None else None
+
+
+def merge_types(type_: "pa.DataType", other: "pa.DataType") -> "pa.DataType":
+    """Returns `type_` widened to values of `other` type.
+
+    Null type (and list of nulls) is unresolved, it's replaced by `other`,
+    int64 is widened to float64, other types are kept.
+    """
+    if pa.types.is_null(type_):
+        return other
+    if pa.types.is_list(type_) and pa.types.is_list(other):
+        return pa.list_(merge_types(type_.value_type, other.value_type))
+    if pa.types.is_int64(type_) and pa.types.is_float64(other):
+        return other
+
+    return type_
+
+
+def _is_resolved(type_: "pa.DataType") -> bool:
+    # type which can't be widened by merge_types
+    if pa.types.is_list(type_):
+        return _is_resolved(type_.value_type)
+
+    return not (pa.types.is_null(type_) or pa.types.is_int64(type_))
+
+
+def _key(raw: Dict[str, Any]) -> Dict[str, Any]:
+    partition = raw["partitionId"]
+    return {
+        "project_id": partition["projectId"],
+        "namespace_id": partition.get("namespaceId", ""),
+        "path": [
+            {
+                "kind": p["kind"],
+                "id": int(p["id"]) if "id" in p else None,
+                "name": p.get("name"),
+            }
+            for p in raw["path"]
+        ],
+    }
+
+
+# other value types accepted by converters, integers are widened to doubles
+WIDENED_TYPES = {"doubleValue": "integerValue"}
+# raw value decoders of converters, other values are used as is
+DECODERS: Dict[str, Callable[[Any], Any]] = {
+    "integerValue": int,
+    "doubleValue": float,
+    "timestampValue": decode_timestamp,
+    "blobValue": base64.b64decode,
+    "keyValue": _key,
+    "geoPointValue": lambda raw: {
+        "latitude": float(raw["latitude"]),
+        "longitude": float(raw["longitude"]),
+    },
+}
+
+
+def _has_arrow_type(value: Dict[str, Any]) -> bool:
+    type_name = _value_type(value)
+    return type_name == "arrayValue" or type_name in ARROW_TYPES
+
+
+def _converter(type_: "pa.DataType", strict: bool = True) -> Converter:
+    # converts Datastore value to Python value of Arrow type, values of other
+    # Arrow types raise ValueError when strict and are None otherwise
+    def mismatch(value: Dict[str, Any]) -> None:
+        if strict and _has_arrow_type(value):
+            raise ValueError(f"{_value_type(value)} doesn't match type {type_}")
+        return None
+
+    if pa.types.is_list(type_):
+        element = _converter(type_.value_type, strict)
+
+        def convert_array(value: Dict[str, Any]) -> Any:
+            if "arrayValue" not in value:
+                return mismatch(value)
+            return [element(v) for v in value["arrayValue"].get("values", [])]
+
+        return convert_array
+
+    for type_name, factory in ARROW_TYPES.items():
+        if factory() == type_:
+            break
+    else:
+        return mismatch
+
+    decode = DECODERS.get(type_name, lambda raw: raw)
+    other_type_name = WIDENED_TYPES.get(type_name)
+
+    def convert(value: Dict[str, Any]) -> Any:
+        raw = value.get(type_name)
+        if raw is None and other_type_name is not None:
+            raw = value.get(other_type_name)
+        return mismatch(value) if raw is None else decode(raw)
+
+    return convert
+
+
+def infer_schema(
+    entities: List[Dict[str, Any]],
+    properties: Optional[Sequence[str]] = None,
+) -> "pa.Schema":
+    """Returns Arrow schema of raw entities.
+
+    `__key__` field is the first one, then `properties` or all properties of
+    entities in order of appearance. Field type is the type of the first
+    non-null value widened to types of next values (see `merge_types`),
+    properties without such values are of null type.
+    """
+    _check_deps()
+    types: Dict[str, "pa.DataType"] = {}
+    if properties is not None:
+        types = dict.fromkeys((p for p in properties if p != "__key__"), pa.null())
+    # properties of types which can't be widened anymore
+    resolved = set()
+    for entity in entities:
+        for name, value in entity.get("properties", {}).items():
+            if name in resolved or (properties is not None and name not in types):
+                continue
+            type_ = arrow_type(value)
+            if type_ is None:
+                types.setdefault(name, pa.null())
+                continue
+            type_ = merge_types(types.get(name, pa.null()), type_)
+            types[name] = type_
+            if _is_resolved(type_):
+                resolved.add(name)
+
+    fields = [pa.field("__key__", key_type())]
+    fields.extend(pa.field(name, t) for name, t in types.items())
+    return pa.schema(fields)
+
+
+# QueryResultBatch of query with raw entity results, pages are kept as is
+# until schema of several pages is inferred
+class RawResultBatch(ResultBatch):
+    __slots__ = ("entities",)
+
+    def __init__(
+        self,
+        entities: List[Dict[str, Any]],
+        skipped_results: int = 0,
+        skipped_cursor: Optional[str] = None,
+        end_cursor: str = "",
+        more_results: MoreResultsType = MoreResultsType.UNSPECIFIED,
+        snapshot_version: str = "",
+    ) -> None:
+        super().__init__(
+            skipped_results, skipped_cursor, end_cursor, more_results, snapshot_version
+        )
+        self.entities = entities
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    @classmethod
+    def from_ds(cls, data: Dict[str, Any]) -> "RawResultBatch":
+        return cls(
+            [er["entity"] for er in data.get("entityResults", [])],
+            **cls._fields_from_ds(data),
+        )
+
+
+# QueryResultBatch of query converted to Arrow record batch
+class ArrowResultBatch(ResultBatch):
+    __slots__ = ("record_batch",)
+
+    def __init__(
+        self,
+        record_batch: "pa.RecordBatch",
+        skipped_results: int = 0,
+        skipped_cursor: Optional[str] = None,
+        end_cursor: str = "",
+        more_results: MoreResultsType = MoreResultsType.UNSPECIFIED,
+        snapshot_version: str = "",
+    ) -> None:
+        super().__init__(
+            skipped_results, skipped_cursor, end_cursor, more_results, snapshot_version
+        )
+        self.record_batch = record_batch
+
+    def __len__(self) -> int:
+        return self.record_batch.num_rows
+
+    @classmethod
+    def from_ds(
+        cls,
+        data: Dict[str, Any],
+        schema: Optional["pa.Schema"] = None,
+        strict: bool = True,
+    ) -> "ArrowResultBatch":
+        """Converts raw QueryResultBatch to record batch of `schema`.
+
+        Schema is inferred from results when not given. Properties which
+        aren't in schema and values of other Arrow types raise ValueError,
+        with `strict=False` they are dropped and written as nulls.
+        """
+        return cls.from_raw(RawResultBatch.from_ds(data), schema=schema, strict=strict)
+
+    @classmethod
+    def from_raw(
+        cls,
+        batch: RawResultBatch,
+        schema: Optional["pa.Schema"] = None,
+        strict: bool = True,
+    ) -> "ArrowResultBatch":
+        # see from_ds
+        _check_deps()
+        entities = batch.entities
+        if schema is None:
+            schema = infer_schema(entities)
+        elif strict:
+            names = set(schema.names)
+            for entity in entities:
+                for name in entity.get("properties", {}):
+                    if name not in names:
+                        raise ValueError(f"property {name!r} isn't in schema")
+
+        arrays = []
+        values: List[Any]
+        for field in schema:
+            if field.name == "__key__":
+                values = [_key(entity["key"]) for entity in entities]
+            else:
+                convert = _converter(field.type, strict)
+                values = []
+                try:
+                    for entity in entities:
+                        value = entity.get("properties", {}).get(field.name)
+                        values.append(None if value is None else convert(value))
+                except ValueError as e:
+                    raise ValueError(f"property {field.name!r}: {e}") from None
+            arrays.append(pa.array(values, type=field.type))
+
+        return cls(
+            pa.RecordBatch.from_arrays(arrays, schema=schema),
+            batch.skipped_results,
+            batch.skipped_cursor,
+            batch.end_cursor,
+            batch.more_results,
+            batch.snapshot_version,
+        )
+
+
+async def export_parquet(
+    ds: "Datastore",
+    query: Query,
+    path: Any,
+    schema: Optional["pa.Schema"] = None,
+    row_group_size: int = ROW_GROUP_SIZE,
+    compression: str = "snappy",
+    **kwargs: Any,
+) -> int:
+    """Streams query results to Parquet file, returns number of rows.
+
+    Schema is inferred from the first results when not given, later pages
+    must match it (see `Datastore.iter_record_batches`). At most
+    `row_group_size` rows and sampled results are kept in memory. Extra
+    keyword arguments are passed to `Datastore.iter_record_batches`.
+    """
+    _check_deps()
+    writer = None
+    buffer: List["pa.RecordBatch"] = []
+    buffered = rows = 0
+
+    def flush() -> None:
+        nonlocal buffered
+        if buffer and writer is not None:
+            table = pa.Table.from_batches(buffer)
+            writer.write_table(table, row_group_size=row_group_size)
+            buffer.clear()
+            buffered = 0
+
+    try:
+        async for batch in ds.iter_record_batches(query, schema=schema, **kwargs):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema, compression=compression)
+            buffer.append(batch)
+            buffered += batch.num_rows
+            rows += batch.num_rows
+            if buffered >= row_group_size:
+                flush()
+
+        if writer is None:
+            # empty result, file has schema only
+            writer = pq.ParquetWriter(
+                path, schema or infer_schema([]), compression=compression
+            )
+        flush()
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return rows
@@ -0,0 +1,884 @@
+"""In-memory fake of Datastore REST API for tests and load testing.
+
+    async with FakeDatastoreServer(latency=lognormal_latency(0.005)) as server:
+        ds = Datastore("project1", api_url=server.url)
+        ...
+
+Or as a standalone process: python -m aiodatastore.fake --port 8081
+"""
+
+import argparse
+import asyncio
+import base64
+import gzip
+import hashlib
+import itertools
+import json
+import math
+import random
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from aiohttp import web
+
+from aiodatastore.transport import Response, Transport, decompress
+
+__all__ = (
+    "ERROR_CODES",
+    "ErrorInjection",
+    "FakeDatastore",
+    "FakeDatastoreServer",
+    "FakeGrpcServer",
+    "MemoryTransport",
+    "uniform_latency",
+    "lognormal_latency",
+)
+
+# https://cloud.google.com/datastore/docs/concepts/errors
+ERROR_CODES = {
+    "INVALID_ARGUMENT": 400,
+    "NOT_FOUND": 404,
+    "ALREADY_EXISTS": 409,
+    "ABORTED": 409,
+    "RESOURCE_EXHAUSTED": 429,
+    "INTERNAL": 500,
+    "UNAVAILABLE": 503,
+    "DEADLINE_EXCEEDED": 504,
+}
+
+# maximum number of results in one runQuery response batch
+MAX_BATCH_SIZE = 300
+
+# smaller responses are not compressed
+MIN_COMPRESS_SIZE = 1024
+
+# order of values of different types
+TYPE_RANKS = {
+    "nullValue": 0,
+    "integerValue": 1,
+    "doubleValue": 1,
+    "timestampValue": 2,
+    "booleanValue": 3,
+    "blobValue": 4,
+    "stringValue": 5,
+    "geoPointValue": 6,
+    "keyValue": 7,
+    "entityValue": 8,
+}
+
+Latency = Union[float, Callable[[], float], None]
+KeyId = Tuple[str, str, Tuple[Tuple[str, int, Any], ...]]
+
+
+class DatastoreError(Exception):
+    def __init__(self, status: str, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def error_body(status: str, message: str) -> Tuple[int, Dict[str, Any]]:
+    code = ERROR_CODES[status]
+    return code, {"error": {"code": code, "message": message, "status": status}}
+
+
+def uniform_latency(low: float, high: float) -> Callable[[], float]:
+    return lambda: random.uniform(low, high)
+
+
+def lognormal_latency(median: float, sigma: float = 0.5) -> Callable[[], float]:
+    # long right tail, close to real network latency distribution
+    mu = math.log(median)
+    return lambda: random.lognormvariate(mu, sigma)
+
+
+class ErrorInjection:
+    __slots__ = ("status", "rate", "rpcs")
+
+    def __init__(
+        self,
+        status: str,
+        rate: float,
+        rpcs: Optional[Iterable[str]] = None,
+    ) -> None:
+        if status not in ERROR_CODES:
+            raise ValueError(f"unsupported error status: {status}")
+
+        self.status = status
+        self.rate = rate
+        self.rpcs = frozenset(rpcs) if rpcs is not None else None
+
+    def should_fail(self, rpc: str) -> bool:
+        if self.rpcs is not None and rpc not in self.rpcs:
+            return False
+
+        return random.random() < self.rate
+
+
+def _key_id(key: Dict[str, Any]) -> KeyId:
+    partition = key.get("partitionId", {})
+    path = []
+    for el in key["path"]:
+        if "id" in el:
+            path.append((el["kind"], 0, int(el["id"])))
+        else:
+            path.append((el["kind"], 1, el.get("name", "")))
+
+    return (
+        partition.get("projectId", ""),
+        partition.get("namespaceId", ""),
+        tuple(path),
+    )
+
+
+def _is_complete(key: Dict[str, Any]) -> bool:
+    last = key["path"][-1]
+    return "id" in last or "name" in last
+
+
+def _value_type(value: Dict[str, Any]) -> str:
+    for name in value:
+        if name.endswith("Value"):
+            return name
+
+    raise DatastoreError("INVALID_ARGUMENT", f"unsupported value: {value}")
+
+
+def _sort_value(value: Dict[str, Any]) -> Tuple[int, Any]:
+    type_name = _value_type(value)
+    raw = value[type_name]
+    if type_name == "integerValue":
+        raw = int(raw)
+    elif type_name == "keyValue":
+        raw = _key_id(raw)
+    elif type_name == "geoPointValue":
+        raw = (raw["latitude"], raw["longitude"])
+    elif type_name in ("nullValue", "entityValue"):
+        raw = 0
+
+    return (TYPE_RANKS.get(type_name, 9), raw)
+
+
+def _property_values(entity: Dict[str, Any], name: str) -> List[Dict[str, Any]]:
+    if name == "__key__":
+        return [{"keyValue": entity["key"]}]
+
+    value = entity.get("properties", {}).get(name)
+    if value is None:
+        return []
+    if "arrayValue" in value:
+        # filters on array property match any of its elements
+        return value["arrayValue"].get("values", [])
+
+    return [value]
+
+
+def _scatter(entity: Dict[str, Any]) -> str:
+    return hashlib.md5(json.dumps(entity["key"], sort_keys=True).encode()).hexdigest()
+
+
+def _match_property(op: str, actual: Tuple[int, Any], expected: Tuple[int, Any]):
+    if op == "EQUAL":
+        return actual == expected
+    if actual[0] != expected[0]:
+        # inequality filters match values of the same type only
+        return False
+    if op == "LESS_THAN":
+        return actual < expected
+    if op == "LESS_THAN_OR_EQUAL":
+        return actual <= expected
+    if op == "GREATER_THAN":
+        return actual > expected
+    if op == "GREATER_THAN_OR_EQUAL":
+        return actual >= expected
+
+    raise DatastoreError("INVALID_ARGUMENT", f"unsupported filter operator: {op}")
+
+
+def _match(entity: Dict[str, Any], query_filter: Dict[str, Any]) -> bool:
+    if "compositeFilter" in query_filter:
+        composite = query_filter["compositeFilter"]
+        results = (_match(entity, f) for f in composite["filters"])
+        return any(results) if composite["op"] == "OR" else all(results)
+
+    prop_filter = query_filter["propertyFilter"]
+    name = prop_filter["property"]["name"]
+    op = prop_filter["op"]
+    if op == "HAS_ANCESTOR":
+        ancestor = _key_id(prop_filter["value"]["keyValue"])
+        key = _key_id(entity["key"])
+        depth = len(ancestor[2])
+        return key[:2] == ancestor[:2] and key[2][:depth] == ancestor[2]
+
+    expected = _sort_value(prop_filter["value"])
+    return any(
+        _match_property(op, _sort_value(v), expected)
+        for v in _property_values(entity, name)
+    )
+
+
+def _aggregate(
+    entities: List[Dict[str, Any]],
+    aggregation: Dict[str, Any],
+) -> Dict[str, Any]:
+    if "count" in aggregation:
+        count = len(entities)
+        up_to = aggregation["count"].get("upTo")
+        if up_to is not None:
+            count = min(count, int(up_to))
+        return {"integerValue": str(count)}
+
+    operator = "sum" if "sum" in aggregation else "avg"
+    name = aggregation[operator]["property"]["name"]
+    # non-numeric values are skipped
+    values = [
+        v
+        for entity in entities
+        for v in entity.get("properties", {}).get(name, {}).items()
+        if v[0] in ("integerValue", "doubleValue")
+    ]
+    numbers = [int(v) if t == "integerValue" else float(v) for t, v in values]
+    if operator == "avg":
+        if not numbers:
+            return {"nullValue": None}
+        return {"doubleValue": sum(numbers) / len(numbers)}
+
+    if all(t == "integerValue" for t, _ in values):
+        return {"integerValue": str(sum(numbers))}
+    return {"doubleValue": float(sum(numbers))}
+
+
+def _encode_cursor(position: int) -> str:
+    return base64.b64encode(str(position).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.b64decode(cursor))
+    except ValueError:
+        raise DatastoreError("INVALID_ARGUMENT", f"invalid cursor: {cursor}")
+
+
+class FakeDatastore:
+    """Storage and RPC implementations, works with REST API JSON payloads."""
+
+    RPCS = {
+        "allocateIds": "allocate_ids",
+        "reserveIds": "reserve_ids",
+        "beginTransaction": "begin_transaction",
+        "rollback": "rollback",
+        "lookup": "lookup",
+        "commit": "commit",
+        "runQuery": "run_query",
+        "runAggregationQuery": "run_aggregation_query",
+    }
+
+    def __init__(self) -> None:
+        self.entities: Dict[KeyId, Dict[str, Any]] = {}
+        self.versions: Dict[KeyId, int] = {}
+        self.transactions: Dict[str, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._transaction_ids = itertools.count(1)
+        self._version = itertools.count(1)
+
+    def clear(self) -> None:
+        self.entities.clear()
+        self.versions.clear()
+        self.transactions.clear()
+
+    def handle(
+        self,
+        rpc: str,
+        data: Dict[str, Any],
+        project_id: Optional[str] = None,
+    ) -> Tuple[int, Dict[str, Any]]:
+        """Returns HTTP status code and response payload of rpc.
+
+        `project_id` is the project of request URL, it's the default project
+        of request partition.
+        """
+        if rpc not in self.RPCS:
+            return error_body("NOT_FOUND", f"unknown method: {rpc}")
+        if project_id is not None:
+            partition = {"projectId": project_id, **data.get("partitionId", {})}
+            data = {**data, "partitionId": partition}
+
+        try:
+            return 200, getattr(self, self.RPCS[rpc])(data)
+        except DatastoreError as e:
+            return error_body(e.status, e.message)
+        except (ValueError, KeyError, TypeError) as e:
+            return error_body("INVALID_ARGUMENT", f"bad request: {e!r}")
+
+    def _allocate_id(self, key: Dict[str, Any]) -> Dict[str, Any]:
+        key = {**key, "path": [dict(el) for el in key["path"]]}
+        key["path"][-1]["id"] = str(next(self._ids))
+        return key
+
+    # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/allocateIds
+    def allocate_ids(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {"keys": [self._allocate_id(key) for key in data.get("keys", [])]}
+
+    # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/reserveIds
+    def reserve_ids(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        last_id = max(
+            (int(key["path"][-1].get("id", 0)) for key in data.get("keys", [])),
+            default=0,
+        )
+        # make sure reserved ids are never allocated
+        current = next(self._ids)
+        self._ids = itertools.count(max(current, last_id + 1))
+        return {}
+
+    # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/beginTransaction
+    def begin_transaction(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        transaction = base64.b64encode(
+            f"transaction-{next(self._transaction_ids)}".encode()
+        ).decode()
+        self.transactions[transaction] = data.get("transactionOptions", data)
+        return {"transaction": transaction}
+
+    # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/rollback
+    def rollback(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self._check_transaction(data.get("transaction"), finish=True)
+        return {}
+
+    def _check_transaction(self, transaction: Optional[str], finish: bool) -> None:
+        if transaction is None:
+            return
+        if transaction not in self.transactions:
+            raise DatastoreError("INVALID_ARGUMENT", "invalid transaction")
+        if finish:
+            del self.transactions[transaction]
+
+    def _read_options(self, data: Dict[str, Any]) -> None:
+        transaction = data.get("readOptions", {}).get("transaction")
+        self._check_transaction(transaction, finish=False)
+
+    # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/lookup
+    def lookup(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self._read_options(data)
+
+        found, missing = [], []
+        for key in data.get("keys", []):
+            key_id = _key_id(key)
+            entity = self.entities.get(key_id)
+            if entity is not None:
+                found.append({"entity": entity, "version": str(self.versions[key_id])})
+            else:
+                missing.append({"entity": {"key": key}, "version": "0"})
+
+        resp: Dict[str, Any] = {}
+        if found:
+            resp["found"] = found
+        if missing:
+            resp["missing"] = missing
+        return resp
+
+    # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/commit
+    def commit(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        transaction = data.get("transaction")
+        if data.get("mode") == "TRANSACTIONAL" and transaction is None:
+            raise DatastoreError(
+                "INVALID_ARGUMENT", "transactional commit requires a transaction"
+            )
+        self._check_transaction(transaction, finish=True)
+
+        # validate all mutations first, commit is atomic
+        mutations = []
+        for mutation in data.get("mutations", []):
+            ((operation, obj),) = (
+                (op, mutation[op])
+                for op in ("insert", "update", "upsert", "delete")
+                if op in mutation
+            )
+            key = obj if operation == "delete" else obj["key"]
+            allocated = not _is_complete(key)
+            if allocated:
+                if operation in ("update", "delete"):
+                    raise DatastoreError("INVALID_ARGUMENT", "key path is incomplete")
+                key = self._allocate_id(key)
+
+            key_id = _key_id(key)
+            exists = key_id in self.entities
+            if operation == "insert" and exists:
+                raise DatastoreError("ALREADY_EXISTS", "entity already exists")
+            if operation == "update" and not exists:
+                raise DatastoreError("NOT_FOUND", "no entity to update")
+
+            mutations.append((operation, obj, key, key_id, allocated))
+
+        results, index_updates = [], 0
+        for operation, obj, key, key_id, allocated in mutations:
+            old = self.entities.pop(key_id, None)
+            if old is not None:
+                index_updates += self._index_count(old)
+            if operation != "delete":
+                self.entities[key_id] = {
+                    "key": key,
+                    "properties": obj.get("properties") or {},
+                }
+                index_updates += self._index_count(self.entities[key_id])
+
+            version = next(self._version)
+            self.versions[key_id] = version
+            result: Dict[str, Any] = {"version": str(version)}
+            if allocated:
+                result["key"] = key
+            results.append(result)
+
+        return {"mutationResults": results, "indexUpdates": index_updates}
+
+    @staticmethod
+    def _index_count(entity: Dict[str, Any]) -> int:
+        # built-in indexes: one for kind and one per indexed property value
+        count = 1
+        for value in entity.get("properties", {}).values():
+            if "arrayValue" in value:
+                count += len(value["arrayValue"].get("values", []))
+            elif not value.get("excludeFromIndexes"):
+                count += 1
+
+        return count
+
+    # https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runQuery
+    def run_query(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self._read_options(data)
+        if "query" not in data:
+            raise DatastoreError("INVALID_ARGUMENT", "GQL queries are not supported")
+
+        query = data["query"]
+        entities = self._select(data.get("partitionId", {}), query)
+
+        projection = [p["property"]["name"] for p in query.get("projection", [])]
+        if projection == ["__key__"]:
+            result_type = "KEY_ONLY"
+        elif projection:
+            result_type = "PROJECTION"
+        else:
+            result_type = "FULL"
+
+        position = 0
+        if query.get("startCursor"):
+            position = _decode_cursor(query["startCursor"])
+        end = len(entities)
+        if query.get("endCursor"):
+            end = min(end, _decode_cursor(query["endCursor"]))
+
+        offset = int(query.get("offset", 0))
+        skipped = max(min(offset, end - position, MAX_BATCH_SIZE), 0)
+        position += skipped
+
+        limit = query.get("limit")
+        if skipped < offset and position < end:
+            # batch is full before the offset is consumed
+            page: List[Dict[str, Any]] = []
+            more_results = "NOT_FINISHED"
+        else:
+            size = MAX_BATCH_SIZE - skipped
+            if limit is not None:
+                size = min(size, int(limit))
+            stop = min(position + size, end)
+            page = entities[position:stop]
+            position += len(page)
+
+            if position >= end:
+                more_results = "NO_MORE_RESULTS"
+            elif limit is not None and len(page) >= int(limit):
+                more_results = "MORE_RESULTS_AFTER_LIMIT"
+            else:
+                more_results = "NOT_FINISHED"
+
+        batch: Dict[str, Any] = {
+            "entityResultType": result_type,
+            "entityResults": [
+                {
+                    "entity": self._project(entity, result_type, projection),
+                    "version": str(self.versions[_key_id(entity["key"])]),
+                    "cursor": _encode_cursor(position - len(page) + i + 1),
+                }
+                for i, entity in enumerate(page)
+            ],
+            "endCursor": _encode_cursor(position),
+            "moreResults": more_results,
+        }
+        if skipped:
+            batch["skippedResults"] = skipped
+            batch["skippedCursor"] = _encode_cursor(position - len(page))
+
+        return {"batch": batch}
+
+    def run_aggregation_query(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self._read_options(data)
+        if "aggregationQuery" not in data:
+            raise DatastoreError("INVALID_ARGUMENT", "GQL queries are not supported")
+
+        aggregation_query = data["aggregationQuery"]
+        query = aggregation_query["nestedQuery"]
+        entities = self._select(data.get("partitionId", {}), query)
+        offset = int(query.get("offset", 0))
+        entities = entities[offset:]
+        if query.get("limit") is not None:
+            entities = entities[: int(query["limit"])]
+
+        properties = {}
+        for i, aggregation in enumerate(aggregation_query.get("aggregations", [])):
+            alias = aggregation.get("alias") or f"property_{i + 1}"
+            properties[alias] = _aggregate(entities, aggregation)
+
+        return {
+            "batch": {
+                "aggregationResults": [{"aggregateProperties": properties}],
+                "moreResults": "NO_MORE_RESULTS",
+            }
+        }
+
+    def _select(
+        self,
+        partition: Dict[str, Any],
+        query: Dict[str, Any],
+    ) -> List[Dict[str, Any]]:
+        # filtered, sorted and distinct entities of the query, before paging
+        # requests without project (direct calls) match all projects
+        project_id = partition.get("projectId")
+        namespace = partition.get("namespaceId", "")
+        kinds = {k["name"] for k in query.get("kind", [])}
+
+        entities = [
+            entity
+            for (project, ns, path), entity in self.entities.items()
+            if project_id in (None, project)
+            and ns == namespace
+            and (not kinds or path[-1][0] in kinds)
+            and ("filter" not in query or _match(entity, query["filter"]))
+        ]
+        entities = self._sort(entities, query.get("order", []))
+
+        distinct_on = [d["name"] for d in query.get("distinctOn", [])]
+        if distinct_on:
+            entities = self._distinct(entities, distinct_on)
+
+        return entities
+
+    @staticmethod
+    def _sort(
+        entities: List[Dict[str, Any]],
+        orders: Sequence[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        # results are ordered by key when there is no explicit order
+        entities = sorted(entities, key=lambda e: _key_id(e["key"]))
+        for order in reversed(orders):
+            name = order["property"]["name"]
+            reverse = order.get("direction") == "DESCENDING"
+            if name == "__scatter__":
+                entities.sort(key=_scatter, reverse=reverse)
+                continue
+
+            # entities without the property don't match the order
+            entities = [e for e in entities if _property_values(e, name)]
+            entities.sort(
+                key=lambda e: min(_sort_value(v) for v in _property_values(e, name)),
+                reverse=reverse,
+            )
+
+        return entities
+
+    @staticmethod
+    def _distinct(
+        entities: List[Dict[str, Any]],
+        names: Sequence[str],
+    ) -> List[Dict[str, Any]]:
+        seen, result = set(), []
+        for entity in entities:
+            values = tuple(
+                json.dumps(_property_values(entity, name), sort_keys=True)
+                for name in names
+            )
+            if values not in seen:
+                seen.add(values)
+                result.append(entity)
+
+        return result
+
+    @staticmethod
+    def _project(
+        entity: Dict[str, Any],
+        result_type: str,
+        projection: Sequence[str],
+    ) -> Dict[str, Any]:
+        if result_type == "FULL":
+            return entity
+        if result_type == "KEY_ONLY":
+            return {"key": entity["key"]}
+
+        properties = {}
+        for name in projection:
+            if name == "__key__":
+                continue
+            values = _property_values(entity, name)
+            if values:
+                # projected values are returned as if they were unindexed
+                properties[name] = {**values[0], "meaning": 18}
+
+        return {"key": entity["key"], "properties": properties}
+
+
+class FakeDatastoreServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: Latency = None,
+        errors: Optional[List[ErrorInjection]] = None,
+        max_rps: Optional[float] = None,
+        datastore: Optional[FakeDatastore] = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.errors = list(errors or [])
+        self.max_rps = max_rps
+        self.datastore = datastore or FakeDatastore()
+        self.requests: Dict[str, int] = {}
+        self._tokens = max_rps or 0.0
+        self._tokens_updated_at = time.monotonic()
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def emulator_host(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.emulator_host}/v1"
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/projects/{project_rpc}", self.handle)
+        return app
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeDatastoreServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+    def _throttle(self) -> bool:
+        # token bucket with one second burst
+        if self.max_rps is None:
+            return False
+
+        now = time.monotonic()
+        elapsed = now - self._tokens_updated_at
+        self._tokens = min(self._tokens + elapsed * self.max_rps, self.max_rps)
+        self._tokens_updated_at = now
+        if self._tokens < 1:
+            return True
+
+        self._tokens -= 1
+        return False
+
+    def _delay(self) -> float:
+        if self.latency is None:
+            return 0.0
+        if callable(self.latency):
+            return max(self.latency(), 0.0)
+
+        return self.latency
+
+    @staticmethod
+    def error_response(status: str, message: str) -> web.Response:
+        code, body = error_body(status, message)
+        return web.json_response(body, status=code)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        project_id, _, rpc = request.match_info["project_rpc"].partition(":")
+        if rpc not in self.datastore.RPCS:
+            return self.error_response("NOT_FOUND", f"unknown method: {rpc}")
+
+        self.requests[rpc] = self.requests.get(rpc, 0) + 1
+        if self._throttle():
+            return self.error_response("RESOURCE_EXHAUSTED", "too many requests")
+
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+        for error in self.errors:
+            if error.should_fail(rpc):
+                return self.error_response(error.status, "injected error")
+
+        try:
+            data = await request.json()
+        except ValueError as e:
+            return self.error_response("INVALID_ARGUMENT", f"bad request: {e!r}")
+
+        code, body = self.datastore.handle(rpc, data, project_id=project_id)
+        resp = web.json_response(body, status=code)
+        if resp.content_length and resp.content_length >= MIN_COMPRESS_SIZE:
+            # coding is chosen from Accept-Encoding, if any
+            resp.enable_compression()
+        return resp
+
+
+class FakeGrpcServer:
+    """Local gRPC server backed by FakeDatastore, for tests and benchmarks.
+
+    Requires grpcio and google-cloud-datastore packages.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        datastore: Optional[FakeDatastore] = None,
+    ) -> None:
+        # gRPC stack is imported only when used
+        from aiodatastore import grpc_transport
+
+        if grpc_transport.grpc is None:
+            raise RuntimeError(
+                "grpcio and google-cloud-datastore packages are required for gRPC"
+            )
+        self._grpc = grpc_transport
+        self.host = host
+        self.port = port
+        self.datastore = datastore or FakeDatastore()
+        self._server: Any = None
+
+    @property
+    def target(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def _handler(self, rpc: str) -> Any:
+        grpc, json_format = self._grpc.grpc, self._grpc.json_format
+        request_type, response_type = self._grpc.message_types(rpc)
+
+        async def handle(request: Any, context: Any) -> Any:
+            # like REST requests, without default values
+            data = json_format.MessageToDict(request)
+            code, data = self.datastore.handle(
+                rpc, data, project_id=data.get("projectId")
+            )
+            if code != 200:
+                error = data["error"]
+                await context.abort(grpc.StatusCode[error["status"]], error["message"])
+
+            return json_format.ParseDict(
+                data, response_type(), ignore_unknown_fields=True
+            )
+
+        return grpc.unary_unary_rpc_method_handler(
+            handle,
+            request_deserializer=request_type.FromString,
+            response_serializer=response_type.SerializeToString,
+        )
+
+    async def start(self) -> None:
+        grpc, method_name = self._grpc.grpc, self._grpc.method_name
+        handlers = {method_name(rpc): self._handler(rpc) for rpc in FakeDatastore.RPCS}
+        self._server = grpc.aio.server()
+        self._server.add_generic_rpc_handlers(
+            (grpc.method_handlers_generic_handler(self._grpc.SERVICE, handlers),)
+        )
+        self.port = self._server.add_insecure_port(f"{self.host}:{self.port}")
+        await self._server.start()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            await self._server.stop(None)
+            self._server = None
+
+    async def __aenter__(self) -> "FakeGrpcServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.stop()
+
+
+class MemoryTransport(Transport):
+    """Serves client requests with FakeDatastore in process, without HTTP."""
+
+    def __init__(self, datastore: Optional[FakeDatastore] = None) -> None:
+        self.datastore = datastore or FakeDatastore()
+
+    async def request(
+        self,
+        url: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> Response:
+        path, _, rpc = url.rpartition(":")
+        project_id = path.rpartition("/projects/")[2]
+        body = decompress(body, headers.get("Content-Encoding"))
+        code, data = self.datastore.handle(rpc, json.loads(body), project_id=project_id)
+        resp_body = json.dumps(data).encode()
+        accept_gzip = "gzip" in headers.get("Accept-Encoding", "")
+        if accept_gzip and len(resp_body) >= MIN_COMPRESS_SIZE:
+            return Response(code, gzip.compress(resp_body, mtime=0), "gzip")
+
+        return Response(code, resp_body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="In-memory fake Datastore server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="median latency in seconds (lognormal distribution)",
+    )
+    parser.add_argument("--max-rps", type=float, default=None)
+    parser.add_argument(
+        "--error",
+        action="append",
+        default=[],
+        metavar="STATUS=RATE",
+        help="inject errors, e.g. --error UNAVAILABLE=0.01",
+    )
+    args = parser.parse_args()
+
+    errors = []
+    for error in args.error:
+        status, _, rate = error.partition("=")
+        errors.append(ErrorInjection(status, float(rate)))
+
+    server = FakeDatastoreServer(
+        host=args.host,
+        latency=lognormal_latency(args.latency) if args.latency else None,
+        errors=errors,
+        max_rps=args.max_rps,
+    )
+    web.run_app(server.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
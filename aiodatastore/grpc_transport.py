@@ -0,0 +1,460 @@
+"""gRPC transport, requires grpcio and google-cloud-datastore packages.
+
+Requests and responses keep REST API JSON shape on the client side and are
+converted to and from Datastore v1 protobuf messages, so blobs and int64
+values travel in binary protobuf encoding instead of base64/decimal strings.
+
+Payload dicts are converted to messages directly, without JSON encoding.
+Keys, entities and results of lookup, runQuery, commit and allocateIds are
+converted by hand, `json_format` is several times slower on them. Client
+decodes lookup, runQuery and allocateIds response messages straight to model
+objects (`from_pb` methods), without payload dicts.
+"""
+
+import base64
+import json
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from aiodatastore.transport import DataResponse, Response, Transport, decompress
+
+try:
+    import grpc
+    from google.cloud.datastore_v1.types import datastore as datastore_pb
+    from google.protobuf import json_format
+except ImportError:  # pragma: no cover
+    grpc = None  # type: ignore
+    datastore_pb = None  # type: ignore
+    json_format = None  # type: ignore
+
+__all__ = (
+    "GRPC_TARGET",
+    "SERVICE",
+    "GrpcTransport",
+    "message_types",
+    "method_name",
+    "encode_request",
+    "decode_response",
+)
+
+GRPC_TARGET = "datastore.googleapis.com:443"
+SERVICE = "google.datastore.v1.Datastore"
+
+# https://cloud.google.com/apis/design/errors#handling_errors
+HTTP_CODES = {
+    "CANCELLED": 499,
+    "UNKNOWN": 500,
+    "INVALID_ARGUMENT": 400,
+    "DEADLINE_EXCEEDED": 504,
+    "NOT_FOUND": 404,
+    "ALREADY_EXISTS": 409,
+    "PERMISSION_DENIED": 403,
+    "UNAUTHENTICATED": 401,
+    "RESOURCE_EXHAUSTED": 429,
+    "FAILED_PRECONDITION": 400,
+    "ABORTED": 409,
+    "OUT_OF_RANGE": 400,
+    "UNIMPLEMENTED": 501,
+    "INTERNAL": 500,
+    "UNAVAILABLE": 503,
+    "DATA_LOSS": 500,
+}
+
+
+def _check_deps() -> None:
+    if grpc is None:
+        raise RuntimeError(
+            "grpcio and google-cloud-datastore packages are required for gRPC"
+        )
+
+
+def method_name(rpc: str) -> str:
+    # REST method name to gRPC one: runQuery -> RunQuery
+    return rpc[0].upper() + rpc[1:]
+
+
+def message_types(rpc: str) -> Tuple[Any, Any]:
+    method = method_name(rpc)
+    request_type = getattr(datastore_pb, f"{method}Request").pb()
+    response_type = getattr(datastore_pb, f"{method}Response").pb()
+    return request_type, response_type
+
+
+def _to_dict(message: Any) -> Dict[str, Any]:
+    # default values are kept, REST decoders expect e.g. empty mutationResults
+    try:
+        return json_format.MessageToDict(
+            message, always_print_fields_with_no_presence=True
+        )
+    except TypeError:  # protobuf < 5.26
+        return json_format.MessageToDict(message, including_default_value_fields=True)
+
+
+def _error_data(status: str, message: str) -> Dict[str, Any]:
+    code = HTTP_CODES.get(status, 500)
+    return {"error": {"code": code, "message": message, "status": status}}
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode()
+
+
+# payload dicts to messages, messages are filled in place
+
+
+def _key_to_pb(data: Dict[str, Any], pb: Any) -> None:
+    partition = data.get("partitionId")
+    if partition:
+        pb.partition_id.project_id = partition.get("projectId", "")
+        pb.partition_id.namespace_id = partition.get("namespaceId", "")
+    for el in data["path"]:
+        path = pb.path.add(kind=el["kind"])
+        if "id" in el:
+            path.id = int(el["id"])
+        elif "name" in el:
+            path.name = el["name"]
+
+
+def _geo_point_to_pb(data: Dict[str, Any], pb: Any) -> None:
+    pb.latitude = data["latitude"]
+    pb.longitude = data["longitude"]
+
+
+def _array_to_pb(data: Dict[str, Any], pb: Any) -> None:
+    pb.SetInParent()
+    for value in data.get("values", []):
+        _value_to_pb(value, pb.values.add())
+
+
+def _set(field: str, convert: Callable[[Any], Any]) -> Callable[[Any, Any], None]:
+    def setter(pb: Any, raw: Any) -> None:
+        setattr(pb, field, convert(raw))
+
+    return setter
+
+
+VALUE_SETTERS: Dict[str, Callable[[Any, Any], None]] = {
+    "nullValue": _set("null_value", lambda raw: 0),
+    "booleanValue": _set("boolean_value", bool),
+    "integerValue": _set("integer_value", int),
+    "doubleValue": _set("double_value", float),
+    "stringValue": _set("string_value", str),
+    "blobValue": _set("blob_value", base64.b64decode),
+    "timestampValue": lambda pb, raw: pb.timestamp_value.FromJsonString(raw),
+    "keyValue": lambda pb, raw: _key_to_pb(raw, pb.key_value),
+    "geoPointValue": lambda pb, raw: _geo_point_to_pb(raw, pb.geo_point_value),
+    "entityValue": lambda pb, raw: _entity_to_pb(raw, pb.entity_value),
+    "arrayValue": lambda pb, raw: _array_to_pb(raw, pb.array_value),
+    "excludeFromIndexes": _set("exclude_from_indexes", bool),
+    "meaning": _set("meaning", int),
+}
+
+
+def _value_to_pb(data: Dict[str, Any], pb: Any) -> None:
+    for name, raw in data.items():
+        VALUE_SETTERS[name](pb, raw)
+
+
+def _entity_to_pb(data: Dict[str, Any], pb: Any) -> None:
+    if "key" in data:
+        _key_to_pb(data["key"], pb.key)
+    properties = pb.properties
+    for name, value in data.get("properties", {}).items():
+        _value_to_pb(value, properties[name])
+
+
+def _mutation_to_pb(data: Dict[str, Any], pb: Any) -> None:
+    for name, raw in data.items():
+        if name in ("insert", "update", "upsert"):
+            _entity_to_pb(raw, getattr(pb, name))
+        elif name == "delete":
+            _key_to_pb(raw, pb.delete)
+        else:
+            # rare fields, e.g. baseVersion, are merged into the message
+            json_format.ParseDict({name: raw}, pb, ignore_unknown_fields=True)
+
+
+def encode_request(rpc: str, data: Dict[str, Any], project_id: str) -> Any:
+    """Returns request message of rpc from REST API payload."""
+    request_type, _ = message_types(rpc)
+    request = request_type(project_id=project_id)
+    data = dict(data)
+    keys = data.pop("keys", ())
+    mutations = data.pop("mutations", ())
+    json_format.ParseDict(data, request, ignore_unknown_fields=True)
+    for key in keys:
+        _key_to_pb(key, request.keys.add())
+    for mutation in mutations:
+        _mutation_to_pb(mutation, request.mutations.add())
+
+    return request
+
+
+# messages to payload dicts, default values are omitted like in REST API
+
+
+def _timestamp(pb: Any) -> str:
+    return pb.ToJsonString()
+
+
+def _key_to_dict(pb: Any) -> Dict[str, Any]:
+    partition = {"projectId": pb.partition_id.project_id}
+    if pb.partition_id.namespace_id:
+        partition["namespaceId"] = pb.partition_id.namespace_id
+    path = []
+    for el in pb.path:
+        id_type = el.WhichOneof("id_type")
+        if id_type == "id":
+            path.append({"kind": el.kind, "id": str(el.id)})
+        elif id_type == "name":
+            path.append({"kind": el.kind, "name": el.name})
+        else:
+            path.append({"kind": el.kind})
+
+    return {"partitionId": partition, "path": path}
+
+
+VALUE_GETTERS: Dict[str, Tuple[str, Callable[[Any], Any]]] = {
+    "null_value": ("nullValue", lambda v: None),
+    "boolean_value": ("booleanValue", lambda v: v),
+    "integer_value": ("integerValue", str),
+    "double_value": ("doubleValue", lambda v: v),
+    "string_value": ("stringValue", lambda v: v),
+    "blob_value": ("blobValue", _b64),
+    "timestamp_value": ("timestampValue", _timestamp),
+    "key_value": ("keyValue", _key_to_dict),
+    "geo_point_value": (
+        "geoPointValue",
+        lambda v: {"latitude": v.latitude, "longitude": v.longitude},
+    ),
+    "entity_value": ("entityValue", lambda v: _entity_to_dict(v)),
+    "array_value": (
+        "arrayValue",
+        lambda v: {"values": [_value_to_dict(el) for el in v.values]},
+    ),
+}
+
+
+def _value_to_dict(pb: Any) -> Dict[str, Any]:
+    field = pb.WhichOneof("value_type") or "null_value"
+    name, convert = VALUE_GETTERS[field]
+    data = {name: convert(getattr(pb, field))}
+    if pb.exclude_from_indexes:
+        data["excludeFromIndexes"] = True
+    if pb.meaning:
+        data["meaning"] = pb.meaning
+
+    return data
+
+
+def _entity_to_dict(pb: Any) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    if pb.HasField("key"):
+        data["key"] = _key_to_dict(pb.key)
+    data["properties"] = {
+        name: _value_to_dict(value) for name, value in pb.properties.items()
+    }
+    return data
+
+
+def _entity_result_to_dict(pb: Any) -> Dict[str, Any]:
+    data: Dict[str, Any] = {"entity": _entity_to_dict(pb.entity)}
+    if pb.version:
+        data["version"] = str(pb.version)
+    if pb.cursor:
+        data["cursor"] = _b64(pb.cursor)
+    if pb.HasField("create_time"):
+        data["createTime"] = _timestamp(pb.create_time)
+    if pb.HasField("update_time"):
+        data["updateTime"] = _timestamp(pb.update_time)
+
+    return data
+
+
+def _enum_name(pb: Any, field: str) -> str:
+    enum_type = pb.DESCRIPTOR.fields_by_name[field].enum_type
+    return enum_type.values_by_number[getattr(pb, field)].name
+
+
+def _transaction(pb: Any, data: Dict[str, Any]) -> Dict[str, Any]:
+    # transaction begun by read request, if any
+    if pb.transaction:
+        data["transaction"] = _b64(pb.transaction)
+
+    return data
+
+
+def _lookup_to_dict(pb: Any) -> Dict[str, Any]:
+    data: Dict[str, Any] = {
+        "found": [_entity_result_to_dict(er) for er in pb.found],
+        "missing": [_entity_result_to_dict(er) for er in pb.missing],
+        "deferred": [_key_to_dict(key) for key in pb.deferred],
+    }
+    if pb.HasField("read_time"):
+        data["readTime"] = _timestamp(pb.read_time)
+
+    return _transaction(pb, data)
+
+
+def _run_query_to_dict(pb: Any) -> Dict[str, Any]:
+    batch = pb.batch
+    data: Dict[str, Any] = {
+        "entityResultType": _enum_name(batch, "entity_result_type"),
+        "entityResults": [_entity_result_to_dict(er) for er in batch.entity_results],
+        "endCursor": _b64(batch.end_cursor),
+        "moreResults": _enum_name(batch, "more_results"),
+    }
+    if batch.skipped_results:
+        data["skippedResults"] = batch.skipped_results
+    if batch.skipped_cursor:
+        data["skippedCursor"] = _b64(batch.skipped_cursor)
+    if batch.snapshot_version:
+        data["snapshotVersion"] = str(batch.snapshot_version)
+    if batch.HasField("read_time"):
+        data["readTime"] = _timestamp(batch.read_time)
+
+    return _transaction(pb, {"batch": data})
+
+
+def _mutation_result_to_dict(pb: Any) -> Dict[str, Any]:
+    data: Dict[str, Any] = {"version": str(pb.version)}
+    if pb.HasField("key"):
+        data["key"] = _key_to_dict(pb.key)
+    if pb.conflict_detected:
+        data["conflictDetected"] = True
+    if pb.HasField("create_time"):
+        data["createTime"] = _timestamp(pb.create_time)
+    if pb.HasField("update_time"):
+        data["updateTime"] = _timestamp(pb.update_time)
+
+    return data
+
+
+def _commit_to_dict(pb: Any) -> Dict[str, Any]:
+    data: Dict[str, Any] = {
+        "mutationResults": [_mutation_result_to_dict(mr) for mr in pb.mutation_results],
+        "indexUpdates": pb.index_updates,
+    }
+    if pb.HasField("commit_time"):
+        data["commitTime"] = _timestamp(pb.commit_time)
+
+    return data
+
+
+RESPONSE_DECODERS: Dict[str, Callable[[Any], Dict[str, Any]]] = {
+    "lookup": _lookup_to_dict,
+    "runQuery": _run_query_to_dict,
+    "commit": _commit_to_dict,
+    "allocateIds": lambda pb: {"keys": [_key_to_dict(key) for key in pb.keys]},
+}
+
+
+def decode_response(rpc: str, response: Any) -> Dict[str, Any]:
+    """Returns REST API payload of rpc response message."""
+    decode = RESPONSE_DECODERS.get(rpc)
+    return decode(response) if decode is not None else _to_dict(response)
+
+
+class GrpcTransport(Transport):
+    """Sends requests to Datastore gRPC API.
+
+    Secure channel to `target` is used by default, `insecure=True` is for
+    local servers.
+    """
+
+    encodes_payload = True
+
+    def __init__(
+        self,
+        target: str = GRPC_TARGET,
+        insecure: bool = False,
+        options: Optional[Any] = None,
+    ) -> None:
+        _check_deps()
+        self.target = target
+        self.insecure = insecure
+        self.options = options
+        self._channel: Any = None
+        self._calls: Dict[str, Any] = {}
+
+    def _get_channel(self) -> Any:
+        # channel is created lazily, inside event loop
+        if self._channel is None:
+            if self.insecure:
+                self._channel = grpc.aio.insecure_channel(
+                    self.target, options=self.options
+                )
+            else:
+                self._channel = grpc.aio.secure_channel(
+                    self.target, grpc.ssl_channel_credentials(), options=self.options
+                )
+
+        return self._channel
+
+    def _get_call(self, rpc: str) -> Any:
+        call = self._calls.get(rpc)
+        if call is None:
+            request_type, response_type = message_types(rpc)
+            call = self._calls[rpc] = self._get_channel().unary_unary(
+                f"/{SERVICE}/{method_name(rpc)}",
+                request_serializer=request_type.SerializeToString,
+                response_deserializer=response_type.FromString,
+            )
+
+        return call
+
+    async def request_data(
+        self,
+        url: str,
+        data: Dict[str, Any],
+        headers: Mapping[str, str],
+        message: bool = False,
+    ) -> DataResponse:
+        # url is .../projects/{project_id}:{rpc}
+        project_id, _, rpc = url.rpartition("/")[2].partition(":")
+        try:
+            request = encode_request(rpc, data, project_id)
+        except (json_format.ParseError, TypeError, ValueError) as e:
+            # invalid payload, e.g. malformed transaction, as REST API answers it
+            return DataResponse(400, _error_data("INVALID_ARGUMENT", str(e)))
+        metadata = [("x-goog-request-params", f"project_id={project_id}")]
+        if "Authorization" in headers:
+            metadata.append(("authorization", headers["Authorization"]))
+
+        call = self._get_call(rpc)
+        try:
+            response = await call(request, metadata=metadata)
+        except grpc.aio.AioRpcError as e:
+            status = e.code().name
+            return DataResponse(
+                HTTP_CODES.get(status, 500), _error_data(status, e.details())
+            )
+
+        return DataResponse(
+            200,
+            {} if message else decode_response(rpc, response),
+            request_size=request.ByteSize(),
+            response_size=response.ByteSize(),
+            message=response if message else None,
+        )
+
+    async def request(
+        self,
+        url: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> Response:
+        # JSON body interface, e.g. for RecordingTransport wrapping this one
+        body = decompress(body, headers.get("Content-Encoding"))
+        data = json.loads(body) if body else {}
+        resp = await self.request_data(url, data, headers)
+        return Response(resp.status, json.dumps(resp.data).encode())
+
+    async def warmup(self, url: str, connections: int) -> None:
+        # single channel multiplexes all requests
+        await self._get_channel().channel_ready()
+
+    async def close(self) -> None:
+        if self._channel is not None:
+            await self._channel.close()
+            self._channel = None
+            self._calls.clear()
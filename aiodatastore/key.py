@@ -1,11 +1,22 @@
-from typing import Any, Dict, List, Optional
+import functools
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 __all__ = (
     "PartitionId",
     "PathElement",
     "Key",
+    "KeyTuple",
+    "SortKey",
+    "key_tuple",
 )
 
+# (project_id, namespace_id, ((kind, id or name), ...)), ids are ints
+KeyTuple = Tuple[str, str, Tuple[Tuple[str, Union[int, str, None]], ...]]
+# (kind, 0, int id) or (kind, 1, name), ids sort before names
+ElementSortKey = Tuple[str, int, Union[int, str]]
+# (project_id, namespace_id, (element sort key, ...))
+SortKey = Tuple[str, str, Tuple[ElementSortKey, ...]]
+
 
 # https://cloud.google.com/datastore/docs/reference/data/rest/Shared.Types/Value#PartitionId
 class PartitionId:
@@ -26,6 +37,11 @@ class PartitionId:
     def from_ds(cls, data: Dict[str, Any]) -> "PartitionId":
         return cls(data["projectId"], namespace_id=data.get("namespaceId"))
 
+    @classmethod
+    def from_pb(cls, pb: Any) -> "PartitionId":
+        # google.datastore.v1.PartitionId message, empty namespace is omitted
+        return cls(pb.project_id, namespace_id=pb.namespace_id or None)
+
     def to_ds(self) -> Dict[str, str]:
         data = {"projectId": self.project_id}
         if self.namespace_id is not None:
@@ -35,6 +51,7 @@ class PartitionId:
 
 
 # https://cloud.google.com/datastore/docs/reference/data/rest/Shared.Types/Value#pathelement
+@functools.total_ordering
 class PathElement:
     __slots__ = ("kind", "id", "name")
 
@@ -60,6 +77,18 @@ class PathElement:
             and self.name == other.name
         )
 
+    def __lt__(self, other: Any) -> bool:
+        if not isinstance(other, PathElement):
+            return NotImplemented
+        return self.sort_key() < other.sort_key()
+
+    def sort_key(self) -> ElementSortKey:
+        # Datastore order: kind, then ids (numerically) before names,
+        # incomplete elements sort as empty names
+        if self.id is not None:
+            return (self.kind, 0, int(self.id))
+        return (self.kind, 1, self.name or "")
+
     def _validate_id(self):
         try:
             int(self.id)
@@ -77,6 +106,17 @@ class PathElement:
             validate_id=False,
         )
 
+    @classmethod
+    def from_pb(cls, pb: Any) -> "PathElement":
+        # google.datastore.v1.Key.PathElement message, ids are strings as in REST
+        id_type = pb.WhichOneof("id_type")
+        if id_type == "id":
+            return cls(pb.kind, id=str(pb.id), validate_id=False)
+        if id_type == "name":
+            return cls(pb.kind, name=pb.name)
+
+        return cls(pb.kind)
+
     def to_ds(self) -> Dict[str, str]:
         data = {"kind": self.kind}
         if self.id is not None:
@@ -88,6 +128,7 @@ class PathElement:
 
 
 # https://cloud.google.com/datastore/docs/reference/data/rest/Shared.Types/Value#Key
+@functools.total_ordering
 class Key:
     __slots__ = ("partition_id", "path")
 
@@ -110,6 +151,24 @@ class Key:
             and self.path == other.path
         )
 
+    def __lt__(self, other: Any) -> bool:
+        if not isinstance(other, Key):
+            return NotImplemented
+        return self.sort_key() < other.sort_key()
+
+    def sort_key(self) -> SortKey:
+        """Returns tuple which compares like keys in Datastore.
+
+        Keys are ordered by partition, then path element by element, so
+        ancestors sort before their descendants. Use it as `key=` argument
+        of `sorted` for large lists, it's faster than comparing Key objects.
+        """
+        return (
+            self.partition_id.project_id,
+            self.partition_id.namespace_id or "",
+            tuple(el.sort_key() for el in self.path),
+        )
+
     def _validate_path(self):
         if not self.path:
             raise ValueError("`path` value of Key can never be empty")
@@ -125,8 +184,30 @@ class Key:
             validate_path=False,
         )
 
+    @classmethod
+    def from_pb(cls, pb: Any) -> "Key":
+        # google.datastore.v1.Key message
+        return cls(
+            partition_id=PartitionId.from_pb(pb.partition_id),
+            path=[PathElement.from_pb(path) for path in pb.path],
+            validate_path=False,
+        )
+
     def to_ds(self) -> Dict[str, Any]:
         return {
             "partitionId": self.partition_id.to_ds(),
             "path": [path.to_ds() for path in self.path],
         }
+
+
+def key_tuple(data: Dict[str, Any]) -> KeyTuple:
+    # compact hashable key, decoded without Key/PathElement objects
+    partition = data["partitionId"]
+    return (
+        partition["projectId"],
+        partition.get("namespaceId", ""),
+        tuple(
+            (p["kind"], int(p["id"]) if "id" in p else p.get("name"))
+            for p in data["path"]
+        ),
+    )
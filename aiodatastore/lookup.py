@@ -28,3 +28,12 @@ class LookupResult:
             missing=[EntityResult.from_ds(m) for m in data.get("missing", [])],
             deferred=[Key.from_ds(d) for d in data.get("deferred", [])],
         )
+
+    @classmethod
+    def from_pb(cls, pb: Any) -> "LookupResult":
+        # google.datastore.v1.LookupResponse message
+        return cls(
+            found=[EntityResult.from_pb(f) for f in pb.found],
+            missing=[EntityResult.from_pb(m) for m in pb.missing],
+            deferred=[Key.from_pb(d) for d in pb.deferred],
+        )
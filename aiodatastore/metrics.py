@@ -0,0 +1,222 @@
+import bisect
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+__all__ = (
+    "RPCCall",
+    "Middleware",
+    "Histogram",
+    "RPCMetrics",
+    "MetricsCollector",
+)
+
+# latency bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class RPCCall:
+    __slots__ = (
+        "rpc",
+        "project_id",
+        "namespace",
+        "kind",
+        "key_count",
+        "entity_count",
+        "query",
+        "request_size",
+        "response_size",
+        "request_wire_size",
+        "response_wire_size",
+        "status",
+        "serialize_time",
+        "encode_time",
+        "compress_time",
+        "auth_time",
+        "network_time",
+        "parse_time",
+        "decode_time",
+        "result",
+    )
+
+    def __init__(
+        self,
+        rpc: str,
+        project_id: str,
+        namespace: str = "",
+        kind: Optional[str] = None,
+        key_count: int = 0,
+        entity_count: int = 0,
+    ) -> None:
+        self.rpc = rpc
+        self.project_id = project_id
+        self.namespace = namespace
+        self.kind = kind
+        self.key_count = key_count
+        self.entity_count = entity_count
+        self.query: Any = None  # query of runQuery and runAggregationQuery calls
+        self.request_size = 0
+        self.response_size = 0
+        self.request_wire_size = 0  # after compression
+        self.response_wire_size = 0
+        self.status: Optional[int] = None
+        self.serialize_time = 0.0  # to_ds() of request objects
+        self.encode_time = 0.0  # JSON encoding of request
+        self.compress_time = 0.0  # gzip of request and response bodies
+        self.auth_time = 0.0
+        self.network_time = 0.0
+        self.parse_time = 0.0  # JSON decoding of response
+        self.decode_time = 0.0  # from_ds() of response objects
+        self.result: Any = None
+
+
+CallNext = Callable[[RPCCall], Awaitable[Any]]
+# async def middleware(call: RPCCall, call_next: CallNext) -> Any
+Middleware = Callable[[RPCCall, CallNext], Awaitable[Any]]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q: float) -> float:
+        # upper bound of the bucket containing the q-th percentile
+        if not self.count:
+            return 0.0
+
+        rank = q / 100 * self.count
+        total = 0
+        for i, count in enumerate(self.counts):
+            total += count
+            if total >= rank and count:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+
+        return float("inf")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": list(zip(self.buckets + (float("inf"),), self.counts)),
+        }
+
+
+def _ratio(size: int, wire_size: int) -> Optional[float]:
+    # None when transport doesn't report wire size
+    if not size:
+        return 1.0
+    return size / wire_size if wire_size else None
+
+
+class RPCMetrics:
+    __slots__ = (
+        "latency",
+        "auth",
+        "network",
+        "decode",
+        "request_bytes",
+        "response_bytes",
+        "request_wire_bytes",
+        "response_wire_bytes",
+        "statuses",
+    )
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.latency = Histogram(buckets)
+        self.auth = Histogram(buckets)
+        self.network = Histogram(buckets)
+        self.decode = Histogram(buckets)
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.request_wire_bytes = 0
+        self.response_wire_bytes = 0
+        self.statuses: Dict[Optional[int], int] = {}
+
+    def record(self, call: RPCCall, latency: float) -> None:
+        self.latency.observe(latency)
+        self.auth.observe(call.auth_time)
+        self.network.observe(call.network_time)
+        self.decode.observe(call.parse_time + call.decode_time)
+        self.request_bytes += call.request_size
+        self.response_bytes += call.response_size
+        self.request_wire_bytes += call.request_wire_size
+        self.response_wire_bytes += call.response_wire_size
+        self.statuses[call.status] = self.statuses.get(call.status, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency": self.latency.to_dict(),
+            "auth": self.auth.to_dict(),
+            "network": self.network.to_dict(),
+            "decode": self.decode.to_dict(),
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "request_wire_bytes": self.request_wire_bytes,
+            "response_wire_bytes": self.response_wire_bytes,
+            "compression_ratio": {
+                "request": _ratio(self.request_bytes, self.request_wire_bytes),
+                "response": _ratio(self.response_bytes, self.response_wire_bytes),
+            },
+            "statuses": dict(self.statuses),
+        }
+
+
+class MetricsCollector:
+    """In-memory collector, keeps metrics per (rpc, project, namespace, kind)."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self._buckets = buckets
+        self.metrics: Dict[Tuple[str, str, str, Optional[str]], RPCMetrics] = {}
+
+    async def __call__(self, call: RPCCall, call_next: CallNext) -> Any:
+        start = time.perf_counter()
+        try:
+            return await call_next(call)
+        finally:
+            self.record(call, time.perf_counter() - start)
+
+    def record(self, call: RPCCall, latency: float) -> None:
+        key = (call.rpc, call.project_id, call.namespace, call.kind)
+        metrics = self.metrics.get(key)
+        if metrics is None:
+            metrics = self.metrics[key] = RPCMetrics(self._buckets)
+
+        metrics.record(call, latency)
+
+    def reset(self) -> None:
+        self.metrics.clear()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "rpc": rpc,
+                "project_id": project_id,
+                "namespace": namespace,
+                "kind": kind,
+                **m.to_dict(),
+            }
+            for (rpc, project_id, namespace, kind), m in self.metrics.items()
+        ]
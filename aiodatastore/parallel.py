@@ -0,0 +1,257 @@
+"""Scans split queries in a pool of processes.
+
+Decoding of results is CPU-bound, so a single event loop is limited to one
+core. Query is split into key ranges (see `split_query`), ranges are scanned
+by worker processes, each with its own event loop and client (created once
+per process and reused for its ranges), and results (or values of `map_fn`)
+are streamed back through a bounded queue or reduced in workers.
+
+Client factory, `map_fn` and `reduce_fn` are sent to worker processes, so
+they must be picklable: module level functions or `functools.partial` of
+them (e.g. `functools.partial(Datastore, "project", service_file=path)`).
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import multiprocessing.util
+import os
+import pickle
+import queue as queue_module
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+)
+
+from aiodatastore.entity import EntityResult
+from aiodatastore.query import Query
+from aiodatastore.split import split_query
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aiodatastore.client import Datastore
+
+__all__ = (
+    "RANGES_PER_PROCESS",
+    "process_scan",
+    "map_reduce",
+)
+
+# key ranges per process, more ranges balance uneven ranges better
+RANGES_PER_PROCESS = 4
+# results sent to parent process at once
+CHUNK_SIZE = 500
+# chunks buffered for parent process
+BUFFER_SIZE = 16
+# seconds between checks of worker failures, while waiting for results
+POLL_INTERVAL = 0.1
+
+ClientFactory = Callable[[], "Datastore"]
+MapFn = Callable[[EntityResult], Any]
+ReduceFn = Callable[[Any, Any], Any]
+
+
+# event loop and client of worker process, reused by scans of key ranges
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_client: Optional["Datastore"] = None
+_client_factory = b""  # pickled factory of _client
+
+
+async def _new_client(factory: ClientFactory) -> "Datastore":
+    # created inside event loop, as in `async with factory()`
+    return factory()
+
+
+def _close_worker() -> None:
+    if _loop is None:
+        return
+    if _client is not None:
+        _loop.run_until_complete(_client.close())
+    _loop.close()
+
+
+def _init_worker(factory: ClientFactory) -> None:
+    # runs in worker process, client of another factory (e.g. in shared
+    # executor) is closed and replaced
+    global _loop, _client, _client_factory
+    key = pickle.dumps(factory)
+    if _client is not None and key == _client_factory:
+        return
+
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+        # worker processes exit without atexit handlers
+        multiprocessing.util.Finalize(None, _close_worker, exitpriority=0)
+    if _client is not None:
+        _loop.run_until_complete(_client.close())
+    _client = _loop.run_until_complete(_new_client(factory))
+    _client_factory = key
+
+
+async def _scan_range(
+    ds: "Datastore",
+    query: Query,
+    map_fn: Optional[MapFn],
+    reduce_fn: Optional[ReduceFn],
+    channel: Any,
+    kwargs: Dict[str, Any],
+) -> List[Any]:
+    # results are sent to channel, or reduced value is returned (if any)
+    reduced: List[Any] = []
+    chunk: List[Any] = []
+    async for entity_result in ds.iter_query(query, **kwargs):
+        value = map_fn(entity_result) if map_fn is not None else entity_result
+        if reduce_fn is None:
+            chunk.append(value)
+            if len(chunk) >= CHUNK_SIZE:
+                channel.put(chunk)
+                chunk = []
+        elif reduced:
+            reduced[0] = reduce_fn(reduced[0], value)
+        else:
+            reduced.append(value)
+
+    if chunk:
+        channel.put(chunk)
+    return reduced
+
+
+def _worker(
+    factory: ClientFactory,
+    query: Query,
+    map_fn: Optional[MapFn],
+    reduce_fn: Optional[ReduceFn],
+    channel: Any,
+    kwargs: Dict[str, Any],
+) -> List[Any]:
+    # runs in worker process, shared executor workers are initialized here
+    _init_worker(factory)
+    assert _loop is not None and _client is not None
+    return _loop.run_until_complete(
+        _scan_range(_client, query, map_fn, reduce_fn, channel, kwargs)
+    )
+
+
+def _pool(factory: ClientFactory, processes: int) -> Executor:
+    return ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(factory,))
+
+
+async def _split(
+    factory: ClientFactory,
+    query: Query,
+    processes: int,
+    splits: Optional[int],
+) -> List[Query]:
+    async with factory() as ds:
+        return await split_query(ds, query, splits or processes * RANGES_PER_PROCESS)
+
+
+async def _shutdown(
+    pool: Executor,
+    futures: List["Future[Any]"],
+    owned: bool,
+) -> None:
+    for future in futures:
+        future.cancel()
+    if owned:
+        # running workers are waited for without blocking event loop
+        await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
+
+
+async def process_scan(
+    factory: ClientFactory,
+    query: Query,
+    map_fn: Optional[MapFn] = None,
+    processes: Optional[int] = None,
+    splits: Optional[int] = None,
+    buffer_size: int = BUFFER_SIZE,
+    executor: Optional[Executor] = None,
+    **kwargs: Any,
+) -> AsyncIterator[Any]:
+    """Scans query in worker processes and yields results as they arrive.
+
+    Query is split into `splits` key ranges (`processes * RANGES_PER_PROCESS`
+    by default), yielded items are entity results or values of `map_fn`, in
+    no particular order. At most `buffer_size` chunks of results are
+    buffered. Worker exceptions are raised in the caller. Extra keyword
+    arguments are passed to `Datastore.iter_query` in workers.
+
+    Every worker process creates its event loop and client once and reuses
+    them for all its ranges. Workers of `executor` create them on their
+    first range and keep them until a range with another factory.
+    """
+    processes = processes or os.cpu_count() or 1
+    queries = await _split(factory, query, processes, splits)
+    pool = executor or _pool(factory, processes)
+    loop = asyncio.get_running_loop()
+    manager = multiprocessing.Manager()
+    futures: List["Future[Any]"] = []
+    try:
+        channel = manager.Queue(maxsize=buffer_size)
+        futures = [
+            pool.submit(_worker, factory, q, map_fn, None, channel, kwargs)
+            for q in queries
+        ]
+        get = functools.partial(channel.get, True, POLL_INTERVAL)
+        while True:
+            try:
+                chunk = await loop.run_in_executor(None, get)
+            except queue_module.Empty:
+                done = [f for f in futures if f.done()]
+                for future in done:
+                    future.result()
+                # chunks are put before worker is done
+                if len(done) == len(futures) and channel.empty():
+                    break
+                continue
+
+            for item in chunk:
+                yield item
+    finally:
+        # workers blocked on full channel fail when manager is stopped
+        manager.shutdown()
+        await _shutdown(pool, futures, owned=executor is None)
+
+
+async def map_reduce(
+    factory: ClientFactory,
+    query: Query,
+    map_fn: MapFn,
+    reduce_fn: ReduceFn,
+    initial: Any = None,
+    processes: Optional[int] = None,
+    splits: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    **kwargs: Any,
+) -> Any:
+    """Maps query results and reduces them in worker processes.
+
+    `reduce_fn` must be associative: values of each key range are reduced in
+    a worker, then values of ranges are reduced in the caller, starting with
+    `initial` when given. Returns None for empty results without `initial`.
+    """
+    processes = processes or os.cpu_count() or 1
+    queries = await _split(factory, query, processes, splits)
+    pool = executor or _pool(factory, processes)
+    futures: List["Future[Any]"] = []
+    try:
+        futures = [
+            pool.submit(_worker, factory, q, map_fn, reduce_fn, None, kwargs)
+            for q in queries
+        ]
+        results = await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+    finally:
+        await _shutdown(pool, futures, owned=executor is None)
+
+    values = [value for reduced in results for value in reduced]
+    if initial is not None:
+        return functools.reduce(reduce_fn, values, initial)
+    if not values:
+        return None
+    return functools.reduce(reduce_fn, values)
@@ -0,0 +1,98 @@
+import sys
+import time
+from typing import IO, Any, Dict, List, Optional
+
+from aiodatastore.metrics import CallNext, RPCCall
+
+__all__ = (
+    "PHASES",
+    "RPCProfile",
+    "Profiler",
+)
+
+PHASES = ("serialize", "encode", "compress", "auth", "network", "parse", "decode")
+
+
+class RPCProfile:
+    __slots__ = ("count", "total", "phases", "request_bytes", "response_bytes")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def record(self, call: RPCCall, total: float) -> None:
+        self.count += 1
+        self.total += total
+        for phase in PHASES:
+            self.phases[phase] += getattr(call, f"{phase}_time")
+        self.request_bytes += call.request_size
+        self.response_bytes += call.response_size
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "phases": dict(self.phases),
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+        }
+
+
+class Profiler:
+    """Middleware that splits time of every request into phases.
+
+    serialize: to_ds() of keys, entities and queries
+    encode:    JSON encoding of request body
+    compress:  gzip of request and response bodies
+    auth:      getting auth headers (token refresh)
+    network:   sending request and reading response body
+    parse:     JSON decoding of response body
+    decode:    from_ds() of response objects
+    """
+
+    def __init__(self) -> None:
+        self.profiles: Dict[str, RPCProfile] = {}
+
+    async def __call__(self, call: RPCCall, call_next: CallNext) -> Any:
+        start = time.perf_counter()
+        try:
+            return await call_next(call)
+        finally:
+            total = time.perf_counter() - start
+            profile = self.profiles.get(call.rpc)
+            if profile is None:
+                profile = self.profiles[call.rpc] = RPCProfile()
+            profile.record(call, total)
+
+    def reset(self) -> None:
+        self.profiles.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {rpc: p.to_dict() for rpc, p in self.profiles.items()}
+
+    def report(self) -> str:
+        header = ["rpc", "calls", "total ms", "avg ms"]
+        header.extend(f"{phase} %" for phase in PHASES)
+        header.append("other %")
+
+        rows: List[List[str]] = [header]
+        for rpc, p in sorted(self.profiles.items()):
+            row = [rpc, str(p.count), f"{p.total * 1000:.1f}"]
+            row.append(f"{p.total * 1000 / p.count:.2f}")
+            other = p.total - sum(p.phases.values())
+            for value in list(p.phases.values()) + [other]:
+                share = value / p.total * 100 if p.total else 0.0
+                row.append(f"{share:.1f}")
+            rows.append(row)
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        return "\n".join(
+            "  ".join(cell.rjust(width) for cell, width in zip(row, widths))
+            for row in rows
+        )
+
+    def dump(self, file: Optional[IO[str]] = None) -> None:
+        print(self.report(), file=file or sys.stderr)
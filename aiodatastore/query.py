@@ -1,10 +1,14 @@
-from typing import Any, Dict, List, Optional, Union
+import collections
+import functools
+from base64 import b64encode
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type, Union
 
 from aiodatastore.constants import MoreResultsType, ResultType
 from aiodatastore.entity import EntityResult
 from aiodatastore.filters import CompositeFilter, PropertyFilter
+from aiodatastore.key import Key, KeyTuple, key_tuple
 from aiodatastore.property import PropertyReference, PropertyOrder
-from aiodatastore.values import Value
+from aiodatastore.values import Value, py_value
 
 __all__ = (
     "Projection",
@@ -12,7 +16,11 @@ __all__ = (
     "Query",
     "GqlQueryParameter",
     "GQLQuery",
+    "ResultBatch",
     "QueryResultBatch",
+    "KeyQueryResultBatch",
+    "ProjectionQueryResultBatch",
+    "row_type",
 )
 
 
@@ -162,11 +170,25 @@ class GQLQuery:
         }
 
 
-# https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runQuery#QueryResultBatch
-class QueryResultBatch:
+# protobuf enum numbers of QueryResultBatch fields
+PB_RESULT_TYPES = {
+    0: ResultType.UNSPECIFIED,
+    1: ResultType.FULL,
+    2: ResultType.PROJECTION,
+    3: ResultType.KEY_ONLY,
+}
+PB_MORE_RESULTS = {
+    0: MoreResultsType.UNSPECIFIED,
+    1: MoreResultsType.NOT_FINISHED,
+    2: MoreResultsType.MORE_RESULTS_AFTER_LIMIT,
+    3: MoreResultsType.NO_MORE_RESULTS,
+    4: MoreResultsType.MORE_RESULTS_AFTER_CURSOR,
+}
+
+
+# query results with QueryResultBatch metadata, results are decoded by subclasses
+class ResultBatch:
     __slots__ = (
-        "entity_results",
-        "entity_result_type",
         "skipped_results",
         "skipped_cursor",
         "end_cursor",
@@ -178,32 +200,87 @@ class QueryResultBatch:
         self,
         skipped_results: int = 0,
         skipped_cursor: Optional[str] = None,
-        entity_result_type: ResultType = ResultType.UNSPECIFIED,
-        entity_results: Optional[List[EntityResult]] = None,
         end_cursor: str = "",
         more_results: MoreResultsType = MoreResultsType.UNSPECIFIED,
         snapshot_version: str = "",
     ) -> None:
         self.skipped_results = skipped_results
         self.skipped_cursor = skipped_cursor
-        self.entity_result_type = entity_result_type
-        self.entity_results = entity_results or []
         self.end_cursor = end_cursor
         self.more_results = more_results
         self.snapshot_version = snapshot_version
 
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @staticmethod
+    def _fields_from_ds(data: Dict[str, Any]) -> Dict[str, Any]:
+        # metadata fields of raw QueryResultBatch, as __init__ arguments
+        return {
+            "skipped_results": int(data.get("skippedResults", 0)),
+            "skipped_cursor": data.get("skippedCursor"),
+            "end_cursor": data["endCursor"],
+            "more_results": MoreResultsType(data["moreResults"]),
+            "snapshot_version": data.get("snapshotVersion", ""),
+        }
+
+    @staticmethod
+    def _fields_from_pb(pb: Any) -> Dict[str, Any]:
+        # metadata fields of QueryResultBatch message, cursors are base64 as in REST
+        return {
+            "skipped_results": pb.skipped_results,
+            "skipped_cursor": (
+                b64encode(pb.skipped_cursor).decode() if pb.skipped_cursor else None
+            ),
+            "end_cursor": b64encode(pb.end_cursor).decode(),
+            "more_results": PB_MORE_RESULTS[pb.more_results],
+            "snapshot_version": str(pb.snapshot_version) if pb.snapshot_version else "",
+        }
+
+
+# https://cloud.google.com/datastore/docs/reference/data/rest/v1/projects/runQuery#QueryResultBatch
+class QueryResultBatch(ResultBatch):
+    __slots__ = (
+        "entity_results",
+        "entity_result_type",
+    )
+
+    def __init__(
+        self,
+        skipped_results: int = 0,
+        skipped_cursor: Optional[str] = None,
+        entity_result_type: ResultType = ResultType.UNSPECIFIED,
+        entity_results: Optional[List[EntityResult]] = None,
+        end_cursor: str = "",
+        more_results: MoreResultsType = MoreResultsType.UNSPECIFIED,
+        snapshot_version: str = "",
+    ) -> None:
+        super().__init__(
+            skipped_results, skipped_cursor, end_cursor, more_results, snapshot_version
+        )
+        self.entity_result_type = entity_result_type
+        self.entity_results = entity_results or []
+
+    def __len__(self) -> int:
+        return len(self.entity_results)
+
     @classmethod
     def from_ds(cls, data: Dict[str, Any]) -> "QueryResultBatch":
         return cls(
-            skipped_results=int(data.get("skippedResults", 0)),
-            skipped_cursor=data.get("skippedCursor"),
             entity_result_type=ResultType(data["entityResultType"]),
             entity_results=[
                 EntityResult.from_ds(er) for er in data.get("entityResults", [])
             ],
-            end_cursor=data["endCursor"],
-            more_results=MoreResultsType(data["moreResults"]),
-            snapshot_version=data.get("snapshotVersion", ""),
+            **cls._fields_from_ds(data),
+        )
+
+    @classmethod
+    def from_pb(cls, pb: Any) -> "QueryResultBatch":
+        # google.datastore.v1.QueryResultBatch message
+        return cls(
+            entity_result_type=PB_RESULT_TYPES[pb.entity_result_type],
+            entity_results=[EntityResult.from_pb(er) for er in pb.entity_results],
+            **cls._fields_from_pb(pb),
         )
 
     def to_ds(self) -> Dict[str, Any]:
@@ -219,3 +296,110 @@ class QueryResultBatch:
             data["skippedCursor"] = self.skipped_cursor
 
         return data
+
+
+# QueryResultBatch of keys-only query, decoded without EntityResult/Entity wrappers
+class KeyQueryResultBatch(ResultBatch):
+    __slots__ = ("keys",)
+
+    def __init__(
+        self,
+        keys: Optional[List[Union[Key, KeyTuple]]] = None,
+        skipped_results: int = 0,
+        skipped_cursor: Optional[str] = None,
+        end_cursor: str = "",
+        more_results: MoreResultsType = MoreResultsType.UNSPECIFIED,
+        snapshot_version: str = "",
+    ) -> None:
+        super().__init__(
+            skipped_results, skipped_cursor, end_cursor, more_results, snapshot_version
+        )
+        self.keys = keys or []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_ds(
+        cls, data: Dict[str, Any], tuples: bool = False
+    ) -> "KeyQueryResultBatch":
+        decode = key_tuple if tuples else Key.from_ds
+        return cls(
+            keys=[decode(er["entity"]["key"]) for er in data.get("entityResults", [])],
+            **cls._fields_from_ds(data),
+        )
+
+
+@functools.lru_cache(maxsize=256)
+def row_type(properties: Tuple[str, ...]) -> Type[NamedTuple]:
+    """Returns named tuple type of projection query rows.
+
+    Property names which aren't identifiers (e.g. `__key__`) are renamed to
+    positional names (`_0`, `_1`...), values are still accessible by index.
+    """
+    return collections.namedtuple("Row", properties, rename=True)  # type: ignore
+
+
+# QueryResultBatch of projection query, decoded to Python values as rows or columns
+class ProjectionQueryResultBatch(ResultBatch):
+    __slots__ = (
+        "properties",
+        "rows",
+        "columns",
+    )
+
+    def __init__(
+        self,
+        properties: Sequence[str],
+        rows: Optional[List[Tuple[Any, ...]]] = None,
+        columns: Optional[Dict[str, List[Any]]] = None,
+        skipped_results: int = 0,
+        skipped_cursor: Optional[str] = None,
+        end_cursor: str = "",
+        more_results: MoreResultsType = MoreResultsType.UNSPECIFIED,
+        snapshot_version: str = "",
+    ) -> None:
+        super().__init__(
+            skipped_results, skipped_cursor, end_cursor, more_results, snapshot_version
+        )
+        self.properties = tuple(properties)
+        self.rows = rows or []
+        self.columns = columns or {}
+
+    def __len__(self) -> int:
+        if self.columns:
+            return len(next(iter(self.columns.values())))
+
+        return len(self.rows)
+
+    @classmethod
+    def from_ds(
+        cls,
+        data: Dict[str, Any],
+        properties: Sequence[str],
+        columns: bool = False,
+    ) -> "ProjectionQueryResultBatch":
+        # missing properties are decoded to None
+        entities = [er["entity"] for er in data.get("entityResults", [])]
+        values: Dict[str, List[Any]] = {}
+        for name in properties:
+            if name == "__key__":
+                values[name] = [Key.from_ds(e["key"]) for e in entities]
+                continue
+
+            column = values[name] = []
+            for entity in entities:
+                value = entity.get("properties", {}).get(name)
+                column.append(None if value is None else py_value(value))
+
+        batch = cls(
+            properties,
+            **cls._fields_from_ds(data),
+        )
+        if columns:
+            batch.columns = values
+        else:
+            row = row_type(batch.properties)
+            batch.rows = [row(*r) for r in zip(*values.values())]
+
+        return batch
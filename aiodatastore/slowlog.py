@@ -0,0 +1,190 @@
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from aiodatastore.aggregation import AggregationQuery, Sum
+from aiodatastore.filters import CompositeFilter, Filter, PropertyFilter
+from aiodatastore.metrics import CallNext, RPCCall
+from aiodatastore.query import GQLQuery, Query, ResultBatch
+
+__all__ = (
+    "query_fingerprint",
+    "QueryStats",
+    "SlowQueryLog",
+)
+
+logger = logging.getLogger("aiodatastore.slowlog")
+
+GQL_LITERAL_RE = re.compile(
+    r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|(?<![\w@])-?\d+(?:\.\d+)?\b"
+)
+GQL_OFFSET_RE = re.compile(r"\bOFFSET\b", re.IGNORECASE)
+
+
+def _filter_fingerprint(f: Filter) -> str:
+    if isinstance(f, CompositeFilter):
+        # order of sub-filters doesn't change query shape
+        filters = sorted(_filter_fingerprint(sub) for sub in f.filters)
+        return f"{f.op.value}({', '.join(filters)})"
+    if isinstance(f, PropertyFilter):
+        return f"{f.property.name} {f.op.value} ?"
+
+    return "?"
+
+
+def query_fingerprint(query: Union[Query, GQLQuery, AggregationQuery]) -> str:
+    """Returns query shape: kind, filters without values, orders, projection."""
+    if isinstance(query, GQLQuery):
+        return " ".join(GQL_LITERAL_RE.sub("?", query.query).split())
+    if isinstance(query, AggregationQuery):
+        aggregations = (
+            f"{a.operator}({a.property.name})" if isinstance(a, Sum) else a.operator
+            for a in query.aggregations
+        )
+        nested = query_fingerprint(query.nested_query)
+        return f"aggregate={','.join(aggregations)} {nested}"
+
+    parts = [f"kind={query.kind.name if query.kind else ''}"]
+    if query.projection:
+        parts.append(
+            "projection=" + ",".join(p.property.name for p in query.projection)
+        )
+    if query.filter:
+        parts.append("filter=" + _filter_fingerprint(query.filter))
+    if query.order:
+        orders = (f"{o.property.name} {o.direction.value}" for o in query.order)
+        parts.append("order=" + ",".join(orders))
+    if query.distinct_on:
+        parts.append("distinct_on=" + ",".join(d.name for d in query.distinct_on))
+
+    return " ".join(parts)
+
+
+def _uses_offset(query: Union[Query, GQLQuery, AggregationQuery]) -> bool:
+    if isinstance(query, GQLQuery):
+        return bool(GQL_OFFSET_RE.search(query.query))
+    if isinstance(query, AggregationQuery):
+        return bool(query.nested_query.offset)
+
+    return bool(query.offset)
+
+
+class QueryStats:
+    __slots__ = (
+        "count",
+        "slow_count",
+        "total_time",
+        "max_time",
+        "results",
+        "skipped_results",
+        "offset_count",
+        "error_count",
+    )
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.slow_count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.results = 0
+        self.skipped_results = 0
+        self.offset_count = 0
+        self.error_count = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SlowQueryLog:
+    """Middleware that logs queries slower than `threshold` seconds."""
+
+    def __init__(
+        self,
+        threshold: float = 1.0,
+        logger: logging.Logger = logger,
+        level: int = logging.WARNING,
+    ) -> None:
+        self.threshold = threshold
+        self.logger = logger
+        self.level = level
+        self.stats: Dict[str, QueryStats] = {}
+
+    async def __call__(self, call: RPCCall, call_next: CallNext) -> Any:
+        if call.query is None:
+            return await call_next(call)
+
+        start = time.perf_counter()
+        result = error = None
+        try:
+            result = await call_next(call)
+            return result
+        except BaseException as e:
+            # failed and timed out (cancelled) queries are usually the slowest
+            error = e
+            raise
+        finally:
+            self.record(
+                call.query,
+                result,
+                time.perf_counter() - start,
+                error=error,
+                status=call.status,
+            )
+
+    def record(
+        self,
+        query: Union[Query, GQLQuery, AggregationQuery],
+        result: Optional[Any],
+        latency: float,
+        error: Optional[BaseException] = None,
+        status: Optional[int] = None,
+    ) -> None:
+        fingerprint = query_fingerprint(query)
+        offset = _uses_offset(query)
+        results, skipped = 0, 0
+        if isinstance(result, ResultBatch):
+            results = len(result)
+            skipped = result.skipped_results
+
+        stats = self.stats.get(fingerprint)
+        if stats is None:
+            stats = self.stats[fingerprint] = QueryStats()
+        stats.count += 1
+        stats.total_time += latency
+        stats.max_time = max(stats.max_time, latency)
+        stats.results += results
+        stats.skipped_results += skipped
+        stats.offset_count += offset
+        stats.error_count += error is not None
+
+        if latency < self.threshold:
+            return
+
+        stats.slow_count += 1
+        message = "slow query (%.3fs): %s results=%d skipped=%d offset=%s"
+        args: List[Any] = [latency, fingerprint, results, skipped, offset]
+        error_name = type(error).__name__ if error is not None else None
+        if error is not None:
+            message += " error=%s status=%s"
+            args.extend([error_name, status])
+        self.logger.log(
+            self.level,
+            message,
+            *args,
+            extra={
+                "fingerprint": fingerprint,
+                "latency": latency,
+                "results": results,
+                "skipped_results": skipped,
+                "offset": offset,
+                "error": error_name,
+                "status": status,
+            },
+        )
+
+    def reset(self) -> None:
+        self.stats.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {fp: stats.to_dict() for fp, stats in self.stats.items()}
@@ -0,0 +1,167 @@
+"""Splits query into key ranges scanned concurrently.
+
+Keys are sampled in `__scatter__` order (pseudo-random order of entities),
+sorted and used as boundaries of `__key__` ranges, so ranges hold about the
+same number of entities and don't depend on each other's cursors.
+"""
+
+import asyncio
+import copy
+from typing import TYPE_CHECKING, Any, AsyncIterator, List, Optional
+
+from aiodatastore.constants import CompositeFilterOperator, PropertyFilterOperator
+from aiodatastore.entity import EntityResult
+from aiodatastore.filters import CompositeFilter, Filter, PropertyFilter
+from aiodatastore.key import Key
+from aiodatastore.property import PropertyOrder, PropertyReference
+from aiodatastore.query import KindExpression, Projection, Query
+from aiodatastore.values import KeyValue
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aiodatastore.client import Datastore
+
+__all__ = (
+    "KEYS_PER_SPLIT",
+    "sample_keys",
+    "split_query",
+    "scan",
+)
+
+# sampled keys per split, more keys give more even splits
+KEYS_PER_SPLIT = 32
+# results buffered per range (or for all ranges, when unordered)
+BUFFER_SIZE = 1000
+
+_DONE = object()
+
+
+def _check(query: Query) -> None:
+    if query.kind is None:
+        raise ValueError("query without kind can't be split")
+    if query.order or query.offset or query.limit is not None:
+        raise ValueError("query with order, offset or limit can't be split")
+    if query.start_cursor or query.end_cursor:
+        raise ValueError("query with cursors can't be split")
+
+
+def _key_filter(op: PropertyFilterOperator, key: Key) -> PropertyFilter:
+    return PropertyFilter(PropertyReference("__key__"), op, KeyValue(key))
+
+
+def _range_query(query: Query, start: Optional[Key], end: Optional[Key]) -> Query:
+    filters: List[Filter] = []
+    if isinstance(query.filter, CompositeFilter) and (
+        query.filter.op == CompositeFilterOperator.AND
+    ):
+        filters.extend(query.filter.filters)
+    elif query.filter is not None:
+        filters.append(query.filter)
+    if start is not None:
+        filters.append(_key_filter(PropertyFilterOperator.GREATER_THAN_OR_EQUAL, start))
+    if end is not None:
+        filters.append(_key_filter(PropertyFilterOperator.LESS_THAN, end))
+
+    query = copy.copy(query)
+    if len(filters) == 1:
+        query.filter = filters[0]  # type: ignore
+    elif filters:
+        query.filter = CompositeFilter(CompositeFilterOperator.AND, filters)
+    return query
+
+
+async def sample_keys(
+    ds: "Datastore",
+    kind: str,
+    size: int,
+    **kwargs: Any,
+) -> List[Key]:
+    # keys of `size` pseudo-random entities of kind, in key order
+    query = Query(
+        kind=KindExpression(kind),
+        projection=[Projection(PropertyReference("__key__"))],
+        order=[PropertyOrder(PropertyReference("__scatter__"))],
+        limit=size,
+    )
+    keys = [key async for key in ds.iter_keys(query, **kwargs)]
+    return sorted(keys, key=Key.sort_key)  # type: ignore
+
+
+async def split_query(
+    ds: "Datastore",
+    query: Query,
+    splits: int,
+    sample_size: Optional[int] = None,
+    **kwargs: Any,
+) -> List[Query]:
+    """Splits query into at most `splits` queries of disjoint key ranges.
+
+    Query must have a kind and no order, offset, limit or cursors. Queries
+    are returned in key order. Keys are sampled from the whole kind, without
+    query filter, so sampling doesn't require indexes. Extra keyword
+    arguments (e.g. `timeout`) are passed to the sampling query.
+    """
+    _check(query)
+    if splits <= 1:
+        return [query]
+
+    assert query.kind is not None
+    sample = await sample_keys(
+        ds, query.kind.name, sample_size or splits * KEYS_PER_SPLIT, **kwargs
+    )
+
+    boundaries: List[Key] = []
+    for i in range(1, splits):
+        key = sample[i * len(sample) // splits] if sample else None
+        # small kinds give fewer distinct boundaries than splits
+        if key is not None and (not boundaries or boundaries[-1] != key):
+            boundaries.append(key)
+
+    starts: List[Optional[Key]] = [None, *boundaries]
+    ends: List[Optional[Key]] = [*boundaries, None]
+    return [_range_query(query, start, end) for start, end in zip(starts, ends)]
+
+
+async def scan(
+    ds: "Datastore",
+    queries: List[Query],
+    ordered: bool = False,
+    buffer_size: int = BUFFER_SIZE,
+    **kwargs: Any,
+) -> AsyncIterator[EntityResult]:
+    """Runs queries concurrently and yields their results.
+
+    Results are yielded as they arrive, or query by query with
+    `ordered=True` (in key order for queries of `split_query`), while next
+    queries are prefetched. Extra keyword arguments are passed to
+    `Datastore.iter_query`.
+    """
+    count = len(queries) if ordered else 1
+    queues: List["asyncio.Queue[Any]"] = [
+        asyncio.Queue(maxsize=buffer_size) for _ in range(count)
+    ]
+
+    async def run(i: int, query: Query) -> None:
+        queue = queues[i if ordered else 0]
+        try:
+            async for entity_result in ds.iter_query(query, **kwargs):
+                await queue.put(entity_result)
+        except Exception as e:
+            await queue.put(e)
+        await queue.put(_DONE)
+
+    tasks = [asyncio.ensure_future(run(i, q)) for i, q in enumerate(queries)]
+    try:
+        for queue in queues:
+            pending = 1 if ordered else len(queries)
+            while pending:
+                item = await queue.get()
+                if item is _DONE:
+                    pending -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,79 @@
+from typing import Any, Dict, Optional
+
+from aiodatastore.commit import CommitResult
+from aiodatastore.lookup import LookupResult
+from aiodatastore.metrics import CallNext, RPCCall
+from aiodatastore.query import ResultBatch
+
+try:
+    from opentelemetry import trace
+except ImportError:  # pragma: no cover
+    trace = None  # type: ignore
+
+__all__ = ("TracingMiddleware",)
+
+
+def _call_attributes(call: RPCCall) -> Dict[str, Any]:
+    attrs: Dict[str, Any] = {
+        "db.system": "datastore",
+        "db.operation": call.rpc,
+        "datastore.project_id": call.project_id,
+        "datastore.namespace": call.namespace,
+        "datastore.key_count": call.key_count,
+    }
+    if call.kind is not None:
+        attrs["datastore.kind"] = call.kind
+    if call.rpc == "commit":
+        attrs["datastore.entity_count"] = call.entity_count
+
+    return attrs
+
+
+def _result_attributes(call: RPCCall) -> Dict[str, Any]:
+    attrs: Dict[str, Any] = {
+        "datastore.request_size": call.request_size,
+        "datastore.response_size": call.response_size,
+    }
+    if call.status is not None:
+        attrs["http.status_code"] = call.status
+
+    result = call.result
+    if isinstance(result, CommitResult):
+        attrs["datastore.mutation_count"] = len(result.mutation_results)
+        attrs["datastore.index_updates"] = result.index_updates
+    elif isinstance(result, ResultBatch):
+        attrs["datastore.entity_count"] = len(result)
+        attrs["datastore.skipped_results"] = result.skipped_results
+        attrs["datastore.more_results"] = result.more_results.value
+    elif isinstance(result, LookupResult):
+        attrs["datastore.found_count"] = len(result.found)
+        attrs["datastore.missing_count"] = len(result.missing)
+        attrs["datastore.deferred_count"] = len(result.deferred)
+    elif call.rpc == "allocateIds" and result is not None:
+        attrs["datastore.key_count"] = len(result)
+
+    return attrs
+
+
+class TracingMiddleware:
+    """Wraps every request into OpenTelemetry span (requires opentelemetry-api)."""
+
+    def __init__(self, tracer_provider: Optional[Any] = None) -> None:
+        if trace is None:
+            raise RuntimeError(
+                "opentelemetry-api is required for tracing: "
+                "pip install aiodatastore[tracing]"
+            )
+
+        self._tracer = trace.get_tracer("aiodatastore", tracer_provider=tracer_provider)
+
+    async def __call__(self, call: RPCCall, call_next: CallNext) -> Any:
+        with self._tracer.start_as_current_span(
+            f"datastore.{call.rpc}",
+            kind=trace.SpanKind.CLIENT,
+            attributes=_call_attributes(call),
+        ) as span:
+            try:
+                return await call_next(call)
+            finally:
+                span.set_attributes(_result_attributes(call))
@@ -0,0 +1,522 @@
+import asyncio
+import base64
+import collections
+import json
+import time
+import zlib
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Deque,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import aiohttp
+from aiohttp import ClientResponseError, RequestInfo
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from aiodatastore.metrics import Histogram
+
+if TYPE_CHECKING:  # pragma: no cover
+    import httpx
+    from gcloud.aio.auth import AioSession
+
+__all__ = (
+    "Response",
+    "DataResponse",
+    "Transport",
+    "AiohttpTransport",
+    "HttpxTransport",
+    "Http2Transport",
+    "StreamStats",
+    "SessionTransport",
+    "RecordingTransport",
+    "ReplayTransport",
+    "raise_for_status",
+    "decompress",
+    "encode_body",
+    "decode_body",
+)
+
+
+class Response:
+    __slots__ = ("status", "body", "encoding", "wire_size")
+
+    def __init__(
+        self,
+        status: int,
+        body: bytes,
+        encoding: Optional[str] = None,
+        wire_size: Optional[int] = None,
+    ) -> None:
+        self.status = status
+        self.body = body
+        self.encoding = encoding  # Content-Encoding of body, if not decoded
+        # body size on the wire, when transport decoded it (0 if unknown)
+        self.wire_size = wire_size
+
+
+class DataResponse:
+    __slots__ = ("status", "data", "request_size", "response_size", "message")
+
+    def __init__(
+        self,
+        status: int,
+        data: Dict[str, Any],
+        request_size: int = 0,
+        response_size: int = 0,
+        message: Any = None,
+    ) -> None:
+        self.status = status
+        self.data = data  # REST API shaped payload, error body on error status
+        self.request_size = request_size  # wire sizes of request and response
+        self.response_size = response_size
+        self.message = message  # response message instead of data, if asked for
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "gzip":
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompress(body)
+    if encoding in (None, "identity"):
+        return body
+
+    raise ValueError(f"unsupported content encoding: {encoding}")
+
+
+class Transport:
+    """Sends request body to url and returns response status and body.
+
+    Transports must not raise on HTTP error statuses, client does it.
+    Compressed response body may be returned as is with its encoding,
+    client decompresses it. Transports which decode body themselves report
+    its size on the wire as `wire_size`. Request body is gzipped when request
+    has "Content-Encoding: gzip" header.
+
+    Transports with their own wire format (e.g. gRPC) set `encodes_payload`
+    and implement `request_data`, client passes request payload dict to it
+    and gets response payload dict back, without JSON encoding. With
+    `message=True` transport may return its response message instead, which
+    client decodes straight to model objects.
+    """
+
+    encodes_payload = False
+
+    async def request(
+        self,
+        url: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> Response:
+        raise NotImplementedError
+
+    async def request_data(
+        self,
+        url: str,
+        data: Dict[str, Any],
+        headers: Mapping[str, str],
+        message: bool = False,
+    ) -> DataResponse:
+        raise NotImplementedError
+
+    async def warmup(self, url: str, connections: int) -> None:
+        # opens up to `connections` keep-alive connections to url host
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+def raise_for_status(url: str, headers: Mapping[str, str], resp: Response) -> None:
+    if resp.status < 400:
+        return
+
+    request_info = RequestInfo(
+        URL(url),
+        "POST",
+        CIMultiDictProxy(CIMultiDict(headers)),
+        URL(url),
+    )
+    raise ClientResponseError(
+        request_info,
+        (),
+        status=resp.status,
+        message=resp.body.decode(errors="replace"),
+    )
+
+
+class AiohttpTransport(Transport):
+    def __init__(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        limit: int = 100,
+    ) -> None:
+        self._own_session = session is None
+        self._session = session
+        self.limit = limit
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # created lazily, session must be created inside event loop
+        if self._session is None:
+            # responses are decompressed by client, to measure wire size
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit),
+                headers={"Accept-Encoding": "gzip, deflate"},
+                auto_decompress=False,
+            )
+
+        return self._session
+
+    async def request(
+        self,
+        url: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> Response:
+        session = self._get_session()
+        async with session.post(url, data=body, headers=headers) as resp:
+            encoding = None
+            if not session.auto_decompress:
+                encoding = resp.headers.get("Content-Encoding")
+            return Response(resp.status, await resp.read(), encoding)
+
+    async def warmup(self, url: str, connections: int) -> None:
+        session = self._get_session()
+
+        async def connect() -> None:
+            # concurrent requests open separate connections, status is ignored;
+            # GET, aiohttp doesn't reuse connections after HEAD responses
+            async with session.get(url) as resp:
+                await resp.read()
+
+        await asyncio.gather(*(connect() for _ in range(min(connections, self.limit))))
+
+    async def close(self) -> None:
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def _import_httpx(transport: str) -> Any:
+    # httpx is imported only when used, it's slow to import
+    try:
+        import httpx
+    except ImportError:
+        raise RuntimeError(f"httpx package is required for {transport}") from None
+
+    return httpx
+
+
+class HttpxTransport(Transport):
+    """Transport on top of httpx.AsyncClient, requires httpx package.
+
+    Extra keyword arguments are passed to AsyncClient.
+    """
+
+    def __init__(
+        self,
+        client: Optional["httpx.AsyncClient"] = None,
+        **kwargs: Any,
+    ) -> None:
+        httpx = _import_httpx("HttpxTransport")
+        self._own_client = client is None
+        self._client = client or httpx.AsyncClient(**kwargs)
+
+    async def request(
+        self,
+        url: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> Response:
+        resp = await self._client.post(url, content=body, headers=headers)
+        # httpx decodes body, downloaded bytes are its wire size
+        return Response(
+            resp.status_code, resp.content, wire_size=resp.num_bytes_downloaded
+        )
+
+    async def warmup(self, url: str, connections: int) -> None:
+        await asyncio.gather(*(self._client.get(url) for _ in range(connections)))
+
+    async def close(self) -> None:
+        if self._own_client:
+            await self._client.aclose()
+
+
+class StreamStats:
+    __slots__ = ("streams", "active", "peak", "queued", "wait", "versions")
+
+    def __init__(self) -> None:
+        self.streams = 0
+        self.active = 0
+        self.peak = 0
+        self.queued = 0  # requests which waited for a free stream
+        self.wait = Histogram()
+        self.versions: Dict[str, int] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "streams": self.streams,
+            "active": self.active,
+            "peak": self.peak,
+            "queued": self.queued,
+            "wait": self.wait.to_dict(),
+            "versions": dict(self.versions),
+        }
+
+
+class Http2Transport(HttpxTransport):
+    """HTTP/2 transport, requires httpx with http2 extra.
+
+    Concurrent requests are multiplexed as streams over `max_connections`
+    connections, at most `max_streams` streams per connection (Google front
+    ends allow 100). Requests above the limit wait for a free stream.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 1,
+        max_streams: int = 100,
+        **kwargs: Any,
+    ) -> None:
+        httpx = _import_httpx("Http2Transport")
+        kwargs.setdefault(
+            "limits",
+            httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+        super().__init__(http2=True, **kwargs)
+        self.max_streams = max_connections * max_streams
+        self.stats = StreamStats()
+        self._streams = asyncio.Semaphore(self.max_streams)
+
+    async def request(
+        self,
+        url: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> Response:
+        stats = self.stats
+        if self._streams.locked():
+            stats.queued += 1
+
+        start = time.perf_counter()
+        async with self._streams:
+            stats.wait.observe(time.perf_counter() - start)
+            stats.streams += 1
+            stats.active += 1
+            stats.peak = max(stats.peak, stats.active)
+            try:
+                resp = await self._client.post(url, content=body, headers=headers)
+            finally:
+                stats.active -= 1
+
+        stats.versions[resp.http_version] = stats.versions.get(resp.http_version, 0) + 1
+        return Response(
+            resp.status_code, resp.content, wire_size=resp.num_bytes_downloaded
+        )
+
+
+class SessionTransport(Transport):
+    # shared session (e.g. with auth token) is closed by its owner
+    def __init__(self, session: Optional["AioSession"] = None) -> None:
+        self._own_session = session is None
+        self._session = session
+
+    def _get_session(self) -> "AioSession":
+        # created lazily, session must be created inside event loop
+        if self._session is None:
+            # gcloud-aio is imported only when used, it's slow to import
+            from gcloud.aio.auth import AioSession
+
+            # responses are decompressed by client, to measure wire size;
+            # timeout is AioSession default
+            self._session = AioSession(
+                aiohttp.ClientSession(
+                    headers={"Accept-Encoding": "gzip, deflate"},
+                    timeout=aiohttp.ClientTimeout(total=10),
+                    auto_decompress=False,
+                )
+            )
+
+        return self._session
+
+    async def request(
+        self,
+        url: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> Response:
+        session = self._get_session()
+        resp = await session.request(
+            "POST",
+            url,
+            headers=headers,
+            data=body,
+            auto_raise_for_status=False,
+        )
+        try:
+            if session.session.auto_decompress:
+                # shared session decodes body, its wire size is unknown
+                return Response(resp.status, await resp.read(), wire_size=0)
+            encoding = resp.headers.get("Content-Encoding")
+            return Response(resp.status, await resp.read(), encoding)
+        finally:
+            resp.release()
+
+    async def warmup(self, url: str, connections: int) -> None:
+        session = self._get_session()
+
+        async def connect() -> None:
+            resp = await session.request(
+                "GET", url, headers={}, auto_raise_for_status=False
+            )
+            resp.release()
+
+        await asyncio.gather(*(connect() for _ in range(connections)))
+
+    async def close(self) -> None:
+        if self._own_session and self._session is not None:
+            # AioSession doesn't close aiohttp session it was given
+            await self._session.session.close()
+            self._session = None
+
+
+def encode_body(body: bytes) -> Dict[str, str]:
+    try:
+        return {"text": body.decode()}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(body).decode()}
+
+
+def decode_body(data: Dict[str, str]) -> bytes:
+    if "base64" in data:
+        return base64.b64decode(data["base64"])
+
+    return data["text"].encode()
+
+
+class RecordingTransport(Transport):
+    """Records request/response pairs as JSON lines to file."""
+
+    def __init__(self, transport: Transport, file: Union[str, IO[str]]) -> None:
+        self._transport = transport
+        self._file = open(file, "a") if isinstance(file, str) else file
+        self._own_file = isinstance(file, str)
+
+    async def request(
+        self,
+        url: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> Response:
+        start = time.perf_counter()
+        resp = await self._transport.request(url, body, headers)
+        latency = time.perf_counter() - start
+
+        record = {
+            "url": url,
+            "request": encode_body(body),
+            "status": resp.status,
+            "response": encode_body(resp.body),
+            "latency": latency,
+        }
+        if resp.encoding is not None:
+            record["encoding"] = resp.encoding
+        self._file.write(json.dumps(record) + "\n")
+        return resp
+
+    async def warmup(self, url: str, connections: int) -> None:
+        await self._transport.warmup(url, connections)
+
+    async def close(self) -> None:
+        self._file.flush()
+        if self._own_file:
+            self._file.close()
+        await self._transport.close()
+
+
+class ReplayTransport(Transport):
+    """Replays recorded responses.
+
+    Response is matched by url and request body, or by url only when there
+    is no exact match left (request bodies may contain transaction ids or
+    timestamps). Recorded latency is replayed only with `latency=True`.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, IO[str], None] = None,
+        records: Optional[List[Dict[str, Any]]] = None,
+        latency: bool = False,
+        loop: bool = False,
+    ) -> None:
+        if records is None:
+            records = self.load(file) if file is not None else []
+
+        self.records = records
+        self.latency = latency
+        self.loop = loop
+        self._reset()
+
+    @staticmethod
+    def load(file: Union[str, IO[str]]) -> List[Dict[str, Any]]:
+        if isinstance(file, str):
+            with open(file) as f:
+                return [json.loads(line) for line in f if line.strip()]
+
+        return [json.loads(line) for line in file if line.strip()]
+
+    def _reset(self) -> None:
+        self._by_body: Dict[Tuple[str, bytes], Deque[Dict[str, Any]]] = {}
+        self._by_url: Dict[str, Deque[Dict[str, Any]]] = {}
+        for record in self.records:
+            key = (record["url"], decode_body(record["request"]))
+            self._by_body.setdefault(key, collections.deque()).append(record)
+            self._by_url.setdefault(record["url"], collections.deque()).append(record)
+
+    def _pop(self, url: str, body: bytes) -> Optional[Dict[str, Any]]:
+        records = self._by_body.get((url, body))
+        if records:
+            record = records.popleft()
+            self._by_url[url].remove(record)
+            return record
+
+        records = self._by_url.get(url)
+        if records:
+            record = records.popleft()
+            self._by_body[(url, decode_body(record["request"]))].remove(record)
+            return record
+
+        return None
+
+    async def request(
+        self,
+        url: str,
+        body: bytes,
+        headers: Mapping[str, str],
+    ) -> Response:
+        record = self._pop(url, body)
+        if record is None and self.loop:
+            self._reset()
+            record = self._pop(url, body)
+        if record is None:
+            raise LookupError(f"no recorded response for {url}")
+
+        if self.latency:
+            await asyncio.sleep(record["latency"])
+
+        return Response(
+            record["status"],
+            decode_body(record["response"]),
+            record.get("encoding"),
+        )
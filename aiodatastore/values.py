@@ -1,6 +1,6 @@
 from base64 import b64decode, b64encode
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, Callable, Dict, Optional, Type
 
 from aiodatastore.key import Key
 
@@ -16,9 +16,17 @@ __all__ = (
     "LatLng",
     "GeoPointValue",
     "KeyValue",
+    "decode_timestamp",
+    "py_value",
+    "value_from_pb",
 )
 
 
+def decode_timestamp(raw: str) -> datetime:
+    # RFC3339 "Zulu" timestamp, nanoseconds are truncated to microseconds
+    return datetime.fromisoformat(raw[:26].replace("Z", ""))
+
+
 # https://cloud.google.com/datastore/docs/reference/data/rest/Shared.Types/Value
 class Value:
     __slots__ = ("py_value", "raw_value", "indexed")
@@ -122,7 +130,7 @@ class TimestampValue(Value):
     type_name = "timestampValue"
 
     def raw_to_py(self):
-        return datetime.fromisoformat(self.raw_value[:26].replace("Z", ""))
+        return decode_timestamp(self.raw_value)
 
     def py_to_raw(self):
         # A timestamp in RFC3339 UTC "Zulu" format, with nanosecond
@@ -232,3 +240,74 @@ VALUE_TYPES = {
     GeoPointValue.type_name: GeoPointValue,
     KeyValue.type_name: KeyValue,
 }
+
+
+# raw value decoders of py_value, same conversions as Value.raw_to_py
+RAW_DECODERS: Dict[str, Callable[[Any], Any]] = {
+    NullValue.type_name: lambda raw: None,
+    BooleanValue.type_name: lambda raw: raw,
+    StringValue.type_name: lambda raw: raw,
+    IntegerValue.type_name: int,
+    DoubleValue.type_name: float,
+    TimestampValue.type_name: decode_timestamp,
+    BlobValue.type_name: b64decode,
+    ArrayValue.type_name: lambda raw: [py_value(v) for v in raw.get("values", [])],
+    GeoPointValue.type_name: lambda raw: LatLng(
+        lat=float(raw["latitude"]), lng=float(raw["longitude"])
+    ),
+    KeyValue.type_name: Key.from_ds,
+}
+
+
+def py_value(data: Dict[str, Any]) -> Any:
+    """Decodes Datastore value to Python value without Value object.
+
+    Array elements are decoded to Python values too, not to Value objects.
+    """
+    for key, raw in data.items():
+        decoder = RAW_DECODERS.get(key)
+        if decoder is not None:
+            return decoder(raw)
+
+    raise RuntimeError(f"unsupported value: {data}")
+
+
+# Value message fields to Value types
+PB_VALUE_TYPES: Dict[str, Type[Value]] = {
+    "boolean_value": BooleanValue,
+    "integer_value": IntegerValue,
+    "double_value": DoubleValue,
+    "string_value": StringValue,
+    "blob_value": BlobValue,
+    "timestamp_value": TimestampValue,
+    "key_value": KeyValue,
+    "geo_point_value": GeoPointValue,
+    "array_value": ArrayValue,
+}
+# decoders of message fields to py_value, other fields are Python values already
+PB_DECODERS: Dict[str, Callable[[Any], Any]] = {
+    "timestamp_value": lambda pb: pb.ToDatetime(),
+    "key_value": Key.from_pb,
+    "geo_point_value": lambda pb: LatLng(lat=pb.latitude, lng=pb.longitude),
+    "array_value": lambda pb: [value_from_pb(v) for v in pb.values],
+}
+
+
+def value_from_pb(pb: Any) -> Value:
+    """Decodes google.datastore.v1.Value message to Value object.
+
+    Protobuf fields are typed already, so Python value is set right away
+    instead of raw value. Array elements are Value objects.
+    """
+    field = pb.WhichOneof("value_type")
+    value_type = PB_VALUE_TYPES.get(field)
+    if value_type is None:
+        if field is None or field == "null_value":
+            return NullValue(indexed=not pb.exclude_from_indexes)
+        raise RuntimeError(f"unsupported value type: {field}")
+
+    value = getattr(pb, field)
+    decode = PB_DECODERS.get(field)
+    if decode is not None:
+        value = decode(value)
+    return value_type(value, indexed=not pb.exclude_from_indexes)
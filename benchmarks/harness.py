@@ -0,0 +1,114 @@
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+Case = Tuple[str, Callable[[], Any]]
+
+
+def measure(func: Callable[[], Any], min_time: float = 0.2) -> Dict[str, float]:
+    # calibrate number of calls per round to run at least `min_time`
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    gc.disable()
+    try:
+        best = elapsed
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        func()  # warm up caches
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"ops": round(number / best), "alloc_bytes": max(peak - before, 0)}
+
+
+def run(cases: List[Case], min_time: float) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, func in cases:
+        results[name] = result = measure(func, min_time=min_time)
+        print(
+            f"{name:<50} {result['ops']:>14,.0f} ops/s "
+            f"{result['alloc_bytes']:>10,.0f} B/op",
+            file=sys.stderr,
+        )
+
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+
+        if result["ops"] < base["ops"] * (1 - tolerance):
+            change = (result["ops"] / base["ops"] - 1) * 100
+            regressions.append(f"{name}: ops/s {change:+.1f}%")
+        if result["alloc_bytes"] > base["alloc_bytes"] * (1 + tolerance) + 64:
+            regressions.append(
+                f"{name}: alloc {base['alloc_bytes']:.0f} -> "
+                f"{result['alloc_bytes']:.0f} B/op"
+            )
+
+    return regressions
+
+
+def make_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("-k", dest="filter", default="", help="run matching cases")
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--save", metavar="FILE", help="save results as baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare with baseline")
+    parser.add_argument("--tolerance", type=float, default=0.35)
+    return parser
+
+
+def execute(cases: List[Case], args: argparse.Namespace) -> None:
+    results = run([c for c in cases if args.filter in c[0]], args.min_time)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+def main(cases: List[Case], description: str) -> None:
+    execute(cases, make_parser(description).parse_args())
@@ -0,0 +1,63 @@
+"""Import time benchmark, every statement runs in a fresh interpreter.
+
+python benchmarks/import_time.py
+python benchmarks/import_time.py --repeat 20 -k Datastore
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = [
+    "import aiodatastore",
+    "from aiodatastore import Key, Entity, StringValue",
+    "from aiodatastore import Datastore",
+    "from aiodatastore import Datastore; Datastore('project1')",
+    "from aiodatastore import Datastore; import gcloud.aio.auth",
+]
+
+
+def measure(statement, repeat):
+    # interpreter startup is subtracted, see "pass" statement
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    env.pop("DATASTORE_EMULATOR_HOST", None)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], check=True, env=env)
+        times.append(time.perf_counter() - start)
+
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time benchmark")
+    parser.add_argument("-k", dest="filter", help="run statements containing text")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per statement")
+    parser.add_argument("--json", action="store_true", help="print JSON report")
+    args = parser.parse_args()
+
+    startup = measure("pass", args.repeat)
+    results = {}
+    for statement in STATEMENTS:
+        if args.filter and args.filter not in statement:
+            continue
+        results[statement] = (measure(statement, args.repeat) - startup) * 1000
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    width = max(len(statement) for statement in results)
+    for statement, ms in results.items():
+        print(f"{statement:<{width}}  {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
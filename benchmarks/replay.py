@@ -0,0 +1,58 @@
+"""Decode benchmarks on recorded responses.
+
+Record production-shaped payloads with RecordingTransport:
+
+    Datastore(..., transport=RecordingTransport(AiohttpTransport(), "rec.jsonl"))
+
+and benchmark their decoding offline:
+
+    python benchmarks/replay.py rec.jsonl
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiodatastore import CommitResult, LookupResult, QueryResultBatch  # noqa: E402
+from aiodatastore.transport import (  # noqa: E402
+    ReplayTransport,
+    decode_body,
+    decompress,
+)
+from harness import execute, make_parser  # noqa: E402
+
+DECODERS = {
+    "lookup": LookupResult.from_ds,
+    "runQuery": lambda data: QueryResultBatch.from_ds(data["batch"]),
+    "commit": CommitResult.from_ds,
+}
+
+
+def cases(file):
+    result = []
+    for i, record in enumerate(ReplayTransport.load(file)):
+        rpc = record["url"].rpartition(":")[2]
+        decode = DECODERS.get(rpc)
+        if decode is None or record["status"] >= 400:
+            continue
+
+        body = decompress(decode_body(record["response"]), record.get("encoding"))
+        name = f"{i:04}:{rpc}[{len(body)} B]"
+        data = json.loads(body)
+        result.extend(
+            [
+                (f"{name} json", lambda b=body: json.loads(b)),
+                (f"{name} from_ds", lambda d=data, f=decode: f(d)),
+            ]
+        )
+
+    return result
+
+
+if __name__ == "__main__":
+    parser = make_parser("Decode benchmarks on recorded responses")
+    parser.add_argument("file", help="file written by RecordingTransport")
+    args = parser.parse_args()
+    execute(cases(args.file), args)
@@ -0,0 +1,296 @@
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiodatastore import (  # noqa: E402
+    ArrayValue,
+    BlobValue,
+    BooleanValue,
+    CompositeFilter,
+    CompositeFilterOperator,
+    Direction,
+    DoubleValue,
+    Entity,
+    GeoPointValue,
+    IntegerValue,
+    Key,
+    KeyQueryResultBatch,
+    KeyValue,
+    KindExpression,
+    LatLng,
+    NullValue,
+    PartitionId,
+    PathElement,
+    Projection,
+    ProjectionQueryResultBatch,
+    PropertyFilter,
+    PropertyFilterOperator,
+    PropertyOrder,
+    PropertyReference,
+    Query,
+    QueryResultBatch,
+    StringValue,
+    TimestampValue,
+)
+from aiodatastore import columnar  # noqa: E402
+from harness import main  # noqa: E402
+
+KEY = Key(
+    PartitionId("project1", namespace_id="namespace1"),
+    [PathElement("Parent", name="parent1"), PathElement("Child", id="1234567890")],
+)
+KEY_DS = KEY.to_ds()
+TIMESTAMP = datetime.datetime(2023, 12, 4, 10, 20, 30, 123456)
+
+
+def small_entity() -> Entity:
+    # typical user profile: a handful of indexed scalar properties
+    return Entity(
+        KEY,
+        {
+            "name": StringValue("John Doe"),
+            "email": StringValue("john@example.com"),
+            "age": IntegerValue(42),
+            "active": BooleanValue(True),
+            "created": TimestampValue(TIMESTAMP),
+        },
+    )
+
+
+def wide_entity() -> Entity:
+    # analytics record: many numeric and string properties, mostly unindexed
+    properties = {}
+    for i in range(20):
+        properties[f"int{i}"] = IntegerValue(i * 1000, indexed=i < 5)
+        properties[f"double{i}"] = DoubleValue(i / 3, indexed=False)
+        properties[f"str{i}"] = StringValue(f"value-{i}" * 4, indexed=False)
+
+    return Entity(KEY, properties)
+
+
+def nested_entity() -> Entity:
+    # document-like record with arrays, blobs, keys and geo points
+    return Entity(
+        KEY,
+        {
+            "tags": ArrayValue([StringValue(f"tag{i}") for i in range(10)]),
+            "scores": ArrayValue([IntegerValue(i) for i in range(10)]),
+            "blob": BlobValue(os.urandom(1024), indexed=False),
+            "owner": KeyValue(KEY),
+            "location": GeoPointValue(LatLng(52.52, 13.405)),
+            "deleted": NullValue(),
+        },
+    )
+
+
+SHAPES = {
+    "small": small_entity,
+    "wide": wide_entity,
+    "nested": nested_entity,
+}
+ENTITIES_DS = {name: shape().to_ds() for name, shape in SHAPES.items()}
+
+VALUES = [
+    NullValue(),
+    BooleanValue(True),
+    StringValue("some string value"),
+    IntegerValue(1234567890),
+    DoubleValue(1.23456789),
+    TimestampValue(TIMESTAMP),
+    BlobValue(os.urandom(256)),
+    ArrayValue([IntegerValue(1), StringValue("str"), NullValue()]),
+    GeoPointValue(LatLng(52.52, 13.405)),
+    KeyValue(KEY),
+]
+
+
+def nested_query() -> Query:
+    def prop_filter(name, op, value):
+        return PropertyFilter(PropertyReference(name), op, value)
+
+    return Query(
+        projection=[Projection(PropertyReference("name"))],
+        kind=KindExpression("Kind1"),
+        filter=CompositeFilter(
+            CompositeFilterOperator.AND,
+            [
+                prop_filter("a", PropertyFilterOperator.EQUAL, StringValue("x")),
+                CompositeFilter(
+                    CompositeFilterOperator.OR,
+                    [
+                        prop_filter(
+                            "b", PropertyFilterOperator.GREATER_THAN, IntegerValue(1)
+                        ),
+                        CompositeFilter(
+                            CompositeFilterOperator.AND,
+                            [
+                                prop_filter(
+                                    "c",
+                                    PropertyFilterOperator.LESS_THAN,
+                                    DoubleValue(1.5),
+                                ),
+                                prop_filter(
+                                    "d",
+                                    PropertyFilterOperator.EQUAL,
+                                    TimestampValue(TIMESTAMP),
+                                ),
+                            ],
+                        ),
+                    ],
+                ),
+            ],
+        ),
+        order=[PropertyOrder(PropertyReference("a"), Direction.DESCENDING)],
+        limit=100,
+    )
+
+
+def query_batch_ds(shape: str, size: int = 100):
+    return {
+        "entityResultType": "FULL",
+        "entityResults": [
+            {"entity": ENTITIES_DS[shape], "version": "1", "cursor": "Y3Vyc29y"}
+            for _ in range(size)
+        ],
+        "endCursor": "Y3Vyc29y",
+        "moreResults": "NOT_FINISHED",
+    }
+
+
+def entity_from_ds_access(data):
+    # properties are lazy, so measure decoding of every value too
+    entity = Entity.from_ds(data)
+    for value in entity.properties.values():
+        value.value
+
+
+def cases():
+    result = [
+        ("Key.from_ds", lambda: Key.from_ds(KEY_DS)),
+        ("Key.to_ds", KEY.to_ds),
+    ]
+
+    for name, shape in SHAPES.items():
+        entity = shape()
+        data = ENTITIES_DS[name]
+        result.extend(
+            [
+                (f"Entity.from_ds[{name}]", lambda d=data: Entity.from_ds(d)),
+                (
+                    f"Entity.from_ds+values[{name}]",
+                    lambda d=data: entity_from_ds_access(d),
+                ),
+                (f"Entity.to_ds[{name}]", entity.to_ds),
+                (f"Entity.to_ds[{name}, raw]", Entity.from_ds(data).to_ds),
+            ]
+        )
+
+    for value in VALUES:
+        name = type(value).__name__
+        raw = value.to_ds()[value.type_name]
+        if isinstance(value, ArrayValue):
+            raw = {"values": raw["values"]}
+        if isinstance(value, NullValue):
+            parsed = NullValue()
+        else:
+            parsed = type(value)(None, raw_value=raw)
+        result.extend(
+            [
+                (f"{name}.raw_to_py", parsed.raw_to_py),
+                (f"{name}.py_to_raw", value.py_to_raw),
+            ]
+        )
+
+    query = nested_query()
+    result.append(("Query.to_ds[nested filters]", query.to_ds))
+
+    for name in SHAPES:
+        data = query_batch_ds(name)
+        result.append(
+            (
+                f"QueryResultBatch.from_ds[100 x {name}]",
+                lambda d=data: QueryResultBatch.from_ds(d),
+            )
+        )
+
+    # keys-only results: generic decode vs keys fast path
+    data = {
+        "entityResultType": "KEY_ONLY",
+        "entityResults": [
+            {"entity": {"key": KEY_DS}, "cursor": "Y3Vyc29y"} for _ in range(100)
+        ],
+        "endCursor": "Y3Vyc29y",
+        "moreResults": "NOT_FINISHED",
+    }
+    result.extend(
+        [
+            (
+                "QueryResultBatch.from_ds[100 x key]",
+                lambda: QueryResultBatch.from_ds(data),
+            ),
+            (
+                "KeyQueryResultBatch.from_ds[100]",
+                lambda: KeyQueryResultBatch.from_ds(data),
+            ),
+            (
+                "KeyQueryResultBatch.from_ds[100, tuples]",
+                lambda: KeyQueryResultBatch.from_ds(data, tuples=True),
+            ),
+        ]
+    )
+
+    # projection results: Value objects vs rows and columns of Python values
+    data = {
+        "entityResultType": "PROJECTION",
+        "entityResults": [
+            {
+                "entity": {
+                    "key": KEY_DS,
+                    "properties": {
+                        "a": {"integerValue": str(i)},
+                        "b": {"doubleValue": i / 2},
+                    },
+                },
+                "cursor": "Y3Vyc29y",
+            }
+            for i in range(100)
+        ],
+        "endCursor": "Y3Vyc29y",
+        "moreResults": "NOT_FINISHED",
+    }
+    result.extend(
+        [
+            (
+                "QueryResultBatch.from_ds+values[100 x projection]",
+                lambda: [
+                    (er.entity["a"].value, er.entity["b"].value)
+                    for er in QueryResultBatch.from_ds(data).entity_results
+                ],
+            ),
+            (
+                "ProjectionQueryResultBatch.from_ds[100, rows]",
+                lambda: ProjectionQueryResultBatch.from_ds(data, ["a", "b"]),
+            ),
+            (
+                "ProjectionQueryResultBatch.from_ds[100, columns]",
+                lambda: ProjectionQueryResultBatch.from_ds(
+                    data, ["a", "b"], columns=True
+                ),
+            ),
+        ]
+    )
+    if columnar.np is not None:
+        result.append(
+            (
+                "ColumnBatch.from_ds[100 x projection]",
+                lambda: columnar.ColumnBatch.from_ds(data),
+            )
+        )
+
+    return result
+
+
+if __name__ == "__main__":
+    main(cases(), "Serialization layer microbenchmarks")
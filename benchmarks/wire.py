@@ -0,0 +1,127 @@
+"""Client CPU cost of REST JSON and gRPC protobuf wire formats.
+
+Compares encoding of commit requests and decoding of runQuery responses
+(100 entities) to and from wire bytes, to QueryResultBatch objects: REST
+JSON by `from_ds`, protobuf by `from_pb` (as client does) or through payload
+dicts. Requires grpcio and google-cloud-datastore packages.
+
+    python benchmarks/wire.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiodatastore import QueryResultBatch  # noqa: E402
+from aiodatastore import grpc_transport  # noqa: E402
+from harness import main  # noqa: E402
+from serialization import ENTITIES_DS, query_batch_ds  # noqa: E402
+
+
+def json_format_decode(response_type, wire):
+    # REST payload by json_format, as gRPC transports usually do
+    message = response_type.FromString(wire)
+    data = grpc_transport.json_format.MessageToDict(message)
+    return QueryResultBatch.from_ds(data["batch"])
+
+
+def read_values(batch):
+    # REST values are decoded lazily, on first access
+    for er in batch.entity_results:
+        for value in er.entity.properties.values():
+            value.value
+    return batch
+
+
+def cases():
+    request_type, _ = grpc_transport.message_types("commit")
+    _, response_type = grpc_transport.message_types("runQuery")
+    json_format = grpc_transport.json_format
+
+    result = []
+    for name, entity in ENTITIES_DS.items():
+        commit = {
+            "mode": "NON_TRANSACTIONAL",
+            "mutations": [{"upsert": entity} for _ in range(100)],
+        }
+        response = {"batch": query_batch_ds(name)}
+        body = json.dumps(response).encode()
+        wire = json_format.ParseDict(response, response_type()).SerializeToString()
+
+        result.extend(
+            [
+                (
+                    f"commit[100 x {name}] rest encode",
+                    lambda d=commit: json.dumps(d).encode(),
+                ),
+                (
+                    f"commit[100 x {name}] grpc encode, json_format",
+                    lambda d=commit: json_format.ParseDict(
+                        {**d, "projectId": "project1"}, request_type()
+                    ).SerializeToString(),
+                ),
+                (
+                    f"commit[100 x {name}] grpc encode",
+                    lambda d=commit: grpc_transport.encode_request(
+                        "commit", d, "project1"
+                    ).SerializeToString(),
+                ),
+                (
+                    f"runQuery[100 x {name}] rest decode",
+                    lambda b=body: QueryResultBatch.from_ds(json.loads(b)["batch"]),
+                ),
+                (
+                    f"runQuery[100 x {name}] rest decode, values read",
+                    lambda b=body: read_values(
+                        QueryResultBatch.from_ds(json.loads(b)["batch"])
+                    ),
+                ),
+                (
+                    f"runQuery[100 x {name}] grpc decode, json_format",
+                    lambda w=wire: json_format_decode(response_type, w),
+                ),
+                (
+                    f"runQuery[100 x {name}] grpc decode, payload dict",
+                    lambda w=wire: QueryResultBatch.from_ds(
+                        grpc_transport.decode_response(
+                            "runQuery", response_type.FromString(w)
+                        )["batch"]
+                    ),
+                ),
+                (
+                    f"runQuery[100 x {name}] grpc decode",
+                    lambda w=wire: QueryResultBatch.from_pb(
+                        response_type.FromString(w).batch
+                    ),
+                ),
+                (
+                    f"runQuery[100 x {name}] grpc decode, values read",
+                    lambda w=wire: read_values(
+                        QueryResultBatch.from_pb(response_type.FromString(w).batch)
+                    ),
+                ),
+            ]
+        )
+
+    return result
+
+
+def print_sizes():
+    _, response_type = grpc_transport.message_types("runQuery")
+    for name in ENTITIES_DS:
+        response = {"batch": query_batch_ds(name)}
+        body = json.dumps(response).encode()
+        message = grpc_transport.json_format.ParseDict(response, response_type())
+        print(
+            f"runQuery[100 x {name}] wire size: "
+            f"rest {len(body):,} B, grpc {message.ByteSize():,} B"
+        )
+
+
+if __name__ == "__main__":
+    if grpc_transport.grpc is None:
+        sys.exit("grpcio and google-cloud-datastore packages are required")
+    print_sizes()
+    main(cases(), "REST JSON vs gRPC protobuf client CPU")
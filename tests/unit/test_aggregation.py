@@ -0,0 +1,87 @@
+import unittest
+
+from aiodatastore.aggregation import (
+    AggregationQuery,
+    AggregationResult,
+    AggregationResultBatch,
+    Avg,
+    Count,
+    Sum,
+)
+from aiodatastore.constants import MoreResultsType
+from aiodatastore.property import PropertyReference
+from aiodatastore.query import KindExpression, Query
+from aiodatastore.values import DoubleValue, IntegerValue, NullValue
+
+
+class TestAggregation(unittest.TestCase):
+    def test__count__to_ds(self):
+        assert Count().to_ds() == {"count": {}}
+        assert Count(alias="total", up_to=100).to_ds() == {
+            "alias": "total",
+            "count": {"upTo": "100"},
+        }
+
+    def test__sum__to_ds(self):
+        assert Sum(PropertyReference("price"), alias="total").to_ds() == {
+            "alias": "total",
+            "sum": {"property": {"name": "price"}},
+        }
+
+    def test__avg__to_ds(self):
+        assert Avg(PropertyReference("price")).to_ds() == {
+            "avg": {"property": {"name": "price"}},
+        }
+
+
+class TestAggregationQuery(unittest.TestCase):
+    def test__to_ds(self):
+        query = AggregationQuery(
+            Query(kind=KindExpression("kind1"), limit=10),
+            [Count(alias="count"), Sum(PropertyReference("a"), alias="sum")],
+        )
+        assert query.to_ds() == {
+            "nestedQuery": {"kind": [{"name": "kind1"}], "limit": 10},
+            "aggregations": [
+                {"alias": "count", "count": {}},
+                {"alias": "sum", "sum": {"property": {"name": "a"}}},
+            ],
+        }
+
+
+class TestAggregationResult(unittest.TestCase):
+    def test__from_ds(self):
+        result = AggregationResult.from_ds(
+            {
+                "aggregateProperties": {
+                    "count": {"integerValue": "3"},
+                    "avg": {"doubleValue": 1.5},
+                    "empty": {"nullValue": None},
+                },
+            }
+        )
+        assert isinstance(result.aggregate_properties["count"], IntegerValue)
+        assert isinstance(result.aggregate_properties["avg"], DoubleValue)
+        assert isinstance(result.aggregate_properties["empty"], NullValue)
+        assert result["count"] == 3
+        assert result["avg"] == 1.5
+        assert result["empty"] is None
+        assert "count" in result
+        assert "unknown" not in result
+
+
+class TestAggregationResultBatch(unittest.TestCase):
+    def test__from_ds(self):
+        batch = AggregationResultBatch.from_ds(
+            {
+                "aggregationResults": [
+                    {"aggregateProperties": {"count": {"integerValue": "7"}}},
+                ],
+                "moreResults": "NO_MORE_RESULTS",
+                "readTime": "2023-01-01T00:00:00Z",
+            }
+        )
+        assert len(batch.aggregation_results) == 1
+        assert batch.more_results == MoreResultsType.NO_MORE_RESULTS
+        assert batch.read_time == "2023-01-01T00:00:00Z"
+        assert batch["count"] == 7
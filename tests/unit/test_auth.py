@@ -0,0 +1,88 @@
+import asyncio
+import datetime
+import time
+from unittest import mock
+
+import pytest
+from aiodatastore.auth import MIN_REFRESH_INTERVAL, AuthHeaders
+
+
+class FakeToken:
+    def __init__(self, duration=3600, delay=0.0):
+        self.access_token_duration = duration
+        self.access_token_acquired_at = None
+        self.delay = delay
+        self.calls = 0
+
+    async def get(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        self.access_token_acquired_at = datetime.datetime.utcnow()
+        return f"token{self.calls}"
+
+
+class TestAuthHeaders:
+    @pytest.mark.asyncio
+    async def test__cached(self):
+        token = FakeToken()
+        auth = AuthHeaders(token)
+        try:
+            for _ in range(10):
+                assert await auth.get() == {"Authorization": "Bearer token1"}
+        finally:
+            await auth.close()
+
+        assert token.calls == 1
+        assert auth.refreshes == 1
+
+    @pytest.mark.asyncio
+    async def test__concurrent_refresh(self):
+        token = FakeToken(delay=0.01)
+        auth = AuthHeaders(token)
+        try:
+            headers = await asyncio.gather(*(auth.get() for _ in range(10)))
+        finally:
+            await auth.close()
+
+        assert token.calls == 1
+        assert all(h == {"Authorization": "Bearer token1"} for h in headers)
+
+    @pytest.mark.asyncio
+    async def test__expired(self):
+        token = FakeToken()
+        auth = AuthHeaders(token)
+        try:
+            await auth.get()
+            auth._expires_at = time.monotonic()
+            assert await auth.get() == {"Authorization": "Bearer token2"}
+        finally:
+            await auth.close()
+
+    @pytest.mark.asyncio
+    async def test__background_refresh(self):
+        token = FakeToken()
+        auth = AuthHeaders(token)
+        try:
+            await auth.refresh()
+            # refresh at half of token lifetime
+            assert auth._refresh_at - time.monotonic() > 1700
+
+            auth._refresh_at = time.monotonic()
+            auth._start()
+            await asyncio.sleep(0.01)
+            assert token.calls == 2
+            assert await auth.get() == {"Authorization": "Bearer token2"}
+            assert auth._refresh_at - time.monotonic() >= MIN_REFRESH_INTERVAL
+        finally:
+            await auth.close()
+
+        assert auth._task is None
+
+    @pytest.mark.asyncio
+    async def test__error(self):
+        token = mock.Mock()
+        token.get = mock.AsyncMock(side_effect=RuntimeError("no credentials"))
+        auth = AuthHeaders(token)
+        with pytest.raises(RuntimeError):
+            await auth.get()
+        await auth.close()
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+
+import pytest
+from aiodatastore.bench import LoadResult, main_async, percentile, run
+
+
+class TestPercentile:
+    def test__percentile(self):
+        assert percentile([], 50) == 0.0
+
+        values = [float(i) for i in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 95) == 95.0
+        assert percentile(values, 99) == 99.0
+        assert percentile(values, 100) == 100.0
+        assert percentile([1.0], 99) == 1.0
+
+
+class TestRun:
+    @pytest.mark.asyncio
+    async def test__requests(self):
+        calls = 0
+
+        async def operation():
+            nonlocal calls
+            calls += 1
+            if calls % 5 == 0:
+                raise RuntimeError("error")
+            await asyncio.sleep(0)
+
+        result = await run(operation, concurrency=3, requests=20)
+        assert calls == 20
+        assert len(result.latencies) == 16
+        assert result.errors == {"RuntimeError": 4}
+
+        stats = result.to_dict()
+        assert stats["requests"] == 20
+        assert stats["throughput"] > 0
+        assert set(stats["latency_ms"]) == {"p50", "p95", "p99", "max"}
+
+    def test__to_dict__empty(self):
+        stats = LoadResult().to_dict()
+        assert stats["requests"] == 0
+        assert stats["throughput"] == 0.0
+        assert stats["cpu_per_request_ms"] == 0.0
+
+
+class TestMain:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "workload,transport",
+        [
+            ("lookup", "aiohttp"),
+            ("query", "aiohttp"),
+            ("write", "session"),
+            ("mixed", "memory"),
+        ],
+    )
+    async def test__fake(self, workload, transport, capsys):
+        args = argparse.Namespace(
+            workload=workload,
+            project="test",
+            kind="BenchEntity",
+            concurrency=2,
+            duration=None,
+            requests=10,
+            entities=20,
+            batch_size=3,
+            no_seed=False,
+            warmup=2,
+            fake=True,
+            fake_latency=0.0,
+            transport=transport,
+            compression_threshold=1024,
+            profile=True,
+            json=False,
+        )
+        stats = await main_async(args)
+
+        assert stats["requests"] == 10
+        assert stats["errors"] == {}
+        out = capsys.readouterr().out
+        assert f"workload:    {workload}" in out
+        assert f"transport:   {transport}" in out
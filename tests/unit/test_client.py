@@ -1,8 +1,24 @@
+import asyncio
+import gzip
+import json
 import os
 import unittest
 from unittest import mock
 
-from aiodatastore import Datastore, ReadConsistency
+import pytest
+from aiohttp import ClientResponseError
+from aiodatastore import (
+    Datastore,
+    Deadline,
+    Key,
+    KindExpression,
+    MetricsCollector,
+    PartitionId,
+    PathElement,
+    Query,
+    ReadConsistency,
+)
+from aiodatastore.transport import DataResponse, Response, Transport
 
 
 class TestDatastore(unittest.TestCase):
@@ -16,8 +32,17 @@ class TestDatastore(unittest.TestCase):
 
     @mock.patch.dict(os.environ, {"DATASTORE_EMULATOR_HOST": "host1"})
     def test__init__emulator_mode(self):
-        ds = Datastore(project_id="project1")
+        ds = Datastore(project_id="project1", service_file="creds.json")
         assert ds._token is None
+        assert ds._api_url == "http://host1/v1"
+
+    def test__init__api_url(self):
+        with mock.patch.dict(os.environ, clear=True):
+            ds = Datastore(project_id="project1")
+        assert ds._api_url == "https://datastore.googleapis.com/v1"
+
+        ds = Datastore(project_id="project1", api_url="http://host2/v1")
+        assert ds._api_url == "http://host2/v1"
 
     def test__get_read_options__transaction_id(self):
         ds = Datastore(project_id="project1")
@@ -41,3 +66,445 @@ class TestDatastore(unittest.TestCase):
             "projectId": "project1",
             "namespaceId": "namespace1",
         }
+
+
+def _batch(results, more_results, end_cursor="", skipped=0):
+    return {
+        "batch": {
+            "entityResultType": "FULL",
+            "entityResults": [
+                {
+                    "entity": {
+                        "key": {
+                            "partitionId": {"projectId": "project1"},
+                            "path": [{"kind": "kind1", "name": name}],
+                        },
+                    },
+                }
+                for name in results
+            ],
+            "skippedResults": skipped,
+            "endCursor": end_cursor,
+            "moreResults": more_results,
+        },
+    }
+
+
+class TestDatastoreRequests:
+    @pytest.mark.asyncio
+    async def test__request__timeout(self):
+        ds = Datastore(project_id="project1")
+
+        async def send(call, build, decode=None, decode_message=None):
+            await asyncio.sleep(10)
+
+        with mock.patch.object(ds, "_send", side_effect=send):
+            with pytest.raises(asyncio.TimeoutError):
+                await ds.lookup([], timeout=0.01)
+
+    @pytest.mark.asyncio
+    async def test__commit__shared_deadline(self):
+        ds = Datastore(project_id="project1")
+        responses = [{"transaction": "txn1"}, {"mutationResults": []}]
+        deadlines = []
+
+        async def request(call, build, decode=None, deadline=None, **kwargs):
+            deadlines.append(deadline)
+            return decode(responses.pop(0))
+
+        with mock.patch.object(ds, "_request", side_effect=request):
+            await ds.commit([], timeout=5)
+
+        assert len(deadlines) == 2
+        assert isinstance(deadlines[0], Deadline)
+        assert deadlines[0] is deadlines[1]
+
+    @pytest.mark.asyncio
+    async def test__iter_query(self):
+        ds = Datastore(project_id="project1")
+        responses = [
+            _batch(["a", "b"], "NOT_FINISHED", end_cursor="c1"),
+            _batch(["c"], "NO_MORE_RESULTS", end_cursor="c2"),
+        ]
+        requests = []
+
+        async def request(call, build, decode=None, deadline=None, **kwargs):
+            requests.append((build(), deadline))
+            return decode(responses.pop(0))
+
+        query = Query(kind=KindExpression("kind1"), limit=10)
+        with mock.patch.object(ds, "_request", side_effect=request):
+            results = [er async for er in ds.iter_query(query, timeout=5)]
+
+        assert [er.entity.key.path[0].name for er in results] == ["a", "b", "c"]
+        assert "startCursor" not in requests[0][0]["query"]
+        assert requests[0][0]["query"]["limit"] == 10
+        assert requests[1][0]["query"]["startCursor"] == "c1"
+        assert requests[1][0]["query"]["limit"] == 8
+        assert requests[0][1] is requests[1][1]
+        # original query is left untouched
+        assert query.start_cursor == ""
+        assert query.limit == 10
+
+    @pytest.mark.asyncio
+    async def test__iter_query__offset(self):
+        ds = Datastore(project_id="project1")
+        responses = [
+            _batch([], "NOT_FINISHED", end_cursor="c1", skipped=3),
+            _batch(["a"], "NO_MORE_RESULTS", end_cursor="c2", skipped=2),
+        ]
+        requests = []
+
+        async def request(call, build, decode=None, deadline=None, **kwargs):
+            requests.append(build())
+            return decode(responses.pop(0))
+
+        query = Query(kind=KindExpression("kind1"), offset=5)
+        with mock.patch.object(ds, "_request", side_effect=request):
+            results = [er async for er in ds.iter_query(query)]
+
+        assert len(results) == 1
+        assert requests[0]["query"]["offset"] == 5
+        assert requests[1]["query"]["offset"] == 2
+
+    @pytest.mark.asyncio
+    async def test__iter_keys(self):
+        ds = Datastore(project_id="project1")
+        responses = [
+            _batch(["a", "b"], "NOT_FINISHED", end_cursor="c1"),
+            _batch(["c"], "NO_MORE_RESULTS", end_cursor="c2"),
+        ]
+        requests = []
+
+        async def request(call, build, decode=None, deadline=None, **kwargs):
+            requests.append(build())
+            return decode(responses.pop(0))
+
+        query = Query(kind=KindExpression("kind1"), limit=10)
+        with mock.patch.object(ds, "_request", side_effect=request):
+            keys = [key async for key in ds.iter_keys(query)]
+
+        assert [key.path[0].name for key in keys] == ["a", "b", "c"]
+        assert isinstance(keys[0], Key)
+        assert requests[0]["query"]["projection"] == [{"property": {"name": "__key__"}}]
+        assert requests[1]["query"]["startCursor"] == "c1"
+        assert requests[1]["query"]["limit"] == 8
+        assert query.projection is None
+
+    @pytest.mark.asyncio
+    async def test__run_keys_query__tuples(self):
+        ds = Datastore(project_id="project1")
+
+        async def request(call, build, decode=None, deadline=None, **kwargs):
+            return decode(_batch(["a", "b"], "NO_MORE_RESULTS"))
+
+        query = Query(kind=KindExpression("kind1"))
+        with mock.patch.object(ds, "_request", side_effect=request):
+            batch = await ds.run_keys_query(query, tuples=True)
+
+        assert batch.keys == [
+            ("project1", "", (("kind1", "a"),)),
+            ("project1", "", (("kind1", "b"),)),
+        ]
+
+    @pytest.mark.asyncio
+    async def test__iter_columns(self):
+        pytest.importorskip("numpy")
+        ds = Datastore(project_id="project1")
+        pages = [
+            _batch(["a", "b"], "NOT_FINISHED", end_cursor="c1"),
+            _batch(["c"], "NOT_FINISHED", end_cursor="c2"),
+            _batch(["d", "e"], "NO_MORE_RESULTS", end_cursor="c3"),
+        ]
+        pages[0]["batch"]["entityResults"][0]["entity"]["properties"] = {
+            "p": {"integerValue": "1"},
+            "n": {"nullValue": None},
+        }
+        pages[1]["batch"]["entityResults"][0]["entity"]["properties"] = {
+            "p": {"stringValue": "x"},
+            "q": {"integerValue": "2"},
+        }
+        pages[2]["batch"]["entityResults"][0]["entity"]["properties"] = {
+            "p": {"integerValue": "3"},
+            "q": {"doubleValue": 2.5},
+            "n": {"integerValue": "4"},
+        }
+
+        async def request(call, build, decode=None, deadline=None, **kwargs):
+            build()
+            return decode(pages.pop(0))
+
+        query = Query(kind=KindExpression("kind1"))
+        with mock.patch.object(ds, "_request", side_effect=request):
+            batches = [b async for b in ds.iter_columns(query)]
+
+        # dtypes of previous pages are kept, int64 is widened to float64
+        # and properties first seen on a page are added
+        assert [len(b) for b in batches] == [2, 1, 2]
+        assert batches[0].dtypes == {"p": "int64", "n": "object"}
+        assert batches[1].dtypes == {"p": "int64", "n": "object", "q": "int64"}
+        assert batches[2].dtypes == {"p": "int64", "n": "int64", "q": "float64"}
+        assert [b.new_columns for b in batches] == [["p", "n"], ["q"], []]
+        assert batches[0]["p"].valid.tolist() == [True, False]
+        assert batches[1]["p"].valid.tolist() == [False]
+        assert batches[1]["n"].valid.tolist() == [False]
+        assert batches[2]["q"].values.tolist()[0] == 2.5
+
+
+class TestDatastoreMiddlewares:
+    @pytest.mark.asyncio
+    async def test__send(self):
+        ds = Datastore(project_id="project1", namespace="ns1")
+        resp = Response(200, b'{"transaction": "txn1"}')
+        ds._transport.request = mock.AsyncMock(return_value=resp)
+
+        call = ds._new_call("beginTransaction")
+        result = await ds._send(
+            call, lambda: {}, decode=lambda data: data["transaction"]
+        )
+        assert result == "txn1"
+
+        assert call.rpc == "beginTransaction"
+        assert call.namespace == "ns1"
+        assert call.status == 200
+        assert call.request_size == 2
+        assert call.response_size == len(resp.body)
+        assert call.result == "txn1"
+
+        url, body, headers = ds._transport.request.call_args.args
+        assert url.endswith("/projects/project1:beginTransaction")
+        assert body == b"{}"
+        assert headers["Content-Type"] == "application/json"
+
+    def test__new_call__kind(self):
+        ds = Datastore(project_id="project1")
+        partition_id = PartitionId("project1")
+        key1 = Key(partition_id, [PathElement("kind1")])
+        key2 = Key(partition_id, [PathElement("kind2")])
+
+        call = ds._new_call("lookup", keys=[key1, key1])
+        assert call.kind == "kind1"
+        assert call.key_count == 2
+
+        call = ds._new_call("lookup", keys=[key1, key2])
+        assert call.kind is None
+
+    @pytest.mark.asyncio
+    async def test__middlewares(self):
+        events = []
+
+        def make_middleware(name):
+            async def middleware(call, call_next):
+                events.append(f"{name}:before:{call.rpc}")
+                result = await call_next(call)
+                events.append(f"{name}:after:{result}")
+                return result
+
+            return middleware
+
+        ds = Datastore(project_id="project1", middlewares=[make_middleware("m1")])
+        ds.add_middleware(make_middleware("m2"))
+        ds._transport.request = mock.AsyncMock(
+            return_value=Response(200, b'{"transaction": "txn1"}')
+        )
+
+        assert await ds.begin_transaction() == "txn1"
+        assert events == [
+            "m1:before:beginTransaction",
+            "m2:before:beginTransaction",
+            "m2:after:txn1",
+            "m1:after:txn1",
+        ]
+
+
+class TestDatastoreCompression:
+    @pytest.mark.asyncio
+    async def test__send__compressed(self):
+        ds = Datastore(project_id="project1", compression_threshold=100)
+        resp_body = b'{"transaction": "' + b"t" * 1000 + b'"}'
+        ds._transport.request = mock.AsyncMock(
+            return_value=Response(200, gzip.compress(resp_body), "gzip")
+        )
+
+        call = ds._new_call("commit")
+        result = await ds._send(call, lambda: {"a": "x" * 1000})
+        assert result == {"transaction": "t" * 1000}
+
+        url, body, headers = ds._transport.request.call_args.args
+        assert json.loads(gzip.decompress(body)) == {"a": "x" * 1000}
+        assert headers["Content-Encoding"] == "gzip"
+        assert headers["Accept-Encoding"] == "gzip"
+
+        assert call.request_size > 1000
+        assert call.request_wire_size == len(body)
+        assert call.response_size == len(resp_body)
+        assert call.response_wire_size < 100
+        assert call.compress_time > 0
+
+    @pytest.mark.asyncio
+    async def test__send__decoded_by_transport(self):
+        ds = Datastore(project_id="project1", compression_threshold=100)
+        resp_body = b'{"transaction": "' + b"t" * 1000 + b'"}'
+        ds._transport.request = mock.AsyncMock(
+            return_value=Response(200, resp_body, wire_size=40)
+        )
+
+        call = ds._new_call("commit")
+        await ds._send(call, lambda: {"a": 1})
+        assert call.response_size == len(resp_body)
+        assert call.response_wire_size == 40
+
+    @pytest.mark.asyncio
+    async def test__send__below_threshold(self):
+        ds = Datastore(project_id="project1", compression_threshold=100)
+        ds._transport.request = mock.AsyncMock(return_value=Response(200, b"{}"))
+
+        call = ds._new_call("commit")
+        await ds._send(call, lambda: {"a": 1})
+
+        url, body, headers = ds._transport.request.call_args.args
+        assert body == b'{"a": 1}'
+        assert "Content-Encoding" not in headers
+        assert headers["Accept-Encoding"] == "gzip"
+        assert call.request_wire_size == call.request_size
+
+    @pytest.mark.asyncio
+    async def test__send__disabled(self):
+        ds = Datastore(project_id="project1")
+        ds._transport.request = mock.AsyncMock(return_value=Response(200, b"{}"))
+
+        await ds._send(ds._new_call("commit"), lambda: {"a": "x" * 1000})
+
+        url, body, headers = ds._transport.request.call_args.args
+        assert "Content-Encoding" not in headers
+        assert "Accept-Encoding" not in headers
+
+
+class TestDatastorePayloadTransport:
+    @pytest.mark.asyncio
+    async def test__send(self):
+        transport = Transport()
+        transport.encodes_payload = True
+        transport.request_data = mock.AsyncMock(
+            return_value=DataResponse(200, {"transaction": "t"}, 10, 20)
+        )
+        ds = Datastore(project_id="project1", transport=transport)
+
+        call = ds._new_call("beginTransaction")
+        assert await ds._send(call, lambda: {"a": 1}, decode=len) == 1
+
+        url, data, headers = transport.request_data.call_args.args
+        assert url.endswith("/projects/project1:beginTransaction")
+        assert data == {"a": 1}
+        assert call.request_size == call.request_wire_size == 10
+        assert call.response_size == call.response_wire_size == 20
+
+    @pytest.mark.asyncio
+    async def test__send__message(self):
+        transport = Transport()
+        transport.encodes_payload = True
+        transport.request_data = mock.AsyncMock(
+            return_value=DataResponse(200, {}, message=21)
+        )
+        ds = Datastore(project_id="project1", transport=transport)
+
+        call = ds._new_call("runQuery")
+        result = await ds._send(call, dict, decode=len, decode_message=lambda m: m * 2)
+        assert result == 42
+        assert transport.request_data.call_args.kwargs == {"message": True}
+
+    @pytest.mark.asyncio
+    async def test__send__error(self):
+        transport = Transport()
+        transport.encodes_payload = True
+        error = {"error": {"code": 409, "message": "exists", "status": "ABORTED"}}
+        transport.request_data = mock.AsyncMock(return_value=DataResponse(409, error))
+        ds = Datastore(project_id="project1", transport=transport)
+
+        call = ds._new_call("commit")
+        with pytest.raises(ClientResponseError) as e:
+            await ds._send(call, lambda: {})
+        assert e.value.status == 409
+        assert call.status == 409
+
+
+class TestDatastoreWarmup:
+    @pytest.mark.asyncio
+    async def test__warmup(self):
+        ds = Datastore(project_id="project1")
+        ds._get_headers = mock.AsyncMock(return_value={})
+        ds._transport.warmup = mock.AsyncMock()
+        ds._transport.request = mock.AsyncMock(return_value=Response(200, b"{}"))
+
+        await ds.warmup(connections=5)
+        ds._get_headers.assert_called_once()
+        ds._transport.warmup.assert_called_once_with(mock.ANY, 5)
+        ds._transport.request.assert_not_called()
+
+        await ds.warmup(rpc=True, timeout=1)
+        url, body, headers = ds._transport.request.call_args.args
+        assert url.endswith(":allocateIds")
+        assert body == b'{"keys": []}'
+
+    @pytest.mark.asyncio
+    async def test__warmup__timeout(self):
+        async def warmup(url, connections):
+            await asyncio.sleep(1)
+
+        ds = Datastore(project_id="project1")
+        ds._transport.warmup = warmup
+        with pytest.raises(asyncio.TimeoutError):
+            await ds.warmup(timeout=0.01)
+
+
+class TestDatastoreView:
+    @pytest.mark.asyncio
+    async def test__view(self):
+        collector = MetricsCollector()
+        ds = Datastore(project_id="project1", middlewares=[collector])
+        ds._transport.request = mock.AsyncMock(
+            return_value=Response(200, b'{"transaction": "txn1"}')
+        )
+        ds._transport.close = mock.AsyncMock()
+
+        view = ds.view(namespace="ns2", project_id="project2")
+        assert view._transport is ds._transport
+        assert view._auth is ds._auth
+        assert view._middlewares is ds._middlewares
+        assert view._get_partition_id() == {
+            "projectId": "project2",
+            "namespaceId": "ns2",
+        }
+        assert ds._get_partition_id() == {"projectId": "project1", "namespaceId": ""}
+        assert ds.view(namespace="ns3")._project_id == "project1"
+
+        await view.begin_transaction()
+        url = ds._transport.request.call_args.args[0]
+        assert url.endswith("/projects/project2:beginTransaction")
+        assert [m["namespace"] for m in collector.snapshot()] == ["ns2"]
+
+        await view.close()
+        ds._transport.close.assert_not_called()
+        await ds.close()
+        ds._transport.close.assert_called_once()
+
+
+class TestDatastoreCommit:
+    @pytest.mark.asyncio
+    async def test__commit__transaction_id(self):
+        ds = Datastore(project_id="project1")
+        requests = []
+
+        async def request(call, build, decode=None, deadline=None, **kwargs):
+            requests.append((call.rpc, build()))
+            return decode({"mutationResults": []})
+
+        with mock.patch.object(ds, "_request", side_effect=request):
+            await ds.commit([], transaction_id="txn1")
+
+        assert requests == [
+            (
+                "commit",
+                {"mode": "TRANSACTIONAL", "mutations": [], "transaction": "txn1"},
+            )
+        ]
@@ -0,0 +1,153 @@
+import datetime
+import unittest
+from unittest import mock
+
+import pytest
+from aiodatastore import columnar
+from aiodatastore.constants import MoreResultsType
+from aiodatastore.key import Key, PartitionId, PathElement
+
+
+def _batch(entities, more_results="NO_MORE_RESULTS"):
+    key = Key(PartitionId("project1"), [PathElement("kind1", name="name1")])
+    return {
+        "entityResultType": "FULL",
+        "entityResults": [
+            {"entity": {"key": key.to_ds(), "properties": properties}}
+            for properties in entities
+        ],
+        "endCursor": "end-cursor",
+        "moreResults": more_results,
+    }
+
+
+DATA = _batch(
+    [
+        {
+            "i": {"integerValue": "1"},
+            "d": {"doubleValue": 1.5},
+            "b": {"booleanValue": True},
+            "t": {"timestampValue": "2023-12-04T10:20:30.123456789Z"},
+            "s": {"stringValue": "a"},
+        },
+        {
+            "i": {"nullValue": None},
+            "d": {"doubleValue": "NaN"},
+            "s": {"stringValue": "b"},
+        },
+        {
+            "i": {"stringValue": "3"},
+            "d": {"doubleValue": -2.0},
+            "b": {"booleanValue": False},
+            "t": {"timestampValue": "2023-12-04T10:20:31Z"},
+        },
+    ]
+)
+
+
+class TestColumnBatch(unittest.TestCase):
+    def setUp(self):
+        self.np = pytest.importorskip("numpy")
+
+    def test__from_ds(self):
+        np = self.np
+        batch = columnar.ColumnBatch.from_ds(DATA)
+        assert len(batch) == 3
+        assert batch.dtypes == {
+            "i": "int64",
+            "d": "float64",
+            "b": "bool",
+            "t": "datetime64[us]",
+            "s": "object",
+        }
+        assert batch.end_cursor == "end-cursor"
+        assert batch.more_results == MoreResultsType.NO_MORE_RESULTS
+
+        # null, missing and other type values are invalid
+        assert batch["i"].values[0] == 1
+        assert batch["i"].valid.tolist() == [True, False, False]
+        assert np.isnan(batch["d"].values[1])
+        assert batch["d"].valid.all()
+        assert batch["b"].values.tolist()[::2] == [True, False]
+        assert batch["b"].valid.tolist() == [True, False, True]
+        assert batch["t"].values[0] == np.datetime64("2023-12-04T10:20:30.123456")
+        assert batch["t"].values[2].astype(datetime.datetime) == datetime.datetime(
+            2023, 12, 4, 10, 20, 31
+        )
+        assert batch["s"].values.tolist() == ["a", "b", None]
+        assert batch["s"].valid.tolist() == [True, True, False]
+        assert batch["i"].masked().sum() == 1
+
+    def test__from_ds__properties_dtypes(self):
+        batch = columnar.ColumnBatch.from_ds(
+            DATA, properties=["__key__", "i"], dtypes={"i": "object"}
+        )
+        assert list(batch.columns) == ["__key__", "i"]
+        assert batch["__key__"].values[0].path[0].name == "name1"
+        assert batch["__key__"].valid.all()
+        assert batch["i"].values.tolist() == [1, None, "3"]
+
+    def test__from_ds__widened(self):
+        data = _batch(
+            [
+                {"n": {"integerValue": "1"}},
+                {"n": {"doubleValue": 2.5}},
+                {"n": {"integerValue": "3"}},
+            ]
+        )
+        batch = columnar.ColumnBatch.from_ds(data)
+        assert batch.dtypes == {"n": "float64"}
+        assert batch["n"].values.tolist() == [1.0, 2.5, 3.0]
+        assert batch["n"].valid.all()
+
+        # integers are accepted by float64 columns
+        batch = columnar.ColumnBatch.from_ds(DATA, dtypes={"i": "float64"})
+        assert batch["i"].values.tolist()[0] == 1.0
+        assert batch["i"].valid.tolist() == [True, False, False]
+
+    def test__from_ds__inferred(self):
+        data = _batch([{"i": {"doubleValue": 2.5}}, {"s": {"stringValue": "a"}}])
+        batch = columnar.ColumnBatch.from_ds(
+            data, inferred={"i": "int64", "s": "bool", "n": None}
+        )
+        assert batch.dtypes == {"i": "float64", "s": "bool", "n": "object"}
+        assert batch.new_columns == []
+        assert batch["s"].valid.tolist() == [False, False]
+        assert batch["n"].valid.tolist() == [False, False]
+
+        batch = columnar.ColumnBatch.from_ds(data, inferred={"i": "int64"})
+        assert batch.new_columns == ["s"]
+        assert columnar.ColumnBatch.from_ds(data).new_columns == ["i", "s"]
+
+    def test__concat(self):
+        batch = columnar.ColumnBatch.from_ds(DATA, properties=["d"])
+        columns = columnar.concat([batch, batch])
+        assert len(columns["d"]) == 6
+        assert columns["d"].masked().count() == 6
+        assert columnar.concat([]) == {}
+
+    def test__concat__columns(self):
+        first = columnar.ColumnBatch.from_ds(DATA, properties=["i"])
+        second = columnar.ColumnBatch.from_ds(
+            _batch(
+                [
+                    {
+                        "i": {"doubleValue": 0.5},
+                        "t": {"timestampValue": "2023-12-04T10:20:30Z"},
+                    }
+                ]
+            ),
+            inferred=first.dtypes,
+        )
+        columns = columnar.concat([first, second])
+        assert columns["i"].values.dtype == "float64"
+        assert columns["i"].valid.tolist() == [True, False, False, True]
+        assert columns["t"].values.dtype == "datetime64[us]"
+        assert columns["t"].valid.tolist() == [False, False, False, True]
+
+
+class TestColumnBatchNoNumpy(unittest.TestCase):
+    def test__from_ds(self):
+        with mock.patch.object(columnar, "np", None):
+            with self.assertRaises(RuntimeError):
+                columnar.ColumnBatch.from_ds(DATA)
@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import pytest
+from aiodatastore import Deadline
+
+
+class TestDeadline(unittest.TestCase):
+    def test__init(self):
+        with mock.patch("time.monotonic", return_value=100.0):
+            d = Deadline(1.5)
+        assert d.expires_at == 101.5
+
+    def test__from_timeout(self):
+        assert Deadline.from_timeout(None) is None
+
+        d = Deadline(1.0)
+        assert Deadline.from_timeout(d) is d
+
+        d = Deadline.from_timeout(1.0)
+        assert isinstance(d, Deadline)
+
+    def test__remaining(self):
+        with mock.patch("time.monotonic", return_value=100.0):
+            d = Deadline(1.0)
+
+        with mock.patch("time.monotonic", return_value=100.25):
+            assert d.remaining() == 0.75
+            assert not d.expired
+
+        with mock.patch("time.monotonic", return_value=102.0):
+            assert d.remaining() == 0.0
+            assert d.expired
+
+
+class TestDeadlineWaitFor:
+    @pytest.mark.asyncio
+    async def test__wait_for(self):
+        async def coro():
+            return 123
+
+        assert await Deadline(1.0).wait_for(coro()) == 123
+
+    @pytest.mark.asyncio
+    async def test__wait_for__timeout(self):
+        cancelled = asyncio.Event()
+
+        async def coro():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(asyncio.TimeoutError):
+            await Deadline(0.01).wait_for(coro())
+        assert cancelled.is_set()
+
+    @pytest.mark.asyncio
+    async def test__wait_for__expired(self):
+        called = False
+
+        async def coro():
+            nonlocal called
+            called = True
+
+        with pytest.raises(asyncio.TimeoutError):
+            await Deadline(-1.0).wait_for(coro())
+        assert not called
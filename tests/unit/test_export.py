@@ -0,0 +1,295 @@
+import datetime
+import unittest
+from unittest import mock
+
+import pytest
+from aiodatastore import (
+    ArrayValue,
+    BlobValue,
+    Datastore,
+    DoubleValue,
+    Entity,
+    GeoPointValue,
+    IntegerValue,
+    Key,
+    KeyValue,
+    KindExpression,
+    LatLng,
+    Mode,
+    NullValue,
+    PartitionId,
+    PathElement,
+    Query,
+    StringValue,
+    TimestampValue,
+    UpsertMutation,
+)
+from aiodatastore import export
+from aiodatastore.fake import MAX_BATCH_SIZE, MemoryTransport
+
+
+def _key(id, kind="kind1"):
+    return Key(PartitionId("project1"), [PathElement(kind, id=str(id))])
+
+
+def _entity(id):
+    return Entity(
+        _key(id),
+        {
+            "i": IntegerValue(id),
+            "d": DoubleValue(id / 2),
+            "s": StringValue(f"s{id}"),
+            "t": TimestampValue(datetime.datetime(2023, 12, 4, 10, 20, 30, id)),
+            "b": BlobValue(b"blob"),
+            "k": KeyValue(_key(id, kind="kind2")),
+            "g": GeoPointValue(LatLng(1.5, 2.5)),
+            "a": ArrayValue([IntegerValue(id), IntegerValue(id + 1)]),
+        },
+    )
+
+
+def _data(entities):
+    return {
+        "entityResults": [{"entity": e.to_ds()} for e in entities],
+        "endCursor": "end-cursor",
+        "moreResults": "NO_MORE_RESULTS",
+    }
+
+
+class TestArrowResultBatch(unittest.TestCase):
+    def setUp(self):
+        self.pa = pytest.importorskip("pyarrow")
+
+    def test__from_ds(self):
+        pa = self.pa
+        batch = export.ArrowResultBatch.from_ds(_data([_entity(1), _entity(2)]))
+        assert len(batch) == 2
+        schema = batch.record_batch.schema
+        assert schema.names == ["__key__", "i", "d", "s", "t", "b", "k", "g", "a"]
+        assert schema.field("i").type == pa.int64()
+        assert schema.field("d").type == pa.float64()
+        assert schema.field("t").type == pa.timestamp("us")
+        assert schema.field("b").type == pa.binary()
+        assert schema.field("a").type == pa.list_(pa.int64())
+
+        row = batch.record_batch.to_pylist()[0]
+        assert row["__key__"] == {
+            "project_id": "project1",
+            "namespace_id": "",
+            "path": [{"kind": "kind1", "id": 1, "name": None}],
+        }
+        assert row["i"] == 1
+        assert row["d"] == 0.5
+        assert row["s"] == "s1"
+        assert row["t"] == datetime.datetime(2023, 12, 4, 10, 20, 30, 1)
+        assert row["b"] == b"blob"
+        assert row["k"]["path"] == [{"kind": "kind2", "id": 1, "name": None}]
+        assert row["g"] == {"latitude": 1.5, "longitude": 2.5}
+        assert row["a"] == [1, 2]
+
+    def test__from_ds__schema(self):
+        pa = self.pa
+        entity = Entity(_key(1), {"i": StringValue("x"), "s": StringValue("s")})
+        schema = export.infer_schema([_entity(1).to_ds()], properties=["i", "x"])
+        assert schema.names == ["__key__", "i", "x"]
+        assert schema.field("x").type == pa.null()
+
+        # values of other types and properties which aren't in schema
+        with pytest.raises(ValueError, match="property 'i'"):
+            export.ArrowResultBatch.from_ds(
+                _data([Entity(_key(1), {"i": StringValue("x")})]), schema=schema
+            )
+        with pytest.raises(ValueError, match="property 's'"):
+            export.ArrowResultBatch.from_ds(
+                _data([Entity(_key(1), {"i": IntegerValue(1), "s": StringValue("s")})]),
+                schema=export.infer_schema([_entity(1).to_ds()], properties=["i"]),
+            )
+        with pytest.raises(ValueError, match="property 'a'"):
+            export.ArrowResultBatch.from_ds(
+                _data([Entity(_key(1), {"a": ArrayValue([StringValue("x")])})]),
+                schema=pa.schema(
+                    [("__key__", export.key_type()), ("a", pa.list_(pa.int64()))]
+                ),
+            )
+        with pytest.raises(ValueError, match="property 'x'"):
+            export.ArrowResultBatch.from_ds(
+                _data([Entity(_key(1), {"x": IntegerValue(1)})]), schema=schema
+            )
+
+        # are dropped and written as nulls when not strict
+        batch = export.ArrowResultBatch.from_ds(
+            _data([entity]), schema=schema, strict=False
+        )
+        assert batch.record_batch.to_pylist()[0]["i"] is None
+        assert batch.record_batch.schema == schema
+
+        # integers are accepted by double fields
+        batch = export.ArrowResultBatch.from_ds(
+            _data([Entity(_key(1), {"d": IntegerValue(3)})]),
+            schema=pa.schema([("__key__", export.key_type()), ("d", pa.float64())]),
+        )
+        assert batch.record_batch.to_pylist()[0]["d"] == 3.0
+
+        # values without Arrow type are nulls
+        data = _data([Entity(_key(1), {})])
+        data["entityResults"][0]["entity"]["properties"] = {
+            "i": {"entityValue": {"properties": {}}}
+        }
+        batch = export.ArrowResultBatch.from_ds(data, schema=schema)
+        assert batch.record_batch.to_pylist()[0]["i"] is None
+
+    def test__infer_schema(self):
+        pa = self.pa
+        entities = [
+            Entity(
+                _key(1),
+                {
+                    "i": IntegerValue(1),
+                    "n": NullValue(),
+                    "a": ArrayValue([]),
+                    "s": StringValue("x"),
+                },
+            ),
+            Entity(
+                _key(2),
+                {
+                    "i": DoubleValue(1.5),
+                    "n": StringValue("x"),
+                    "a": ArrayValue([IntegerValue(1), DoubleValue(1.5)]),
+                    "s": IntegerValue(1),
+                    "x": NullValue(),
+                },
+            ),
+        ]
+        schema = export.infer_schema([e.to_ds() for e in entities])
+        assert schema.names == ["__key__", "i", "n", "a", "s", "x"]
+        # int64 is widened to float64, nulls are resolved by next values,
+        # other types are kept
+        assert schema.field("i").type == pa.float64()
+        assert schema.field("n").type == pa.string()
+        assert schema.field("a").type == pa.list_(pa.float64())
+        assert schema.field("s").type == pa.string()
+        assert schema.field("x").type == pa.null()
+
+        assert export.merge_types(pa.list_(pa.null()), pa.list_(pa.int64())) == (
+            pa.list_(pa.int64())
+        )
+        assert export.merge_types(pa.float64(), pa.int64()) == pa.float64()
+
+
+class TestExportParquet:
+    @pytest.mark.asyncio
+    async def test__export_parquet(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+
+        total = MAX_BATCH_SIZE + 50
+        path = str(tmp_path / "kind1.parquet")
+        async with Datastore("project1", transport=MemoryTransport()) as ds:
+            await ds.commit(
+                [UpsertMutation(_entity(i)) for i in range(1, total + 1)],
+                mode=Mode.NON_TRANSACTIONAL,
+            )
+            rows = await export.export_parquet(
+                ds, Query(kind=KindExpression("kind1")), path, row_group_size=100
+            )
+
+        assert rows == total
+        parquet = pq.ParquetFile(path)
+        assert parquet.metadata.num_rows == total
+        assert parquet.metadata.num_row_groups == 4
+        table = parquet.read()
+        assert sorted(table.column("i").to_pylist()) == list(range(1, total + 1))
+
+    @pytest.mark.asyncio
+    async def test__export_parquet__empty(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+
+        path = str(tmp_path / "empty.parquet")
+        async with Datastore("project1", transport=MemoryTransport()) as ds:
+            rows = await export.export_parquet(
+                ds, Query(kind=KindExpression("kind1")), path
+            )
+
+        assert rows == 0
+        assert pq.read_table(path).schema.names == ["__key__"]
+
+    @pytest.mark.asyncio
+    async def test__export_parquet__sparse(self, tmp_path):
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+
+        # "i" is integer on the first page and double on the next ones, "s"
+        # is null and "a" is empty on the first page, "x" is on the last page
+        total = 2 * MAX_BATCH_SIZE + 100
+        entities = []
+        for i in range(total):
+            first_page = i < MAX_BATCH_SIZE
+            properties = {
+                "i": IntegerValue(i) if first_page else DoubleValue(i + 0.5),
+                "s": NullValue() if first_page else StringValue(f"s{i}"),
+                "a": ArrayValue([] if first_page else [IntegerValue(i)]),
+            }
+            if i == total - 1:
+                properties["x"] = IntegerValue(i)
+            entities.append(Entity(_key(i + 1), properties))
+
+        path = str(tmp_path / "kind1.parquet")
+        async with Datastore("project1", transport=MemoryTransport()) as ds:
+            await ds.commit(
+                [UpsertMutation(e) for e in entities], mode=Mode.NON_TRANSACTIONAL
+            )
+            query = Query(kind=KindExpression("kind1"))
+            rows = await export.export_parquet(ds, query, path)
+
+            # schema of the first page doesn't match next pages
+            with pytest.raises(ValueError, match="property 'i'"):
+                async for _ in ds.iter_record_batches(query, sample_size=1):
+                    pass
+
+        assert rows == total
+        table = pq.read_table(path)
+        assert table.schema.names == ["__key__", "i", "s", "a", "x"]
+        assert table.schema.field("i").type == pa.float64()
+        assert table.schema.field("s").type == pa.string()
+        assert table.schema.field("a").type == pa.list_(pa.int64())
+        rows_by_id = {r["__key__"]["path"][0]["id"]: r for r in table.to_pylist()}
+        assert rows_by_id[1]["i"] == 0.0
+        assert rows_by_id[1]["s"] is None
+        assert rows_by_id[total]["i"] == total - 0.5
+        assert rows_by_id[total]["a"] == [total - 1]
+        assert rows_by_id[total]["x"] == total - 1
+        assert rows_by_id[1]["x"] is None
+
+
+class TestIterRecordBatches:
+    @pytest.mark.asyncio
+    async def test__schema_mismatch(self):
+        pytest.importorskip("pyarrow")
+        # the last entity is on the second page
+        total = MAX_BATCH_SIZE + 1
+        entities = [Entity(_key(i), {"i": IntegerValue(i)}) for i in range(1, total)]
+        entities.append(Entity(_key(total), {"i": StringValue("x")}))
+        async with Datastore("project1", transport=MemoryTransport()) as ds:
+            await ds.commit(
+                [UpsertMutation(e) for e in entities], mode=Mode.NON_TRANSACTIONAL
+            )
+            query = Query(kind=KindExpression("kind1"))
+
+            with pytest.raises(ValueError, match="property 'i'"):
+                async for _ in ds.iter_record_batches(query):
+                    pass
+
+            batches = [b async for b in ds.iter_record_batches(query, strict=False)]
+
+        values = [row["i"] for b in batches for row in b.to_pylist()]
+        assert len(batches) == 2
+        assert values == list(range(1, total)) + [None]
+
+
+class TestExportNoPyarrow(unittest.TestCase):
+    def test__from_ds(self):
+        with mock.patch.object(export, "pa", None):
+            with self.assertRaises(RuntimeError):
+                export.ArrowResultBatch.from_ds(_data([]))
@@ -0,0 +1,346 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientResponseError
+from aiodatastore import (
+    AggregationQuery,
+    Avg,
+    Count,
+    Datastore,
+    Direction,
+    Entity,
+    IntegerValue,
+    Key,
+    KindExpression,
+    MoreResultsType,
+    PartitionId,
+    PathElement,
+    Projection,
+    PropertyFilter,
+    PropertyFilterOperator,
+    PropertyOrder,
+    PropertyReference,
+    Query,
+    ResultType,
+    StringValue,
+    Sum,
+)
+from aiodatastore.fake import (
+    MAX_BATCH_SIZE,
+    ErrorInjection,
+    FakeDatastore,
+    FakeDatastoreServer,
+    MemoryTransport,
+)
+
+
+def _key(name=None, kind="kind1"):
+    return Key(PartitionId("project1"), [PathElement(kind, name=name)])
+
+
+def _entity(name, **properties):
+    return Entity(
+        _key(name),
+        {k: IntegerValue(v) for k, v in properties.items()},
+    )
+
+
+class TestFakeDatastore:
+    def test__commit__insert_lookup(self):
+        ds = FakeDatastore()
+        resp = ds.commit(
+            {
+                "mode": "NON_TRANSACTIONAL",
+                "mutations": [
+                    {"insert": _entity("e1", a=1).to_ds()},
+                    {"insert": Entity(_key(), {}).to_ds()},
+                ],
+            }
+        )
+        results = resp["mutationResults"]
+        assert "key" not in results[0]
+        assert results[1]["key"]["path"][0]["id"]
+        assert resp["indexUpdates"] == 3
+
+        resp = ds.lookup({"keys": [_key("e1").to_ds(), _key("e2").to_ds()]})
+        assert resp["found"][0]["entity"]["properties"]["a"]["integerValue"] == "1"
+        assert resp["missing"][0]["entity"]["key"] == _key("e2").to_ds()
+
+    def test__commit__transaction(self):
+        ds = FakeDatastore()
+        mutations = [{"upsert": _entity("e1").to_ds()}]
+        with pytest.raises(Exception, match="requires a transaction"):
+            ds.commit({"mode": "TRANSACTIONAL", "mutations": mutations})
+
+        transaction = ds.begin_transaction({})["transaction"]
+        ds.commit(
+            {
+                "mode": "TRANSACTIONAL",
+                "transaction": transaction,
+                "mutations": mutations,
+            }
+        )
+        assert transaction not in ds.transactions
+
+    def test__run_query__filter_order(self):
+        ds = FakeDatastore()
+        ds.commit(
+            {
+                "mode": "NON_TRANSACTIONAL",
+                "mutations": [
+                    {"insert": _entity(f"e{i}", a=i % 3, b=i).to_ds()}
+                    for i in range(10)
+                ],
+            }
+        )
+        query = Query(
+            kind=KindExpression("kind1"),
+            filter=PropertyFilter(
+                PropertyReference("a"),
+                PropertyFilterOperator.EQUAL,
+                IntegerValue(1),
+            ),
+            order=[PropertyOrder(PropertyReference("b"), Direction.DESCENDING)],
+        )
+        batch = ds.run_query({"query": query.to_ds()})["batch"]
+        assert [
+            er["entity"]["properties"]["b"]["integerValue"]
+            for er in batch["entityResults"]
+        ] == ["7", "4", "1"]
+        assert batch["moreResults"] == "NO_MORE_RESULTS"
+
+    def test__run_query__paging(self):
+        ds = FakeDatastore()
+        total = MAX_BATCH_SIZE + 10
+        ds.commit(
+            {
+                "mode": "NON_TRANSACTIONAL",
+                "mutations": [
+                    {"insert": _entity(f"e{i:04}").to_ds()} for i in range(total)
+                ],
+            }
+        )
+
+        query = Query(
+            kind=KindExpression("kind1"),
+            projection=[Projection(PropertyReference("__key__"))],
+            offset=5,
+        )
+        batch = ds.run_query({"query": query.to_ds()})["batch"]
+        assert batch["entityResultType"] == "KEY_ONLY"
+        assert batch["skippedResults"] == 5
+        assert len(batch["entityResults"]) == MAX_BATCH_SIZE - 5
+        assert batch["moreResults"] == "NOT_FINISHED"
+
+        query = Query(kind=KindExpression("kind1"), start_cursor=batch["endCursor"])
+        batch = ds.run_query({"query": query.to_ds()})["batch"]
+        assert len(batch["entityResults"]) == 10
+        assert batch["moreResults"] == "NO_MORE_RESULTS"
+
+        query = Query(kind=KindExpression("kind1"), limit=3)
+        batch = ds.run_query({"query": query.to_ds()})["batch"]
+        assert len(batch["entityResults"]) == 3
+        assert batch["moreResults"] == "MORE_RESULTS_AFTER_LIMIT"
+
+    def test__run_aggregation_query(self):
+        ds = FakeDatastore()
+        mutations = [
+            {"insert": _entity(f"e{i}", a=i % 3, b=i).to_ds()} for i in range(10)
+        ]
+        mutations.append(
+            {"insert": Entity(_key("ez"), {"b": StringValue("x")}).to_ds()}
+        )
+        ds.commit({"mode": "NON_TRANSACTIONAL", "mutations": mutations})
+
+        query = AggregationQuery(
+            Query(
+                kind=KindExpression("kind1"),
+                filter=PropertyFilter(
+                    PropertyReference("a"),
+                    PropertyFilterOperator.EQUAL,
+                    IntegerValue(1),
+                ),
+            ),
+            [
+                Count(),
+                Count(alias="up_to", up_to=2),
+                Sum(PropertyReference("b"), alias="sum"),
+                Avg(PropertyReference("b"), alias="avg"),
+                Avg(PropertyReference("c"), alias="empty"),
+            ],
+        )
+        batch = ds.run_aggregation_query({"aggregationQuery": query.to_ds()})["batch"]
+        assert batch["aggregationResults"] == [
+            {
+                "aggregateProperties": {
+                    "property_1": {"integerValue": "3"},
+                    "up_to": {"integerValue": "2"},
+                    "sum": {"integerValue": "12"},
+                    "avg": {"doubleValue": 4.0},
+                    "empty": {"nullValue": None},
+                },
+            }
+        ]
+        assert batch["moreResults"] == "NO_MORE_RESULTS"
+
+        # nested query limit is applied before aggregation, strings are skipped
+        query = AggregationQuery(
+            Query(kind=KindExpression("kind1"), offset=8, limit=5),
+            [Count(alias="count"), Sum(PropertyReference("b"), alias="sum")],
+        )
+        batch = ds.run_aggregation_query({"aggregationQuery": query.to_ds()})["batch"]
+        properties = batch["aggregationResults"][0]["aggregateProperties"]
+        assert properties == {
+            "count": {"integerValue": "3"},
+            "sum": {"integerValue": "17"},
+        }
+
+
+class TestFakeDatastoreServer:
+    @pytest.mark.asyncio
+    async def test__client(self):
+        async with FakeDatastoreServer() as server:
+            assert server.port
+            async with Datastore("project1", api_url=server.url) as ds:
+                keys = await ds.allocate_ids([_key(), _key()])
+                assert keys[0].path[0].id != keys[1].path[0].id
+
+                entity = Entity(keys[0], {"prop": StringValue("value1")})
+                await ds.insert(entity)
+
+                result = await ds.lookup([keys[0], keys[1]])
+                assert result.found[0].entity == entity
+                assert result.missing[0].entity.key == keys[1]
+
+                query = Query(kind=KindExpression("kind1"))
+                batch = await ds.run_query(query)
+                assert batch.entity_result_type == ResultType.FULL
+                assert batch.more_results == MoreResultsType.NO_MORE_RESULTS
+                assert [er.entity for er in batch.entity_results] == [entity]
+
+                results = [er async for er in ds.iter_query(query)]
+                assert [er.entity for er in results] == [entity]
+
+                await ds.delete(keys[0])
+                result = await ds.lookup([keys[0]])
+                assert result.found == []
+
+                transaction = await ds.begin_transaction()
+                await ds.rollback(transaction)
+
+        assert server.requests["commit"] == 2
+
+    @pytest.mark.asyncio
+    async def test__error_injection(self):
+        errors = [ErrorInjection("UNAVAILABLE", 1.0, rpcs=["lookup"])]
+        async with FakeDatastoreServer(errors=errors) as server:
+            async with Datastore("project1", api_url=server.url) as ds:
+                with pytest.raises(ClientResponseError) as e:
+                    await ds.lookup([_key("e1")])
+                assert e.value.status == 503
+
+                await ds.allocate_ids([_key()])
+
+    @pytest.mark.asyncio
+    async def test__max_rps(self):
+        async with FakeDatastoreServer(max_rps=2) as server:
+            async with Datastore("project1", api_url=server.url) as ds:
+                await ds.lookup([_key("e1")])
+                await ds.lookup([_key("e1")])
+                with pytest.raises(ClientResponseError) as e:
+                    await ds.lookup([_key("e1")])
+                assert e.value.status == 429
+
+    @pytest.mark.asyncio
+    async def test__latency(self):
+        async with FakeDatastoreServer(latency=0.5) as server:
+            async with Datastore("project1", api_url=server.url) as ds:
+                with pytest.raises(asyncio.TimeoutError):
+                    await ds.lookup([_key("e1")], timeout=0.05)
+
+    def test__error_injection__unknown_status(self):
+        with pytest.raises(ValueError):
+            ErrorInjection("UNKNOWN", 1.0)
+
+
+class TestMemoryTransport:
+    @pytest.mark.asyncio
+    async def test__client(self):
+        transport = MemoryTransport()
+        async with Datastore("project1", transport=transport) as ds:
+            await ds.insert(_entity("e1", a=1))
+            result = await ds.lookup([_key("e1"), _key("e2")])
+            assert [r.entity.key.path[0].name for r in result.found] == ["e1"]
+            assert len(result.missing) == 1
+
+            with pytest.raises(ClientResponseError) as e:
+                await ds.insert(_entity("e1", a=2))
+            assert e.value.status == 409
+
+    @pytest.mark.asyncio
+    async def test__projects(self):
+        transport = MemoryTransport()
+        async with Datastore("project1", transport=transport) as ds:
+            ds2 = ds.view(project_id="project2")
+            await ds.insert(_entity("e1", a=1))
+            key2 = Key(PartitionId("project2"), [PathElement("kind1", name="e2")])
+            await ds2.insert(Entity(key2, {"a": IntegerValue(2)}))
+
+            query = Query(kind=KindExpression("kind1"))
+            batch = await ds.run_query(query)
+            assert [er.entity.key for er in batch.entity_results] == [_key("e1")]
+            batch = await ds2.run_query(query)
+            assert [er.entity.key for er in batch.entity_results] == [key2]
+
+            count = AggregationQuery(query, [Count(alias="count")])
+            assert (await ds2.run_aggregation_query(count))["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test__aggregation_query(self):
+        transport = MemoryTransport()
+        async with Datastore("project1", transport=transport) as ds:
+            for i in range(5):
+                await ds.insert(_entity(f"e{i}", a=i))
+
+            query = AggregationQuery(
+                Query(kind=KindExpression("kind1")),
+                [Count(alias="count"), Avg(PropertyReference("a"), alias="avg")],
+            )
+            batch = await ds.run_aggregation_query(query)
+            assert batch["count"] == 5
+            assert batch["avg"] == 2.0
+
+    @pytest.mark.asyncio
+    async def test__projection_query(self):
+        transport = MemoryTransport()
+        async with Datastore("project1", transport=transport) as ds:
+            for i in range(5):
+                await ds.insert(_entity(f"e{i}", a=i, b=i * 10))
+
+            query = Query(
+                kind=KindExpression("kind1"),
+                projection=[Projection(PropertyReference("b"))],
+                order=[PropertyOrder(PropertyReference("b"), Direction.DESCENDING)],
+                limit=3,
+            )
+            rows = [row async for row in ds.iter_projection(query)]
+            assert [row.b for row in rows] == [40, 30, 20]
+
+            pages = [page async for page in ds.iter_projection(query, columns=True)]
+            assert pages == [{"b": [40, 30, 20]}]
+
+    def test__unknown_rpc(self):
+        code, body = FakeDatastore().handle("unknown", {})
+        assert code == 404
+        assert body["error"]["status"] == "NOT_FOUND"
+
+    @pytest.mark.asyncio
+    async def test__compression(self):
+        transport = MemoryTransport()
+        async with Datastore(
+            "project1", transport=transport, compression_threshold=100
+        ) as ds:
+            entity = Entity(_key("e1"), {"s": StringValue("x" * 5000)})
+            await ds.insert(entity)
+            result = await ds.lookup([_key("e1")])
+            assert result.found[0].entity["s"].value == "x" * 5000
@@ -0,0 +1,213 @@
+import pytest
+
+pytest.importorskip("grpc")
+pytest.importorskip("google.cloud.datastore_v1")
+
+from aiohttp import ClientResponseError  # noqa: E402
+from aiodatastore import (  # noqa: E402
+    BlobValue,
+    Datastore,
+    Entity,
+    IntegerValue,
+    Key,
+    KindExpression,
+    LookupResult,
+    PartitionId,
+    PathElement,
+    Query,
+    QueryResultBatch,
+)
+from aiodatastore.fake import FakeGrpcServer  # noqa: E402
+from aiodatastore.grpc_transport import (  # noqa: E402
+    GrpcTransport,
+    decode_response,
+    encode_request,
+    message_types,
+)
+
+
+def _key(name):
+    return Key(PartitionId("project1"), [PathElement("kind1", name=name)])
+
+
+class TestGrpcTransport:
+    @pytest.mark.asyncio
+    async def test__client(self):
+        async with FakeGrpcServer() as server:
+            transport = GrpcTransport(server.target, insecure=True)
+            calls = []
+
+            async def middleware(call, call_next):
+                calls.append(call)
+                return await call_next(call)
+
+            async with Datastore(
+                "project1", transport=transport, middlewares=[middleware]
+            ) as ds:
+                await ds.warmup(rpc=True)
+                entity = Entity(
+                    _key("e1"),
+                    {"blob": BlobValue(b"\x00\xff"), "int": IntegerValue(2**60)},
+                )
+                await ds.insert(entity)
+
+                result = await ds.lookup([_key("e1"), _key("e2")])
+                assert len(result.found) == 1
+                assert len(result.missing) == 1
+                found = result.found[0].entity
+                assert found["blob"].value == b"\x00\xff"
+                assert found["int"].value == 2**60
+                # protobuf message sizes
+                assert calls[-1].request_size == calls[-1].request_wire_size > 0
+                assert calls[-1].response_size == calls[-1].response_wire_size > 0
+
+                batch = await ds.run_query(Query(kind=KindExpression("kind1")))
+                assert len(batch.entity_results) == 1
+
+                transaction = await ds.begin_transaction()
+                await ds.rollback(transaction)
+
+                with pytest.raises(ClientResponseError) as e:
+                    await ds.insert(entity)
+                assert e.value.status == 409
+
+    @pytest.mark.asyncio
+    async def test__invalid_request(self):
+        # payload is rejected before it's sent, like by REST API
+        transport = GrpcTransport("127.0.0.1:1", insecure=True)
+        async with Datastore("project1", transport=transport) as ds:
+            with pytest.raises(ClientResponseError) as e:
+                await ds.lookup([_key("e1")], transaction_id="not base64!")
+        assert e.value.status == 400
+
+
+ENTITY = {
+    "key": {
+        "partitionId": {"projectId": "project1", "namespaceId": "ns1"},
+        "path": [{"kind": "parent", "id": "12"}, {"kind": "kind1", "name": "e1"}],
+    },
+    "properties": {
+        "null": {"nullValue": None},
+        "bool": {"booleanValue": True},
+        "int": {"integerValue": str(2**60)},
+        "double": {"doubleValue": 1.5},
+        "string": {"stringValue": "x" * 10, "excludeFromIndexes": True},
+        "blob": {"blobValue": "AP8=", "meaning": 22},
+        "timestamp": {"timestampValue": "2023-12-04T10:20:30.123456Z"},
+        "key": {
+            "keyValue": {"partitionId": {"projectId": "p"}, "path": [{"kind": "k"}]}
+        },
+        "geo": {"geoPointValue": {"latitude": 1.5, "longitude": -2.5}},
+        "entity": {"entityValue": {"properties": {"a": {"integerValue": "1"}}}},
+        "array": {
+            "arrayValue": {"values": [{"stringValue": "a"}, {"nullValue": None}]}
+        },
+        "empty": {"arrayValue": {"values": []}},
+    },
+}
+
+
+class TestConverters:
+    def setup_method(self):
+        from google.protobuf import json_format
+
+        self.json_format = json_format
+
+    def _parse(self, rpc, data, response=False):
+        message_type = message_types(rpc)[response]
+        return self.json_format.ParseDict(data, message_type())
+
+    def test__encode_request(self):
+        data = {
+            "mode": "NON_TRANSACTIONAL",
+            "mutations": [
+                {"upsert": ENTITY},
+                {"delete": ENTITY["key"], "baseVersion": "5"},
+            ],
+        }
+        expected = self._parse("commit", {**data, "projectId": "project1"})
+        assert encode_request("commit", data, "project1") == expected
+
+        data = {"readOptions": {"readConsistency": "EVENTUAL"}, "keys": [ENTITY["key"]]}
+        expected = self._parse("lookup", {**data, "projectId": "project1"})
+        assert encode_request("lookup", data, "project1") == expected
+
+    def test__decode_response(self):
+        batch = {
+            "entityResultType": "FULL",
+            "entityResults": [
+                {"entity": ENTITY, "version": "7", "cursor": "Y3Vyc29y"},
+                {"entity": {"properties": {}}},
+            ],
+            "endCursor": "ZW5k",
+            "moreResults": "NO_MORE_RESULTS",
+            "skippedResults": 2,
+            "snapshotVersion": "9",
+        }
+        data = {"batch": batch, "transaction": "dHg="}
+        response = self._parse("runQuery", data, response=True)
+        assert decode_response("runQuery", response) == data
+
+        data = {
+            "found": [{"entity": ENTITY, "version": "7"}],
+            "missing": [{"entity": {"key": ENTITY["key"], "properties": {}}}],
+            "deferred": [ENTITY["key"]],
+            "readTime": "2023-12-04T10:20:30Z",
+        }
+        response = self._parse("lookup", data, response=True)
+        assert decode_response("lookup", response) == data
+
+        data = {
+            "mutationResults": [
+                {"key": ENTITY["key"], "version": "3"},
+                {"version": "4", "conflictDetected": True},
+            ],
+            "indexUpdates": 5,
+        }
+        response = self._parse("commit", data, response=True)
+        assert decode_response("commit", response) == data
+
+        # other responses are converted by json_format
+        response = self._parse("beginTransaction", {"transaction": "dHg="}, True)
+        assert decode_response("beginTransaction", response) == {"transaction": "dHg="}
+
+    def test__from_pb(self):
+        # entity values aren't supported by Entity
+        properties = dict(ENTITY["properties"])
+        del properties["entity"]
+        entity = {**ENTITY, "properties": properties}
+        batch = {
+            "entityResultType": "FULL",
+            "entityResults": [
+                {"entity": entity, "version": "7", "cursor": "Y3Vyc29y"},
+                {"entity": {"properties": {}}},
+            ],
+            "endCursor": "ZW5k",
+            "moreResults": "MORE_RESULTS_AFTER_LIMIT",
+            "skippedResults": 2,
+            "skippedCursor": "c2tpcA==",
+            "snapshotVersion": "9",
+        }
+        response = self._parse("runQuery", {"batch": batch}, response=True)
+        result = QueryResultBatch.from_pb(response.batch)
+        expected = QueryResultBatch.from_ds(batch)
+        for name in QueryResultBatch.__slots__ + QueryResultBatch.__base__.__slots__:
+            assert getattr(result, name) == getattr(expected, name), name
+
+        properties = result.entity_results[0].entity.properties
+        assert properties["int"].value == 2**60
+        assert properties["blob"].value == b"\x00\xff"
+        assert properties["string"].indexed is False
+        assert properties["array"].value[0].value == "a"
+
+        data = {
+            "found": [{"entity": entity, "version": "7"}],
+            "missing": [{"entity": {"key": ENTITY["key"], "properties": {}}}],
+            "deferred": [ENTITY["key"]],
+        }
+        response = self._parse("lookup", data, response=True)
+        result = LookupResult.from_pb(response)
+        expected = LookupResult.from_ds(data)
+        assert result.found == expected.found
+        assert result.missing == expected.missing
+        assert result.deferred == expected.deferred
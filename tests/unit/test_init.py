@@ -0,0 +1,37 @@
+import subprocess
+import sys
+import unittest
+
+import aiodatastore
+from aiodatastore.key import Key
+
+
+def _imported_modules(code):
+    code = f"import sys\n{code}\nprint(' '.join(sys.modules))"
+    out = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return set(out.split())
+
+
+class TestLazyImports(unittest.TestCase):
+    def test__attribute(self):
+        assert aiodatastore.Key is Key
+        assert "Key" in dir(aiodatastore)
+        assert "Datastore" in aiodatastore.__all__
+
+    def test__unknown_attribute(self):
+        with self.assertRaises(AttributeError):
+            aiodatastore.Unknown
+
+    def test__import(self):
+        modules = _imported_modules("import aiodatastore")
+        assert "aiodatastore.client" not in modules
+        assert "aiodatastore.values" not in modules
+
+    def test__no_auth_import(self):
+        modules = _imported_modules(
+            "from aiodatastore import Datastore, Key\nDatastore('project1')"
+        )
+        assert "aiodatastore.key" in modules
+        assert "gcloud.aio.auth" not in modules
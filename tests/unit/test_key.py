@@ -93,6 +93,17 @@ class TestPathElement(unittest.TestCase):
         assert PathElement("kind1", name="name1") != PathElement("kind1", name="name2")
         assert PathElement("kind1", name="name1") != PathElement("kind2", name="name1")
 
+    def test_order(self):
+        assert PathElement("kind1", id="9") < PathElement("kind1", id="10")
+        assert PathElement("kind1", id="999") < PathElement("kind1", name="1")
+        assert PathElement("kind1", name="b") > PathElement("kind1", name="a")
+        assert PathElement("kind1", name="z") < PathElement("kind2", id="1")
+        assert PathElement("kind1", id="5") <= PathElement("kind1", id="5")
+        assert PathElement("kind1", id="5").sort_key() == ("kind1", 0, 5)
+        assert PathElement("kind1", name="a").sort_key() == ("kind1", 1, "a")
+        with self.assertRaises(TypeError):
+            PathElement("kind1") < "kind1"
+
     def test__from_ds(self):
         pe = PathElement.from_ds(
             {
@@ -172,6 +183,34 @@ class TestKey(unittest.TestCase):
         key = Key(PartitionId("proj1"), [PathElement("kind1", id="321")])
         assert key1 != key
 
+    def test_order(self):
+        def key(*path, project="proj1", namespace=None):
+            return Key(PartitionId(project, namespace_id=namespace), list(path))
+
+        parent = key(PathElement("kind1", id="2"))
+        keys = [
+            key(PathElement("kind1", name="a")),
+            key(PathElement("kind1", id="10")),
+            key(PathElement("kind1", id="2"), PathElement("kind2", name="c")),
+            key(PathElement("kind0", name="z"), namespace="ns1"),
+            parent,
+            key(PathElement("kind1", id="2"), PathElement("kind0", id="7")),
+            key(PathElement("kind0", id="1"), project="proj2"),
+        ]
+        expected = [keys[4], keys[5], keys[2], keys[1], keys[0], keys[3], keys[6]]
+        assert sorted(keys) == expected
+        assert sorted(keys, key=Key.sort_key) == expected
+
+        # no namespace is the default (empty) namespace
+        assert (
+            key(PathElement("k", id="1"), namespace="").sort_key()
+            == key(PathElement("k", id="1")).sort_key()
+        )
+        assert parent <= parent
+        assert parent < keys[2]
+        assert max(keys) == keys[6]
+        assert parent.sort_key() == ("proj1", "", (("kind1", 0, 2),))
+
     def test__from_ds(self):
         key = Key.from_ds(
             {
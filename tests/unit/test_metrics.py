@@ -0,0 +1,112 @@
+import unittest
+
+import pytest
+from aiodatastore.metrics import Histogram, MetricsCollector, RPCCall
+
+
+class TestRPCCall(unittest.TestCase):
+    def test__init(self):
+        call = RPCCall("lookup", "project1", namespace="ns1", kind="kind1", key_count=2)
+        assert call.rpc == "lookup"
+        assert call.project_id == "project1"
+        assert call.namespace == "ns1"
+        assert call.kind == "kind1"
+        assert call.key_count == 2
+        assert call.entity_count == 0
+        assert call.request_size == 0
+        assert call.response_size == 0
+        assert call.status is None
+        assert call.result is None
+
+
+class TestHistogram(unittest.TestCase):
+    def test__observe(self):
+        h = Histogram(buckets=(0.1, 1.0))
+        h.observe(0.05)
+        h.observe(0.1)
+        h.observe(0.5)
+        h.observe(5.0)
+        assert h.counts == [2, 1, 1]
+        assert h.count == 4
+        assert h.sum == pytest.approx(5.65)
+
+    def test__percentile(self):
+        h = Histogram(buckets=(0.1, 1.0))
+        assert h.percentile(50) == 0.0
+
+        for _ in range(9):
+            h.observe(0.05)
+        h.observe(0.5)
+        assert h.percentile(50) == 0.1
+        assert h.percentile(90) == 0.1
+        assert h.percentile(99) == 1.0
+
+        h.observe(5.0)
+        assert h.percentile(100) == float("inf")
+
+    def test__to_dict(self):
+        h = Histogram(buckets=(0.1,))
+        h.observe(0.05)
+        assert h.to_dict() == {
+            "count": 1,
+            "sum": 0.05,
+            "buckets": [(0.1, 1), (float("inf"), 0)],
+        }
+
+
+class TestMetricsCollector:
+    @pytest.mark.asyncio
+    async def test__call(self):
+        collector = MetricsCollector()
+
+        async def call_next(call):
+            call.status = 200
+            call.request_size = 10
+            call.response_size = 20
+            call.request_wire_size = 10
+            call.response_wire_size = 5
+            return "result"
+
+        call = RPCCall("lookup", "project1", kind="kind1")
+        assert await collector(call, call_next) == "result"
+        await collector(call, call_next)
+
+        metrics = collector.metrics[("lookup", "project1", "", "kind1")]
+        assert metrics.latency.count == 2
+        assert metrics.request_bytes == 20
+        assert metrics.response_bytes == 40
+        assert metrics.statuses == {200: 2}
+
+        snapshot = collector.snapshot()
+        assert len(snapshot) == 1
+        assert snapshot[0]["rpc"] == "lookup"
+        assert snapshot[0]["project_id"] == "project1"
+        assert snapshot[0]["kind"] == "kind1"
+        assert snapshot[0]["compression_ratio"] == {"request": 1.0, "response": 4.0}
+
+        async def call_next_unknown(call):
+            await call_next(call)
+            call.response_wire_size = 0  # not reported by transport
+
+        collector.reset()
+        await collector(call, call_next_unknown)
+        assert collector.snapshot()[0]["compression_ratio"] == {
+            "request": 1.0,
+            "response": None,
+        }
+
+        collector.reset()
+        assert collector.metrics == {}
+
+    @pytest.mark.asyncio
+    async def test__call__error(self):
+        collector = MetricsCollector()
+
+        async def call_next(call):
+            call.status = 503
+            raise RuntimeError("unavailable")
+
+        with pytest.raises(RuntimeError):
+            await collector(RPCCall("commit", "project1"), call_next)
+
+        assert collector.metrics[("commit", "project1", "", None)].statuses == {503: 1}
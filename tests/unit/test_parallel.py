@@ -0,0 +1,137 @@
+import functools
+import operator
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from aiodatastore import (
+    Datastore,
+    Entity,
+    IntegerValue,
+    Key,
+    KindExpression,
+    Mode,
+    PartitionId,
+    PathElement,
+    Query,
+    UpsertMutation,
+)
+from aiodatastore.fake import FakeDatastoreServer
+from aiodatastore.parallel import map_reduce, process_scan
+
+
+def _entity(i):
+    key = Key(PartitionId("project1"), [PathElement("kind1", id=str(i))])
+    return Entity(key, {"a": IntegerValue(i)})
+
+
+def _value(entity_result):
+    return entity_result.entity["a"].value
+
+
+def _fail(entity_result):
+    raise ValueError("map failed")
+
+
+_clients = 0
+
+
+def _counting_factory(url):
+    global _clients
+    _clients += 1
+    return Datastore("project1", api_url=url)
+
+
+def _clients_created(entity_result):
+    return os.getpid(), _clients
+
+
+async def _seed(server, count):
+    async with Datastore("project1", api_url=server.url) as ds:
+        await ds.commit(
+            [UpsertMutation(_entity(i)) for i in range(1, count + 1)],
+            mode=Mode.NON_TRANSACTIONAL,
+        )
+
+
+QUERY = Query(kind=KindExpression("kind1"))
+
+
+class TestProcessScan:
+    @pytest.mark.asyncio
+    async def test__process_scan(self):
+        async with FakeDatastoreServer() as server:
+            await _seed(server, 300)
+            factory = functools.partial(Datastore, "project1", api_url=server.url)
+
+            results = [
+                er async for er in process_scan(factory, QUERY, processes=2, splits=3)
+            ]
+            assert sorted(er.entity["a"].value for er in results) == list(range(1, 301))
+
+            values = [
+                v
+                async for v in process_scan(
+                    factory, QUERY, map_fn=_value, processes=2, buffer_size=1
+                )
+            ]
+            assert sorted(values) == list(range(1, 301))
+
+    @pytest.mark.asyncio
+    async def test__process_scan__client_reused(self):
+        async with FakeDatastoreServer() as server:
+            await _seed(server, 100)
+            factory = functools.partial(_counting_factory, server.url)
+
+            values = [
+                v
+                async for v in process_scan(
+                    factory, QUERY, map_fn=_clients_created, processes=2, splits=8
+                )
+            ]
+            assert len(values) == 100
+            # the same client scans all ranges of a process
+            for pid in {pid for pid, _ in values}:
+                assert len({n for p, n in values if p == pid}) == 1
+
+    @pytest.mark.asyncio
+    async def test__process_scan__error(self):
+        async with FakeDatastoreServer() as server:
+            await _seed(server, 10)
+            factory = functools.partial(Datastore, "project1", api_url=server.url)
+            with pytest.raises(ValueError, match="map failed"):
+                async for _ in process_scan(factory, QUERY, map_fn=_fail, processes=2):
+                    pass
+
+
+class TestMapReduce:
+    @pytest.mark.asyncio
+    async def test__map_reduce(self):
+        async with FakeDatastoreServer() as server:
+            await _seed(server, 200)
+            factory = functools.partial(Datastore, "project1", api_url=server.url)
+
+            total = await map_reduce(
+                factory, QUERY, _value, operator.add, processes=2, splits=4
+            )
+            assert total == sum(range(1, 201))
+
+            with ProcessPoolExecutor(2) as executor:
+                total = await map_reduce(
+                    factory, QUERY, _value, max, initial=0, executor=executor
+                )
+                assert total == 200
+                # executor workers reuse clients of the previous call
+                total = await map_reduce(
+                    factory, QUERY, _value, operator.add, executor=executor
+                )
+            assert total == sum(range(1, 201))
+
+    @pytest.mark.asyncio
+    async def test__map_reduce__empty(self):
+        async with FakeDatastoreServer() as server:
+            factory = functools.partial(Datastore, "project1", api_url=server.url)
+            assert await map_reduce(factory, QUERY, _value, operator.add) is None
+            assert (
+                await map_reduce(factory, QUERY, _value, operator.add, initial=0) == 0
+            )
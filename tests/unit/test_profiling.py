@@ -0,0 +1,67 @@
+import io
+
+import pytest
+from aiodatastore.metrics import RPCCall
+from aiodatastore.profiling import PHASES, Profiler, RPCProfile
+
+
+class TestRPCProfile:
+    def test__record(self):
+        call = RPCCall("lookup", "project1")
+        call.serialize_time = 0.1
+        call.network_time = 0.5
+        call.request_size = 10
+        call.response_size = 100
+
+        profile = RPCProfile()
+        profile.record(call, 1.0)
+        profile.record(call, 1.0)
+        assert profile.count == 2
+        assert profile.total == 2.0
+        assert profile.phases["serialize"] == pytest.approx(0.2)
+        assert profile.phases["network"] == pytest.approx(1.0)
+        assert profile.phases["decode"] == 0.0
+        assert profile.request_bytes == 20
+        assert profile.response_bytes == 200
+        assert set(profile.to_dict()["phases"]) == set(PHASES)
+
+
+class TestProfiler:
+    @pytest.mark.asyncio
+    async def test__call(self):
+        profiler = Profiler()
+
+        async def call_next(call):
+            call.network_time = 0.01
+            call.decode_time = 0.02
+            return "result"
+
+        assert await profiler(RPCCall("lookup", "project1"), call_next) == "result"
+        await profiler(RPCCall("commit", "project1"), call_next)
+
+        snapshot = profiler.snapshot()
+        assert set(snapshot) == {"lookup", "commit"}
+        assert snapshot["lookup"]["count"] == 1
+        assert snapshot["lookup"]["phases"]["decode"] == 0.02
+
+        profiler.reset()
+        assert profiler.snapshot() == {}
+
+    @pytest.mark.asyncio
+    async def test__report(self):
+        profiler = Profiler()
+
+        async def call_next(call):
+            call.network_time = 0.0
+            return None
+
+        await profiler(RPCCall("lookup", "project1"), call_next)
+
+        lines = profiler.report().splitlines()
+        assert len(lines) == 2
+        assert lines[0].split()[:2] == ["rpc", "calls"]
+        assert lines[1].split()[:2] == ["lookup", "1"]
+
+        out = io.StringIO()
+        profiler.dump(out)
+        assert out.getvalue().splitlines() == lines
@@ -10,7 +10,15 @@ from aiodatastore.entity import Entity, EntityResult
 from aiodatastore.filters import PropertyFilter
 from aiodatastore.key import Key, PartitionId, PathElement
 from aiodatastore.property import PropertyOrder, PropertyReference
-from aiodatastore.query import KindExpression, Projection, Query, QueryResultBatch
+from aiodatastore.query import (
+    KeyQueryResultBatch,
+    KindExpression,
+    Projection,
+    ProjectionQueryResultBatch,
+    Query,
+    QueryResultBatch,
+    row_type,
+)
 from aiodatastore.values import IntegerValue
 
 
@@ -165,6 +173,7 @@ class TestQueryResultBatch(unittest.TestCase):
         assert qrb.skipped_cursor is None
         assert qrb.entity_result_type == ResultType.UNSPECIFIED
         assert qrb.entity_results == []
+        assert len(qrb) == 0
         assert qrb.end_cursor == ""
         assert qrb.more_results == MoreResultsType.UNSPECIFIED
         assert qrb.snapshot_version == ""
@@ -230,3 +239,82 @@ class TestQueryResultBatch(unittest.TestCase):
             "skippedResults": qrb.skipped_results,
             "skippedCursor": "skipped-cursor",
         }
+
+
+class TestKeyQueryResultBatch(unittest.TestCase):
+    def setUp(self):
+        self.key = Key(
+            PartitionId("project1", namespace_id="ns1"),
+            [PathElement("kind1", id="1"), PathElement("kind2", name="name2")],
+        )
+        self.data = {
+            "skippedResults": 2,
+            "entityResultType": "KEY_ONLY",
+            "entityResults": [{"entity": {"key": self.key.to_ds()}, "cursor": "c"}],
+            "endCursor": "end-cursor",
+            "moreResults": "NOT_FINISHED",
+        }
+
+    def test__from_ds(self):
+        kqrb = KeyQueryResultBatch.from_ds(self.data)
+        assert kqrb.keys == [self.key]
+        assert kqrb.skipped_results == 2
+        assert kqrb.skipped_cursor is None
+        assert kqrb.end_cursor == "end-cursor"
+        assert kqrb.more_results == MoreResultsType.NOT_FINISHED
+        assert kqrb.snapshot_version == ""
+
+    def test__from_ds__tuples(self):
+        kqrb = KeyQueryResultBatch.from_ds(self.data, tuples=True)
+        assert kqrb.keys == [("project1", "ns1", (("kind1", 1), ("kind2", "name2")))]
+
+
+class TestProjectionQueryResultBatch(unittest.TestCase):
+    def setUp(self):
+        self.key = Key(PartitionId("project1"), [PathElement("kind1", id="1")])
+        self.data = {
+            "entityResultType": "PROJECTION",
+            "entityResults": [
+                {
+                    "entity": {
+                        "key": self.key.to_ds(),
+                        "properties": {
+                            "a": {"integerValue": "1"},
+                            "b": {"doubleValue": 1.5},
+                        },
+                    },
+                },
+                {
+                    "entity": {
+                        "key": self.key.to_ds(),
+                        "properties": {"a": {"integerValue": "2"}},
+                    },
+                },
+            ],
+            "endCursor": "end-cursor",
+            "moreResults": "NO_MORE_RESULTS",
+        }
+
+    def test__from_ds__rows(self):
+        pqrb = ProjectionQueryResultBatch.from_ds(self.data, ["a", "b"])
+        assert pqrb.properties == ("a", "b")
+        assert pqrb.rows == [(1, 1.5), (2, None)]
+        assert pqrb.rows[0].a == 1
+        assert pqrb.rows[0].b == 1.5
+        assert pqrb.columns == {}
+        assert len(pqrb) == 2
+        assert pqrb.end_cursor == "end-cursor"
+        assert pqrb.more_results == MoreResultsType.NO_MORE_RESULTS
+
+    def test__from_ds__columns(self):
+        pqrb = ProjectionQueryResultBatch.from_ds(
+            self.data, ["__key__", "a"], columns=True
+        )
+        assert pqrb.columns == {"__key__": [self.key, self.key], "a": [1, 2]}
+        assert pqrb.rows == []
+        assert len(pqrb) == 2
+
+    def test__row_type(self):
+        row = row_type(("__key__", "a"))
+        assert row is row_type(("__key__", "a"))
+        assert row._fields == ("_0", "a")
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import unittest
+from unittest import mock
+
+import pytest
+from aiodatastore import Datastore
+from aiodatastore.aggregation import AggregationQuery, Count, Sum
+from aiodatastore.constants import (
+    CompositeFilterOperator,
+    Direction,
+    Mode,
+    MoreResultsType,
+    PropertyFilterOperator,
+    ResultType,
+)
+from aiodatastore.entity import Entity, EntityResult
+from aiodatastore.fake import MemoryTransport
+from aiodatastore.filters import CompositeFilter, PropertyFilter
+from aiodatastore.key import Key, PartitionId, PathElement
+from aiodatastore.metrics import RPCCall
+from aiodatastore.mutation import UpsertMutation
+from aiodatastore.property import PropertyOrder, PropertyReference
+from aiodatastore.query import GQLQuery, KindExpression, Projection, Query
+from aiodatastore.query import QueryResultBatch
+from aiodatastore.slowlog import SlowQueryLog, query_fingerprint
+from aiodatastore.values import IntegerValue, StringValue
+
+
+def _filter(name, op, value):
+    return PropertyFilter(PropertyReference(name), op, value)
+
+
+class TestQueryFingerprint(unittest.TestCase):
+    def test__query(self):
+        q = Query(kind=KindExpression("kind1"))
+        assert query_fingerprint(q) == "kind=kind1"
+
+        q = Query(
+            projection=[Projection(PropertyReference("p1"))],
+            kind=KindExpression("kind1"),
+            filter=CompositeFilter(
+                CompositeFilterOperator.AND,
+                [
+                    _filter("b", PropertyFilterOperator.EQUAL, StringValue("v")),
+                    _filter("a", PropertyFilterOperator.LESS_THAN, IntegerValue(1)),
+                ],
+            ),
+            order=[PropertyOrder(PropertyReference("a"), Direction.DESCENDING)],
+            distinct_on=[PropertyReference("p1")],
+            limit=10,
+        )
+        assert query_fingerprint(q) == (
+            "kind=kind1 projection=p1 filter=AND(a LESS_THAN ?, b EQUAL ?) "
+            "order=a DESCENDING distinct_on=p1"
+        )
+
+    def test__query__values_stripped(self):
+        def query(value):
+            return Query(
+                kind=KindExpression("kind1"),
+                filter=_filter("a", PropertyFilterOperator.EQUAL, IntegerValue(value)),
+                offset=value,
+            )
+
+        assert query_fingerprint(query(1)) == query_fingerprint(query(2))
+
+    def test__gql_query(self):
+        q1 = GQLQuery("SELECT * FROM kind1  WHERE a = 'x' AND b > 10 LIMIT @limit")
+        q2 = GQLQuery('SELECT * FROM kind1 WHERE a = "y" AND b > -2.5 LIMIT @limit')
+        assert query_fingerprint(q1) == (
+            "SELECT * FROM kind1 WHERE a = ? AND b > ? LIMIT @limit"
+        )
+        assert query_fingerprint(q1) == query_fingerprint(q2)
+
+    def test__aggregation_query(self):
+        q = AggregationQuery(
+            Query(kind=KindExpression("kind1")),
+            [Count(up_to=10), Sum(PropertyReference("a"))],
+        )
+        assert query_fingerprint(q) == "aggregate=count,sum(a) kind=kind1"
+
+
+class TestSlowQueryLog:
+    @pytest.mark.asyncio
+    async def test__not_query(self):
+        slowlog = SlowQueryLog(threshold=0)
+        call_next = mock.AsyncMock(return_value="result")
+        assert await slowlog(RPCCall("lookup", "project1"), call_next) == "result"
+        assert slowlog.stats == {}
+
+    @pytest.mark.asyncio
+    async def test__query(self):
+        log = mock.Mock(spec=logging.Logger)
+        slowlog = SlowQueryLog(threshold=0, logger=log)
+        batch = QueryResultBatch(
+            skipped_results=2,
+            entity_result_type=ResultType.FULL,
+            entity_results=[EntityResult(Entity(None, {}))],
+            more_results=MoreResultsType.NO_MORE_RESULTS,
+        )
+
+        call = RPCCall("runQuery", "project1")
+        call.query = Query(kind=KindExpression("kind1"), offset=2)
+        assert await slowlog(call, mock.AsyncMock(return_value=batch)) is batch
+
+        stats = slowlog.snapshot()["kind=kind1"]
+        assert stats["count"] == 1
+        assert stats["slow_count"] == 1
+        assert stats["results"] == 1
+        assert stats["skipped_results"] == 2
+        assert stats["offset_count"] == 1
+
+        log.log.assert_called_once()
+        assert log.log.call_args.kwargs["extra"]["fingerprint"] == "kind=kind1"
+        assert log.log.call_args.kwargs["extra"]["offset"] is True
+
+    @pytest.mark.parametrize(
+        "module, method",
+        [("numpy", "run_columnar_query"), ("pyarrow", "run_arrow_query")],
+    )
+    @pytest.mark.asyncio
+    async def test__decoded_batches(self, module, method):
+        pytest.importorskip(module)
+        slowlog = SlowQueryLog(threshold=10)
+        transport = MemoryTransport()
+        async with Datastore("project1", transport=transport) as ds:
+            await ds.commit(
+                [
+                    UpsertMutation(
+                        Entity(
+                            Key(PartitionId("project1"), [PathElement("kind1", id=i)]),
+                            {"a": IntegerValue(1)},
+                        )
+                    )
+                    for i in ("1", "2", "3")
+                ],
+                mode=Mode.NON_TRANSACTIONAL,
+            )
+
+        async with Datastore(
+            "project1", transport=transport, middlewares=[slowlog]
+        ) as ds:
+            batch = await getattr(ds, method)(
+                Query(kind=KindExpression("kind1"), offset=1)
+            )
+
+        assert len(batch) == 2
+        stats = slowlog.snapshot()["kind=kind1"]
+        assert stats["results"] == 2
+        assert stats["skipped_results"] == 1
+
+    @pytest.mark.asyncio
+    async def test__failed_query(self):
+        log = mock.Mock(spec=logging.Logger)
+        slowlog = SlowQueryLog(threshold=0, logger=log)
+        call = RPCCall("runQuery", "project1")
+        call.query = Query(kind=KindExpression("kind1"))
+
+        async def call_next(call):
+            call.status = 503
+            raise RuntimeError("unavailable")
+
+        with pytest.raises(RuntimeError):
+            await slowlog(call, call_next)
+        with pytest.raises(asyncio.TimeoutError):
+            await slowlog(call, mock.AsyncMock(side_effect=asyncio.TimeoutError))
+
+        stats = slowlog.snapshot()["kind=kind1"]
+        assert stats["count"] == 2
+        assert stats["slow_count"] == 2
+        assert stats["error_count"] == 2
+        assert stats["results"] == 0
+
+        extra = log.log.call_args_list[0].kwargs["extra"]
+        assert extra["error"] == "RuntimeError"
+        assert extra["status"] == 503
+        assert log.log.call_args_list[1].kwargs["extra"]["error"] == "TimeoutError"
+
+    @pytest.mark.asyncio
+    async def test__fast_query(self):
+        log = mock.Mock(spec=logging.Logger)
+        slowlog = SlowQueryLog(threshold=10, logger=log)
+
+        call = RPCCall("runQuery", "project1")
+        call.query = GQLQuery("SELECT * FROM kind1")
+        await slowlog(call, mock.AsyncMock(return_value=None))
+        await slowlog(call, mock.AsyncMock(return_value=None))
+
+        stats = slowlog.snapshot()["SELECT * FROM kind1"]
+        assert stats["count"] == 2
+        assert stats["slow_count"] == 0
+        log.log.assert_not_called()
+
+        slowlog.reset()
+        assert slowlog.snapshot() == {}
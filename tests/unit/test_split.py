@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from aiodatastore import (
+    Datastore,
+    Entity,
+    IntegerValue,
+    Key,
+    KindExpression,
+    Mode,
+    PartitionId,
+    PathElement,
+    PropertyFilter,
+    PropertyFilterOperator,
+    PropertyOrder,
+    PropertyReference,
+    Query,
+    UpsertMutation,
+)
+from aiodatastore.fake import MemoryTransport
+from aiodatastore.split import scan, split_query
+
+
+def _key(id=None, name=None):
+    return Key(PartitionId("project1"), [PathElement("kind1", id=id, name=name)])
+
+
+async def _seed(ds, count):
+    await ds.commit(
+        [
+            UpsertMutation(Entity(_key(id=str(i)), {"a": IntegerValue(i % 2)}))
+            for i in range(1, count + 1)
+        ],
+        mode=Mode.NON_TRANSACTIONAL,
+    )
+
+
+def _ids(entity_results):
+    return [int(er.entity.key.path[0].id) for er in entity_results]
+
+
+class TestSplitQuery:
+    @pytest.mark.asyncio
+    async def test__split_query(self):
+        async with Datastore("project1", transport=MemoryTransport()) as ds:
+            await _seed(ds, 200)
+            query = Query(kind=KindExpression("kind1"))
+            queries = await split_query(ds, query, 4)
+            assert len(queries) == 4
+            assert query.filter is None
+
+            # ranges are disjoint, in key order and cover the whole kind
+            results = []
+            for q in queries:
+                ids = _ids([er async for er in ds.iter_query(q)])
+                assert ids
+                results.extend(ids)
+            assert results == list(range(1, 201))
+
+    @pytest.mark.asyncio
+    async def test__split_query__filter(self):
+        async with Datastore("project1", transport=MemoryTransport()) as ds:
+            await _seed(ds, 100)
+            query = Query(
+                kind=KindExpression("kind1"),
+                filter=PropertyFilter(
+                    PropertyReference("a"),
+                    PropertyFilterOperator.EQUAL,
+                    IntegerValue(1),
+                ),
+            )
+            queries = await split_query(ds, query, 3)
+            ids = _ids([er async for er in scan(ds, queries, ordered=True)])
+            assert ids == list(range(1, 101, 2))
+
+    @pytest.mark.asyncio
+    async def test__split_query__small_kind(self):
+        async with Datastore("project1", transport=MemoryTransport()) as ds:
+            await _seed(ds, 2)
+            query = Query(kind=KindExpression("kind1"))
+            assert len(await split_query(ds, query, 10)) <= 3
+            assert await split_query(ds, query, 1) == [query]
+
+            ds2 = ds.view(namespace="empty")
+            assert len(await split_query(ds2, query, 10)) == 1
+
+    @pytest.mark.asyncio
+    async def test__split_query__unsupported(self):
+        ds = Datastore("project1", transport=MemoryTransport())
+        with pytest.raises(ValueError):
+            await split_query(ds, Query(), 2)
+        with pytest.raises(ValueError):
+            order = [PropertyOrder(PropertyReference("a"))]
+            await split_query(ds, Query(kind=KindExpression("k"), order=order), 2)
+
+
+class TestScan:
+    @pytest.mark.asyncio
+    async def test__scan(self):
+        async with Datastore("project1", transport=MemoryTransport()) as ds:
+            await _seed(ds, 500)
+            queries = await split_query(ds, Query(kind=KindExpression("kind1")), 5)
+            ids = _ids([er async for er in scan(ds, queries, buffer_size=10)])
+            assert sorted(ids) == list(range(1, 501))
+
+            ids = _ids([er async for er in scan(ds, queries, ordered=True)])
+            assert ids == list(range(1, 501))
+
+    @pytest.mark.asyncio
+    async def test__scan__error(self):
+        ds = Datastore("project1", transport=MemoryTransport())
+
+        async def iter_query(query, **kwargs):
+            if query.limit == 1:
+                raise RuntimeError("failed")
+            await asyncio.sleep(10)
+            yield  # pragma: no cover
+
+        ds.iter_query = iter_query
+        queries = [Query(limit=1), Query(limit=2)]
+        with pytest.raises(RuntimeError, match="failed"):
+            async for _ in scan(ds, queries):
+                pass
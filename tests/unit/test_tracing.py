@@ -0,0 +1,102 @@
+import pytest
+from aiodatastore.columnar import Column, ColumnBatch
+from aiodatastore.commit import CommitResult, MutationResult
+from aiodatastore.constants import MoreResultsType, ResultType
+from aiodatastore.metrics import RPCCall
+from aiodatastore.query import QueryResultBatch
+
+pytest.importorskip("opentelemetry.sdk")
+
+from aiodatastore.tracing import TracingMiddleware  # noqa: E402
+from opentelemetry.sdk.trace import TracerProvider  # noqa: E402
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor  # noqa: E402
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (  # noqa: E402
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import SpanKind, StatusCode  # noqa: E402
+
+
+@pytest.fixture
+def exporter():
+    return InMemorySpanExporter()
+
+
+@pytest.fixture
+def middleware(exporter):
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return TracingMiddleware(tracer_provider=provider)
+
+
+class TestTracingMiddleware:
+    @pytest.mark.asyncio
+    async def test__commit(self, middleware, exporter):
+        async def call_next(call):
+            call.status = 200
+            call.result = CommitResult(
+                [MutationResult("1"), MutationResult("2")], index_updates=5
+            )
+            return call.result
+
+        call = RPCCall("commit", "project1", kind="kind1", key_count=2)
+        call.entity_count = 2
+        await middleware(call, call_next)
+
+        (span,) = exporter.get_finished_spans()
+        assert span.name == "datastore.commit"
+        assert span.kind == SpanKind.CLIENT
+        assert span.attributes["db.operation"] == "commit"
+        assert span.attributes["datastore.kind"] == "kind1"
+        assert span.attributes["datastore.entity_count"] == 2
+        assert span.attributes["datastore.mutation_count"] == 2
+        assert span.attributes["datastore.index_updates"] == 5
+        assert span.attributes["http.status_code"] == 200
+
+    @pytest.mark.asyncio
+    async def test__run_query(self, middleware, exporter):
+        async def call_next(call):
+            call.result = QueryResultBatch(
+                skipped_results=3,
+                entity_result_type=ResultType.FULL,
+                more_results=MoreResultsType.NO_MORE_RESULTS,
+            )
+            return call.result
+
+        await middleware(RPCCall("runQuery", "project1"), call_next)
+
+        (span,) = exporter.get_finished_spans()
+        assert span.name == "datastore.runQuery"
+        assert "datastore.kind" not in span.attributes
+        assert span.attributes["datastore.entity_count"] == 0
+        assert span.attributes["datastore.skipped_results"] == 3
+        assert span.attributes["datastore.more_results"] == "NO_MORE_RESULTS"
+
+    @pytest.mark.asyncio
+    async def test__run_columnar_query(self, middleware, exporter):
+        async def call_next(call):
+            call.result = ColumnBatch(
+                {"a": Column([1, 2], [True, True])},
+                skipped_results=1,
+                more_results=MoreResultsType.MORE_RESULTS_AFTER_LIMIT,
+            )
+            return call.result
+
+        await middleware(RPCCall("runQuery", "project1"), call_next)
+
+        (span,) = exporter.get_finished_spans()
+        assert span.attributes["datastore.entity_count"] == 2
+        assert span.attributes["datastore.skipped_results"] == 1
+        assert span.attributes["datastore.more_results"] == "MORE_RESULTS_AFTER_LIMIT"
+
+    @pytest.mark.asyncio
+    async def test__error(self, middleware, exporter):
+        async def call_next(call):
+            call.status = 503
+            raise RuntimeError("unavailable")
+
+        with pytest.raises(RuntimeError):
+            await middleware(RPCCall("lookup", "project1"), call_next)
+
+        (span,) = exporter.get_finished_spans()
+        assert span.status.status_code == StatusCode.ERROR
+        assert span.attributes["http.status_code"] == 503
@@ -0,0 +1,365 @@
+import asyncio
+import gzip
+import io
+import json
+import sys
+import zlib
+from unittest import mock
+
+import pytest
+from aiohttp import ClientResponseError, web
+from aiodatastore import Datastore, Key, PartitionId, PathElement
+from aiodatastore.transport import (
+    AiohttpTransport,
+    Http2Transport,
+    HttpxTransport,
+    RecordingTransport,
+    ReplayTransport,
+    Response,
+    SessionTransport,
+    Transport,
+    decompress,
+    raise_for_status,
+)
+
+
+class FakeResponse:
+    def __init__(self, body, status=200, headers=None):
+        self.body = body
+        self.status = status
+        self.headers = headers or {}
+        self.released = False
+
+    async def read(self):
+        return self.body
+
+    def release(self):
+        self.released = True
+
+
+class StaticTransport(Transport):
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def request(self, url, body, headers):
+        self.requests.append((url, body))
+        return self.responses.pop(0)
+
+
+class TestRaiseForStatus:
+    def test__ok(self):
+        raise_for_status("http://host/v1", {}, Response(200, b"{}"))
+
+    def test__error(self):
+        with pytest.raises(ClientResponseError) as e:
+            raise_for_status("http://host/v1", {}, Response(503, b"unavailable"))
+        assert e.value.status == 503
+        assert e.value.message == "unavailable"
+
+
+class TestDecompress:
+    def test__encodings(self):
+        assert decompress(gzip.compress(b"abc"), "gzip") == b"abc"
+        assert decompress(zlib.compress(b"abc"), "deflate") == b"abc"
+        assert decompress(b"abc", None) == b"abc"
+        assert decompress(b"abc", "identity") == b"abc"
+
+    def test__unsupported(self):
+        with pytest.raises(ValueError):
+            decompress(b"abc", "br")
+
+
+async def _start_server(handle):
+    app = web.Application()
+    app.router.add_route("*", "/v1", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+class TestAiohttpTransport:
+    @pytest.mark.asyncio
+    async def test__request(self):
+        requests = []
+
+        async def handle(request):
+            requests.append((request.headers["h"], await request.read()))
+            return web.Response(status=409, body=b'{"a": 1}')
+
+        runner, port = await _start_server(handle)
+        transport = AiohttpTransport()
+        try:
+            result = await transport.request(
+                f"http://127.0.0.1:{port}/v1", b"{}", {"h": "v"}
+            )
+        finally:
+            await transport.close()
+            await runner.cleanup()
+
+        assert result.status == 409
+        assert result.body == b'{"a": 1}'
+        assert requests == [("v", b"{}")]
+        assert transport._session is None
+
+    @pytest.mark.asyncio
+    async def test__warmup(self):
+        peers = []
+
+        async def handle(request):
+            peers.append(request.transport.get_extra_info("peername"))
+            await asyncio.sleep(0.01)
+            return web.Response(status=404)
+
+        runner, port = await _start_server(handle)
+        transport = AiohttpTransport(limit=5)
+        try:
+            await transport.warmup(f"http://127.0.0.1:{port}/v1", 3)
+            assert len(set(peers)) == 3
+
+            # requests reuse warm connections
+            await transport.request(f"http://127.0.0.1:{port}/v1", b"{}", {})
+            assert len(set(peers)) == 3
+        finally:
+            await transport.close()
+            await runner.cleanup()
+
+    @pytest.mark.asyncio
+    async def test__shared_session(self):
+        session = mock.Mock()
+        session.close = mock.AsyncMock()
+        await AiohttpTransport(session).close()
+        session.close.assert_not_called()
+
+
+class TestHttpxTransport:
+    def test__httpx_missing(self):
+        with mock.patch.dict(sys.modules, {"httpx": None}):
+            with pytest.raises(RuntimeError):
+                HttpxTransport()
+
+    @pytest.mark.asyncio
+    async def test__request(self):
+        resp = mock.Mock(status_code=409, content=b'{"a": 1}', num_bytes_downloaded=5)
+        client = mock.Mock()
+        client.post = mock.AsyncMock(return_value=resp)
+        client.aclose = mock.AsyncMock()
+
+        with mock.patch.dict(sys.modules, {"httpx": mock.Mock()}):
+            transport = HttpxTransport(client)
+        result = await transport.request("http://host/v1", b"{}", {"h": "v"})
+        await transport.close()
+
+        assert result.status == 409
+        assert result.body == b'{"a": 1}'
+        assert result.wire_size == 5
+        client.post.assert_called_once_with(
+            "http://host/v1", content=b"{}", headers={"h": "v"}
+        )
+        client.aclose.assert_not_called()
+
+
+class TestHttp2Transport:
+    @pytest.mark.asyncio
+    async def test__stream_limit(self):
+        httpx = mock.Mock()
+        with mock.patch.dict(sys.modules, {"httpx": httpx}):
+            transport = Http2Transport(max_connections=2, max_streams=2)
+        kwargs = httpx.AsyncClient.call_args.kwargs
+        assert kwargs["http2"] is True
+        httpx.Limits.assert_called_once_with(
+            max_connections=2, max_keepalive_connections=2
+        )
+
+        active = 0
+        peak = 0
+
+        async def post(url, content, headers):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return mock.Mock(
+                status_code=200,
+                content=b"{}",
+                http_version="HTTP/2",
+                num_bytes_downloaded=2,
+            )
+
+        transport._client.post = post
+        results = await asyncio.gather(
+            *(transport.request("http://host/v1", b"{}", {}) for _ in range(10))
+        )
+        assert [r.status for r in results] == [200] * 10
+        assert [r.wire_size for r in results] == [2] * 10
+        assert peak == 4
+
+        stats = transport.stats.to_dict()
+        assert stats["streams"] == 10
+        assert stats["active"] == 0
+        assert stats["peak"] == 4
+        assert stats["queued"] == 6
+        assert stats["wait"]["count"] == 10
+        assert stats["versions"] == {"HTTP/2": 10}
+
+    def test__httpx_missing(self):
+        with mock.patch.dict(sys.modules, {"httpx": None}):
+            with pytest.raises(RuntimeError):
+                Http2Transport()
+
+
+class TestSessionTransport:
+    @pytest.mark.asyncio
+    async def test__request(self):
+        resp = FakeResponse(b'{"a": 1}', status=409)
+        session = mock.Mock()
+        session.request = mock.AsyncMock(return_value=resp)
+
+        transport = SessionTransport(session)
+        result = await transport.request("http://host/v1", b"{}", {"h": "v"})
+        assert result.status == 409
+        assert result.body == b'{"a": 1}'
+        # shared session decompresses responses
+        assert result.encoding is None
+        assert result.wire_size == 0
+        assert resp.released
+        session.request.assert_called_once_with(
+            "POST",
+            "http://host/v1",
+            headers={"h": "v"},
+            data=b"{}",
+            auto_raise_for_status=False,
+        )
+
+    @pytest.mark.asyncio
+    async def test__own_session(self):
+        body = gzip.compress(b'{"a": 1}')
+
+        async def handle(request):
+            assert request.headers["Accept-Encoding"] == "gzip, deflate"
+            return web.Response(body=body, headers={"Content-Encoding": "gzip"})
+
+        runner, port = await _start_server(handle)
+        transport = SessionTransport()
+        try:
+            result = await transport.request(f"http://127.0.0.1:{port}/v1", b"{}", {})
+        finally:
+            await transport.close()
+            await runner.cleanup()
+
+        assert result.status == 200
+        assert result.body == body
+        assert result.encoding == "gzip"
+        assert result.wire_size is None
+
+
+class TestRecordReplay:
+    @pytest.mark.asyncio
+    async def test__record_replay(self):
+        inner = StaticTransport(
+            [
+                Response(200, b'{"r": 1}'),
+                Response(200, b'{"r": 2}'),
+                Response(503, b"\xff\xfe"),
+            ]
+        )
+        file = io.StringIO()
+        recorder = RecordingTransport(inner, file)
+        await recorder.request("http://host/a", b'{"q": 1}', {})
+        await recorder.request("http://host/a", b'{"q": 2}', {})
+        resp = await recorder.request("http://host/b", b"{}", {})
+        assert resp.status == 503
+        await recorder.close()
+
+        records = [json.loads(line) for line in file.getvalue().splitlines()]
+        assert len(records) == 3
+        assert records[0]["request"] == {"text": '{"q": 1}'}
+        assert records[2]["response"] == {"base64": "//4="}
+        assert records[0]["latency"] >= 0
+
+        file.seek(0)
+        replay = ReplayTransport(file)
+        # matched by request body
+        resp = await replay.request("http://host/a", b'{"q": 2}', {})
+        assert resp.body == b'{"r": 2}'
+        # falls back to url
+        resp = await replay.request("http://host/a", b'{"q": 3}', {})
+        assert resp.body == b'{"r": 1}'
+        resp = await replay.request("http://host/b", b"{}", {})
+        assert (resp.status, resp.body) == (503, b"\xff\xfe")
+
+        with pytest.raises(LookupError):
+            await replay.request("http://host/a", b"{}", {})
+
+    @pytest.mark.asyncio
+    async def test__replay__loop_latency(self):
+        records = [
+            {
+                "url": "http://host/a",
+                "request": {"text": "{}"},
+                "status": 200,
+                "response": {"text": "{}"},
+                "latency": 0.5,
+            }
+        ]
+        replay = ReplayTransport(records=records, latency=True, loop=True)
+        with mock.patch("asyncio.sleep") as sleep:
+            await replay.request("http://host/a", b"{}", {})
+            await replay.request("http://host/a", b"{}", {})
+        assert sleep.call_args_list == [mock.call(0.5), mock.call(0.5)]
+
+
+class TestDatastoreTransport:
+    @pytest.mark.asyncio
+    async def test__datastore(self):
+        transport = StaticTransport(
+            [
+                Response(
+                    200,
+                    b'{"keys": [{"partitionId": {"projectId": "project1"}, '
+                    b'"path": [{"kind": "k", "id": "1"}]}]}',
+                ),
+                Response(409, b'{"error": {"status": "ABORTED"}}'),
+            ]
+        )
+        ds = Datastore("project1", transport=transport)
+        key = Key(PartitionId("project1"), [PathElement("k")])
+
+        keys = await ds.allocate_ids([key])
+        assert keys[0].path[0].id == "1"
+        assert transport.requests[0][0].endswith("/projects/project1:allocateIds")
+
+        statuses = []
+
+        async def middleware(call, call_next):
+            try:
+                return await call_next(call)
+            finally:
+                statuses.append(call.status)
+
+        ds.add_middleware(middleware)
+        with pytest.raises(ClientResponseError) as e:
+            await ds.allocate_ids([key])
+        assert e.value.status == 409
+        assert statuses == [409]
+        await ds.close()
+
+
+class TestSessionTransportClose:
+    @pytest.mark.asyncio
+    async def test__own_session(self):
+        transport = SessionTransport()
+        session = transport._get_session()
+        await transport.close()
+        assert session.session.closed
+        assert transport._session is None
+
+    @pytest.mark.asyncio
+    async def test__shared_session(self):
+        session = mock.Mock()
+        session.close = mock.AsyncMock()
+        await SessionTransport(session).close()
+        session.close.assert_not_called()
@@ -16,6 +16,7 @@ from aiodatastore import (
     KeyValue,
     Key,
 )
+from aiodatastore.values import py_value
 
 
 class TestNullValue(unittest.TestCase):
@@ -736,3 +737,29 @@ class TestKeyValue(unittest.TestCase):
         assert value.py_value == key
         assert value.raw_value is None
         assert value.indexed is False
+
+
+class TestPyValue(unittest.TestCase):
+    def test__py_value(self):
+        key = {"partitionId": {"projectId": "p1"}, "path": [{"kind": "k1", "id": "1"}]}
+        values = [
+            NullValue(),
+            BooleanValue(True),
+            StringValue("str"),
+            IntegerValue(123),
+            DoubleValue(1.5),
+            TimestampValue(datetime(2023, 12, 4, 10, 20, 30, 123456)),
+            BlobValue(b"blob"),
+            GeoPointValue(LatLng(1.5, 2.5)),
+            KeyValue(Key.from_ds(key)),
+        ]
+        for value in values:
+            assert py_value(value.to_ds()) == value.value
+
+    def test__py_value__array(self):
+        value = ArrayValue([IntegerValue(1), StringValue("a")])
+        assert py_value(value.to_ds()) == [1, "a"]
+
+    def test__py_value__unsupported(self):
+        with self.assertRaises(RuntimeError):
+            py_value({"excludeFromIndexes": True})